@@ -3,7 +3,7 @@ import logging
 from datetime import date
 
 from app.GenAI.config import get_groq_client
-from app.redis import redis_client
+from app.services.tiered_cache import tiered_cache
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +16,7 @@ async def generate_status_summary(live_data: dict) -> str:
     cache_key = f"ai_summary:{train_no}:{date.today().isoformat()}"
 
     try:
-        cached = await redis_client.get(cache_key)
+        cached = await tiered_cache.get(cache_key, decode=bytes.decode)
         if cached:
             return cached
     except Exception as e:
@@ -40,7 +40,7 @@ async def generate_status_summary(live_data: dict) -> str:
         )
         summary = resp.choices[0].message.content.strip()
         try:
-            await redis_client.set(cache_key, summary, ex=SUMMARY_TTL)
+            await tiered_cache.set(cache_key, summary, ex=SUMMARY_TTL, encode=str.encode)
         except Exception as e:
             logger.warning("Redis SET failed for %s: %s", cache_key, e)
         return summary
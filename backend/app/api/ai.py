@@ -5,12 +5,12 @@ from typing import Optional
 import asyncpg
 from fastapi import APIRouter,HTTPException,Depends
 from app.database.db import get_db
-from app.clients.live_status_service import LiveStatusService
+from app.clients.live_status_service import live_status_service
 from app.GenAI.ai_service import generate_status_summary,extract_search_params,answer_train_question
+from app.services.station_pairs import trains_between
 from pydantic import BaseModel
 logger=logging.getLogger(__name__)
 
-live_status_service=LiveStatusService()
 
 router=APIRouter(prefix="/api/ai",tags=["ai"])
 
@@ -65,17 +65,7 @@ async def ai_search(
                 "results":[],
                 "caption":f"Station(s) not found: {', '.join(missing)}",
             }
-    rows = await conn.fetch(
-    """
-    SELECT DISTINCT t.id, t.number, t.name, t.type
-    FROM trains t
-    JOIN stop_times st1 ON st1.train_id = t.id
-    JOIN stop_times st2 ON st2.train_id = t.id AND st2.sequence > st1.sequence
-    WHERE st1.station_id = $1 AND st2.station_id = $2
-    """,
-    from_row["id"],
-    to_row["id"],
-    )
+    rows = await trains_between(conn, from_row["id"], to_row["id"])
 
     results=[
 
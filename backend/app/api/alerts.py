@@ -8,11 +8,10 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 
 from app.database.db import get_db
-from app.clients.live_status_service import LiveStatusService
+from app.clients.live_status_service import live_status_service
 
 logger = logging.getLogger(__name__)
 
-live_status_service = LiveStatusService()
 
 router = APIRouter(prefix="/api/alerts", tags=["alerts"])
 
@@ -1,22 +1,58 @@
 import logging
+from typing import Optional
 
 import asyncpg
-from fastapi import APIRouter, Depends
+import numpy as np
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 
 from app.database.db import get_db
+from app.api.responses import FastJSONResponse
+from app.services.route_cache import decode_geometry
+from app.services.simplify import resolve_lod, zoom_to_tolerance
+from app.services.geometry_codec import POLYLINE_PRECISION, encode_polyline, negotiate_format
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/offline", tags=["offline"])
 
 
-@router.get("/bundle")
+@router.get("/bundle", response_class=FastJSONResponse)
 async def get_offline_bundle(
+    tolerance: Optional[float] = Query(None, ge=0, description="Allowed route deviation in metres"),
+    zoom: Optional[float] = Query(None, ge=0, le=24, description="Map zoom level, used when tolerance is not given"),
+    format: Optional[str] = Query(None, description="Route geometry encoding: json or polyline"),
+    accept: Optional[str] = Header(None),
     conn: asyncpg.Connection = Depends(get_db),
 ):
+    try:
+        geometry_format = negotiate_format(format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if geometry_format == "binary":
+        raise HTTPException(status_code=400, detail="Binary geometry is only available per route")
+
+    if tolerance is None and zoom is not None:
+        # Equator scale: slightly coarser than one pixel at Indian latitudes.
+        tolerance = zoom_to_tolerance(zoom, 0.0)
+    level = resolve_lod(tolerance)
+
     stations_rows = await conn.fetch("SELECT id, code, name, lat, lng FROM stations")
     train_rows = await conn.fetch("SELECT id, number, name, type FROM trains")
-    geo_rows = await conn.fetch("SELECT train_id, geometry FROM route_geometry")
+    if level is None:
+        geo_rows = await conn.fetch("SELECT train_id, geometry FROM route_geometry")
+    else:
+        # Precomputed level when it is current, full geometry otherwise.
+        geo_rows = await conn.fetch(
+            """
+            SELECT rg.train_id, COALESCE(l.geometry, rg.geometry) AS geometry
+            FROM route_geometry rg
+            LEFT JOIN route_geometry_lod l
+              ON l.train_id = rg.train_id
+             AND l.tolerance_m = $1
+             AND l.source_updated_at IS NOT DISTINCT FROM rg.updated_at
+            """,
+            level,
+        )
 
     stations = [
         {
@@ -40,13 +76,22 @@ async def get_offline_bundle(
     ]
 
     route_geometries = [
-        {"train_id": str(r["train_id"]), "geometry": r["geometry"]}
+        {"train_id": str(r["train_id"]), "geometry": decode_geometry(r["geometry"])}
         for r in geo_rows
         if r["geometry"]
     ]
+    if geometry_format == "polyline":
+        for route in route_geometries:
+            coords = np.asarray(route["geometry"], dtype=np.float64).reshape(-1, 2)
+            route["geometry"] = encode_polyline(coords[:, 0], coords[:, 1])
 
-    return {
+    bundle = {
         "stations": stations,
         "trains": trains,
         "route_geometries": route_geometries,
-    }
\ No newline at end of file
+        "tolerance_m": level,
+    }
+    if geometry_format == "polyline":
+        bundle["encoding"] = "polyline"
+        bundle["precision"] = POLYLINE_PRECISION
+    return FastJSONResponse(bundle)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.services.codec import orjson
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON rendered with orjson when it is installed. Return it directly from
+    endpoints with large dict bodies (route geometry, offline bundle) so
+    FastAPI skips ``jsonable_encoder``, which dominates their CPU time.
+    Endpoints with a ``response_model`` are already serialized by Pydantic.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -1,10 +1,19 @@
 from typing import List, Optional
 
 import asyncpg
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
-from app.database.db import get_db
+from app.database.db import get_db, get_pool
 from app.models.station import Station
+from app.models.nearbystation import NearbyStation
+from app.services.search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, STATION_SEARCH, search
+from app.services.autocomplete import DEFAULT_SUGGEST_LIMIT, MAX_SUGGEST_LIMIT, station_suggest
+from app.services.station_index import (
+    DEFAULT_NEARBY_LIMIT,
+    DEFAULT_NEARBY_RADIUS_M,
+    nearby_from_db,
+    station_index,
+)
 
 router = APIRouter(prefix="/api/stations", tags=["stations"])
 
@@ -22,17 +31,53 @@ def row_to_station(row: asyncpg.Record) -> Station:
 
 @router.get("", response_model=List[Station])
 async def list_stations(
+    response: Response,
     q: Optional[str] = Query(None),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_SEARCH_LIMIT,
+        description=f"Page size; defaults to {DEFAULT_SEARCH_LIMIT} when searching, unbounded otherwise",
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     conn: asyncpg.Connection = Depends(get_db),
 ):
-    if q:
-        q = f"%{q}%"
-        rows = await conn.fetch(
-            "SELECT id, code, name, lat, lng, zone FROM stations WHERE name ILIKE $1 OR code ILIKE $1",
-            q,
-        )
+    if q and limit is None:
+        limit = DEFAULT_SEARCH_LIMIT
+    try:
+        rows, next_cursor = await search(conn, STATION_SEARCH, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [row_to_station(r) for r in rows]
+
+
+@router.get("/nearby", response_model=List[NearbyStation])
+async def list_nearby_stations(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(DEFAULT_NEARBY_RADIUS_M, gt=0, le=500000, description="Search radius in metres"),
+    limit: int = Query(DEFAULT_NEARBY_LIMIT, ge=1, le=100),
+):
+    if station_index.ready:
+        hits = station_index.nearest(lat, lng, limit=limit, radius_m=radius)
     else:
-        rows = await conn.fetch("SELECT id, code, name, lat, lng, zone FROM stations")
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            hits = await nearby_from_db(conn, lat, lng, limit=limit, radius_m=radius)
+    return [NearbyStation(**station, distance_meters=distance) for station, distance in hits]
+
+
+@router.get("/suggest", response_model=List[Station])
+async def suggest_stations(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SUGGEST_LIMIT, ge=1, le=MAX_SUGGEST_LIMIT),
+):
+    """Typeahead over station codes and names, served from memory."""
+    if station_suggest.ready:
+        return [Station(**row) for row in station_suggest.suggest(q, limit)]
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows, _ = await search(conn, STATION_SEARCH, q, limit)
     return [row_to_station(r) for r in rows]
 
 
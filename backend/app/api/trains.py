@@ -1,25 +1,66 @@
+import asyncio
 import logging
+import time
 from datetime import date, datetime
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import asyncpg
-from fastapi import APIRouter, Depends, HTTPException, Query
+import numpy as np
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import BaseModel, Field
 
-from app.database.db import get_db
+from app.database.db import get_db, get_pool
+from app.api.responses import FastJSONResponse
 from app.models.train import Train
 from app.models.livetrainstatus import LiveTrainStatus
 from app.models.livestationstop import LiveStationStop
-from app.clients.live_status_service import LiveStatusService
-from app.services.snap import snap_to_route
+from app.models.livebatch import LiveBatchItem, LiveBatchResponse
+from app.clients.live_status_service import live_status_service
+from app.services.prefetch import prefetcher
+from app.services.snap import _project, snap_compiled
+from app.services.route_cache import CachedRoute, decode_geometry, route_cache
+from app.services.simplify import resolve_lod, vertex_importance, zoom_to_tolerance
+from app.services.geometry_codec import (
+    BINARY_MEDIA_TYPE,
+    POLYLINE_PRECISION,
+    encode_binary,
+    encode_polyline,
+    negotiate_format,
+)
+from app.services.map_match import MAX_MATCH_DISTANCE_M, match_trace
+from app.services.segment_index import build_segment_index
 from app.GenAI.ai_service import generate_status_summary
 from app.services.rate_limit import rate_limit
+from app.services.search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, TRAIN_SEARCH, search
+from app.services.autocomplete import DEFAULT_SUGGEST_LIMIT, MAX_SUGGEST_LIMIT, train_suggest
+from app.services.station_pairs import resolve_station_id, trains_between
 
 logger = logging.getLogger(__name__)
 
-live_status_service = LiveStatusService()
 
 router = APIRouter(prefix="/api/trains", tags=["trains"])
 
+MAX_TRACE_POINTS = 2000
+MAX_BATCH_TRAINS = 100
+# Upstream fetches in flight at once for one batch request.
+LIVE_BATCH_CONCURRENCY = 8
+
+
+class TracePoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    timestamp: datetime
+
+
+class TraceMatchRequest(BaseModel):
+    points: List[TracePoint] = Field(..., min_length=1, max_length=MAX_TRACE_POINTS)
+    max_distance_m: float = Field(MAX_MATCH_DISTANCE_M, gt=0)
+
+
+class LiveBatchRequest(BaseModel):
+    train_ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_TRAINS)
+    date: Optional[str] = Field(None, description="Journey date YYYY-MM-DD, defaults to today")
+
 
 def row_to_train(row: asyncpg.Record) -> Train:
     return Train(
@@ -32,8 +73,14 @@ def row_to_train(row: asyncpg.Record) -> Train:
 
 @router.get("", response_model=List[Train])
 async def list_trains(
+    response: Response,
     number: Optional[str] = Query(None),
     name: Optional[str] = Query(None),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_SEARCH_LIMIT,
+        description=f"Page size for name search, default {DEFAULT_SEARCH_LIMIT}",
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     from_station_id: Optional[str] = Query(None),
     to_station_id: Optional[str] = Query(None),
     conn: asyncpg.Connection = Depends(get_db),
@@ -45,32 +92,106 @@ async def list_trains(
         )
         return [row_to_train(row)] if row else []
     if name:
-        name_pattern = f"%{name}%"
-        rows = await conn.fetch(
-            "SELECT id, number, name, type FROM trains WHERE name ILIKE $1",
-            name_pattern,
-        )
+        try:
+            rows, next_cursor = await search(conn, TRAIN_SEARCH, name, limit or DEFAULT_SEARCH_LIMIT, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return [row_to_train(r) for r in rows]
     if from_station_id and to_station_id:
-        rows = await conn.fetch(
-            """
-            SELECT DISTINCT t.id, t.number, t.name, t.type
-            FROM trains t
-            JOIN stop_times st1 ON st1.train_id = t.id
-            JOIN stop_times st2 ON st2.train_id = t.id AND st2.sequence > st1.sequence
-            JOIN stations s1 ON s1.id = st1.station_id
-            JOIN stations s2 ON s2.id = st2.station_id
-            WHERE (s1.code = $1 OR s1.id::text = $1)
-              AND (s2.code = $2 OR s2.id::text = $2)
-            """,
-            from_station_id,
-            to_station_id,
-        )
+        from_id = await resolve_station_id(conn, from_station_id)
+        to_id = await resolve_station_id(conn, to_station_id)
+        if from_id is None or to_id is None:
+            return []
+        rows = await trains_between(conn, from_id, to_id)
         return [row_to_train(r) for r in rows]
     rows = await conn.fetch("SELECT id, number, name, type FROM trains")
     return [row_to_train(r) for r in rows]
 
 
+@router.get("/suggest", response_model=List[Train])
+async def suggest_trains(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SUGGEST_LIMIT, ge=1, le=MAX_SUGGEST_LIMIT),
+):
+    """Typeahead over train numbers and names, served from memory."""
+    if train_suggest.ready:
+        return [Train(**row) for row in train_suggest.suggest(q, limit)]
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows, _ = await search(conn, TRAIN_SEARCH, q, limit)
+    return [row_to_train(r) for r in rows]
+
+
+@router.post("/live:batch", response_model=LiveBatchResponse, dependencies=[Depends(rate_limit)])
+async def get_live_status_batch(
+    body: LiveBatchRequest,
+    conn: asyncpg.Connection = Depends(get_db),
+):
+    """
+    Live status for many trains at once. Trains are resolved in one query
+    and cached statuses read in one Redis round trip; only the misses go
+    upstream. Results are partial: a train that could not be resolved or
+    fetched carries an error instead of a status.
+    """
+    train_ids = list(dict.fromkeys(body.train_ids))
+    rows = await conn.fetch(
+        "SELECT id, number FROM trains WHERE number = ANY($1::text[]) OR id::text = ANY($1::text[])",
+        train_ids,
+    )
+    by_id = {}
+    for r in rows:
+        by_id[r["number"]] = r
+        by_id[str(r["id"])] = r
+
+    journey_date = body.date or datetime.now().strftime("%Y-%m-%d")
+    numbers = list(dict.fromkeys(by_id[t]["number"] for t in train_ids if t in by_id))
+    for number in numbers:
+        prefetcher.record(number, journey_date)
+    statuses = await live_status_service.get_many(numbers, journey_date, LIVE_BATCH_CONCURRENCY)
+
+    codes = {
+        raw.get("current_station")
+        for raw in statuses.values()
+        if isinstance(raw, dict) and raw.get("current_station")
+    }
+    coord_rows = await conn.fetch(
+        "SELECT code, lat, lng FROM stations WHERE code = ANY($1::text[])", list(codes)
+    ) if codes else []
+    station_coords = {
+        r["code"]: (float(r["lat"]), float(r["lng"]))
+        for r in coord_rows
+        if r["lat"] is not None and r["lng"] is not None
+    }
+
+    # Memory only; trains not cached yet are loaded together in the background.
+    routes = route_cache.peek(dict.fromkeys(str(r["id"]) for r in by_id.values()))
+
+    results = []
+    for train_id in train_ids:
+        row = by_id.get(train_id)
+        if row is None:
+            results.append(LiveBatchItem(train_id=train_id, error="Train not found"))
+            continue
+        raw = statuses.get(row["number"])
+        if not isinstance(raw, dict):
+            logger.warning("Batch live status failed for train %s: %s", row["number"], raw)
+            results.append(LiveBatchItem(train_id=train_id, error="Live status unavailable"))
+            continue
+        status = await _build_live_response(
+            raw, str(row["id"]), journey_date, conn, station_coords=station_coords, routes=routes
+        )
+        results.append(LiveBatchItem(
+            train_id=train_id,
+            status=status,
+            source=status.source,
+            stale=status.stale,
+            cache_age_seconds=status.cache_age_seconds,
+        ))
+    return LiveBatchResponse(journey_date=journey_date, results=results)
+
+
 @router.get("/{train_id}/live", response_model=LiveTrainStatus, dependencies=[Depends(rate_limit)])
 async def get_live_status(
     train_id: str,
@@ -87,6 +208,7 @@ async def get_live_status(
 
     train_number = row["number"]
     journey_date = date or datetime.now().strftime("%Y-%m-%d")
+    prefetcher.record(train_number, journey_date)
 
     
     try:
@@ -141,8 +263,16 @@ async def _build_live_response(
     train_id: str,
     journey_date: str,
     conn: asyncpg.Connection,
+    station_coords: Optional[Dict[str, Tuple[float, float]]] = None,
+    routes: Optional[Dict[str, CachedRoute]] = None,
 ) -> LiveTrainStatus:
-    """Map the normalised dict from LiveStatusService into the LiveTrainStatus model."""
+    """
+    Map the normalised dict from LiveStatusService into the LiveTrainStatus model.
+
+    ``station_coords`` (code -> (lat, lng)) replaces the per-train station
+    lookup when the caller has already fetched coordinates in bulk, and
+    ``routes`` (train id -> cached route) the route cache lookup likewise.
+    """
 
     current_code = raw.get("current_station")
     next_code = raw.get("next_station")
@@ -150,11 +280,30 @@ async def _build_live_response(
     
     position = None
     if current_code:
-        stn_row = await conn.fetchrow(
-            "SELECT lat, lng FROM stations WHERE code = $1", current_code
-        )
-        if stn_row and stn_row["lat"] is not None and stn_row["lng"] is not None:
-            position = {"lat": float(stn_row["lat"]), "lng": float(stn_row["lng"])}
+        if station_coords is not None:
+            coords = station_coords.get(current_code)
+            if coords is not None:
+                position = {"lat": coords[0], "lng": coords[1]}
+        else:
+            stn_row = await conn.fetchrow(
+                "SELECT lat, lng FROM stations WHERE code = $1", current_code
+            )
+            if stn_row and stn_row["lat"] is not None and stn_row["lng"] is not None:
+                position = {"lat": float(stn_row["lat"]), "lng": float(stn_row["lng"])}
+
+        # Precomputed stop offsets place the train along its route geometry.
+        # Only routes already in memory are used; a cold one is loaded in the
+        # background and the position goes without distances meanwhile.
+        if routes is None:
+            routes = route_cache.peek([train_id])
+        cached = routes.get(train_id)
+        stop = cached.stops.find(current_code) if cached and cached.stops else None
+        if stop is not None:
+            if position is None:
+                lat, lng = cached.route.point_at(stop["offset_m"])
+                position = {"lat": lat, "lng": lng}
+            position["distance_along_m"] = stop["offset_m"]
+            position["remaining_m"] = cached.route.length_m - stop["offset_m"]
 
   
     current_stop = None
@@ -214,8 +363,10 @@ async def _build_live_response(
         delay_minutes=delay_minutes,
         eta_next_station=eta,
         route=route_stops,
-        last_updated=datetime.now(),
+        last_updated=raw.get("fetched_at") or datetime.now(),
         source=raw.get("source"),
+        stale=raw.get("stale", False),
+        cache_age_seconds=raw.get("cache_age_seconds"),
     )
 
 
@@ -234,6 +385,7 @@ async def get_live_summary(
 
     train_number = row["number"]
     journey_date = date or datetime.now().strftime("%Y-%m-%d")
+    prefetcher.record(train_number, journey_date)
 
     try:
         raw = await live_status_service.get_live_status(train_number, journey_date)
@@ -287,47 +439,227 @@ async def get_train(
     }
 
 
-@router.get("/{train_id}/route")
+@router.get("/{train_id}/route", response_class=FastJSONResponse)
 async def get_train_route(
     train_id: str,
+    tolerance: Optional[float] = Query(None, ge=0, description="Allowed deviation in metres"),
+    zoom: Optional[float] = Query(None, ge=0, le=24, description="Map zoom level, used when tolerance is not given"),
+    format: Optional[str] = Query(None, description="Geometry encoding: json, polyline or binary"),
+    accept: Optional[str] = Header(None),
     conn: asyncpg.Connection = Depends(get_db),
 ):
-    row = await conn.fetchrow(
-        "SELECT rg.train_id, rg.geometry, rg.updated_at FROM route_geometry rg JOIN trains t ON t.id = rg.train_id WHERE t.number = $1 OR t.id::text = $1",
-        train_id,
-    )
-    if not row or not row["geometry"]:
+    try:
+        geometry_format = negotiate_format(format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cached = await route_cache.get(conn, train_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Route not found")
-    return {
-        "train_id": str(row["train_id"]),
-        "geometry": row["geometry"],
-        "updated_at": str(row["updated_at"]) if row["updated_at"] else None,
+    route = cached.route
+
+    if tolerance is None and zoom is not None:
+        tolerance = zoom_to_tolerance(zoom, float(route.lat.mean()))
+    level = resolve_lod(tolerance)
+    updated_at = str(cached.updated_at) if cached.updated_at else None
+
+    if geometry_format == "json":
+        lng, lat = await _route_level_arrays(conn, cached, level)
+        geometry, point_count = np.column_stack((lng, lat)).tolist(), int(lng.size)
+    else:
+        encoded = route.encodings.get((geometry_format, level))
+        if encoded is None:
+            lng, lat = await _route_level_arrays(conn, cached, level)
+            encoder = encode_binary if geometry_format == "binary" else encode_polyline
+            encoded = (encoder(lng, lat), int(lng.size))
+            route.encodings[(geometry_format, level)] = encoded
+        geometry, point_count = encoded
+    # Importance or an encoding may have just been added to the cached route.
+    route_cache.resize(cached)
+
+    if geometry_format == "binary":
+        headers = {
+            "X-Train-Id": cached.train_id,
+            "X-Point-Count": str(point_count),
+            "X-Tolerance-M": str(level) if level is not None else "",
+            "X-Updated-At": updated_at or "",
+        }
+        return Response(content=geometry, media_type=BINARY_MEDIA_TYPE, headers=headers)
+
+    result = {
+        "train_id": cached.train_id,
+        "geometry": geometry,
+        "updated_at": updated_at,
+        "tolerance_m": level,
+        "point_count": point_count,
     }
+    if geometry_format == "polyline":
+        result["encoding"] = "polyline"
+        result["precision"] = POLYLINE_PRECISION
+    return FastJSONResponse(result)
+
+
+async def _route_level_arrays(
+    conn: asyncpg.Connection,
+    cached: CachedRoute,
+    level: Optional[float],
+) -> tuple[np.ndarray, np.ndarray]:
+    """``(lng, lat)`` at a level of detail: in-memory when possible, else the stored level, else computed."""
+    route = cached.route
+    if level is None:
+        return route.lng, route.lat
+
+    if route.importance is None:
+        stored = await conn.fetchval(
+            """
+            SELECT geometry FROM route_geometry_lod
+            WHERE train_id = $1 AND tolerance_m = $2
+              AND source_updated_at IS NOT DISTINCT FROM $3
+            """,
+            cached.train_id,
+            level,
+            cached.updated_at,
+        )
+        if stored is not None:
+            coords = np.asarray(decode_geometry(stored), dtype=np.float64).reshape(-1, 2)
+            return coords[:, 0], coords[:, 1]
+        await asyncio.to_thread(vertex_importance, route)
+
+    keep = route.importance > level
+    return route.lng[keep], route.lat[keep]
+
+
+async def _get_snappable_route(conn: asyncpg.Connection, train_id: str) -> CachedRoute:
+    cached = await route_cache.get(conn, train_id)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Route not found")
+    if cached.route.point_count < 2:
+        raise HTTPException(status_code=400, detail="Route has too few points to snap")
+    return cached
 
 
 @router.get("/{train_id}/route/snap")
 async def snap_user_to_route(
     train_id: str,
-    lat: float = Query(..., description="User latitude"),
-    lng: float = Query(..., description="User longitude"),
+    lat: float = Query(..., ge=-90, le=90, description="User latitude"),
+    lng: float = Query(..., ge=-180, le=180, description="User longitude"),
     conn: asyncpg.Connection = Depends(get_db),
 ):
+    cached = await _get_snappable_route(conn, train_id)
+    result = snap_compiled(cached.route, lat, lng)
+    if cached.stops:
+        result.update(cached.stops.around(result["distance_along_m"]))
+    return result
+
+
+async def _locate_stop(
+    conn: asyncpg.Connection,
+    cached: CachedRoute,
+    train_id: str,
+    station_id: str,
+) -> dict[str, Any]:
+    stop = cached.stops.find(station_id) if cached.stops else None
+    if stop is not None:
+        return {
+            "station_code": stop["station_code"],
+            "station_name": stop["station_name"],
+            "sequence": stop["sequence"],
+            "distance_along_m": stop["offset_m"],
+        }
+
+    # Not projected yet (see scripts/project_stops.py): snap the station itself.
     row = await conn.fetchrow(
         """
-        SELECT rg.geometry
-        FROM route_geometry rg
-        JOIN trains t ON t.id = rg.train_id
-        WHERE t.number = $1 OR t.id::text = $1
+        SELECT s.code, s.name, s.lat, s.lng, st.sequence
+        FROM stop_times st
+        JOIN stations s ON s.id = st.station_id
+        JOIN trains t ON t.id = st.train_id
+        WHERE (t.number = $1 OR t.id::text = $1)
+          AND (s.code = $2 OR s.id::text = $2)
+        ORDER BY st.sequence
+        LIMIT 1
         """,
         train_id,
+        station_id,
     )
+    if not row:
+        raise HTTPException(status_code=404, detail=f"Station {station_id} is not a stop of this train")
+    if row["lat"] is None or row["lng"] is None:
+        raise HTTPException(status_code=400, detail=f"Station {row['code']} has no coordinates")
 
-    if not row or not row["geometry"]:
-        raise HTTPException(status_code=404, detail="Route not found")
+    snapped = snap_compiled(cached.route, float(row["lat"]), float(row["lng"]))
+    return {
+        "station_code": row["code"],
+        "station_name": row["name"],
+        "sequence": row["sequence"],
+        "distance_along_m": snapped["distance_along_m"],
+    }
 
-    geometry = row["geometry"]
 
-    if len(geometry) < 2:
-        raise HTTPException(status_code=400, detail="Route has too few points to snap")
+@router.get("/{train_id}/route/distance")
+async def get_route_distance(
+    train_id: str,
+    from_station_id: str = Query(...),
+    to_station_id: str = Query(...),
+    conn: asyncpg.Connection = Depends(get_db),
+):
+    """Along-route distance between two stops; negative when ``to`` comes before ``from``."""
+    cached = await _get_snappable_route(conn, train_id)
+    origin = await _locate_stop(conn, cached, train_id, from_station_id)
+    destination = await _locate_stop(conn, cached, train_id, to_station_id)
+    return {
+        "from": origin,
+        "to": destination,
+        "distance_m": destination["distance_along_m"] - origin["distance_along_m"],
+        "route_length_m": cached.route.length_m,
+    }
+
 
-    return snap_to_route(geometry, lat, lng)
\ No newline at end of file
+@router.post("/{train_id}/route/match")
+async def match_trace_to_route(
+    train_id: str,
+    body: TraceMatchRequest,
+    conn: asyncpg.Connection = Depends(get_db),
+):
+    """Match a buffered GPS trace to the route in one forward-only pass."""
+    route = (await _get_snappable_route(conn, train_id)).route
+    # Up to MAX_TRACE_POINTS points of numpy work; keep it off the event loop.
+    matches, track = await asyncio.to_thread(
+        match_trace,
+        route,
+        [(p.lat, p.lng, p.timestamp) for p in body.points],
+        max_distance_m=body.max_distance_m,
+    )
+    return {
+        "matched": len(track),
+        "unmatched": len(matches) - len(track),
+        "points": matches,
+        "track": track,
+    }
+
+
+@router.get("/{train_id}/route/index")
+async def get_route_index_stats(
+    train_id: str,
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Optional probe latitude"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Optional probe longitude"),
+    conn: asyncpg.Connection = Depends(get_db),
+):
+    """Segment index build/query timings, compared against a linear scan when a probe point is given."""
+    cached = await _get_snappable_route(conn, train_id)
+    route = cached.route
+    if route.index is None:
+        build_segment_index(route)
+        route_cache.resize(cached)
+    index = route.index
+
+    result: dict[str, Any] = {"points": route.point_count, "index": index.stats()}
+    if lat is not None and lng is not None:
+        started = time.perf_counter()
+        _project(route, lat, lng)
+        result["linear_query_us"] = (time.perf_counter() - started) * 1e6
+
+        started = time.perf_counter()
+        index.nearest(lat, lng)
+        result["indexed_query_us"] = (time.perf_counter() - started) * 1e6
+    return result
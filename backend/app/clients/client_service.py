@@ -2,6 +2,8 @@ import httpx
 import os
 from typing import List
 
+from app.clients.http import http_clients
+
 
 BASE_URL = "https://api.railradar.org/api/v1"
 
@@ -67,8 +69,7 @@ class ClientService:
 
     async def _get(self, url: str):
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, headers=self.headers)
+            response = await http_clients.get("railradar", url, headers=self.headers)
 
             if response.status_code == 404:
                 raise Exception(
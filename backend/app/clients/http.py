@@ -0,0 +1,179 @@
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (presence enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Needs the h2 package (httpx[http2] in requirements.txt); without it the
+# clients fall back to HTTP/1.1 and start() logs a warning.
+HTTP2_ENABLED = os.getenv("HTTP_CLIENT_HTTP2", "true").lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    timeout: float = 10.0
+    pool_timeout: float = 5.0
+
+
+def _env_config(name: str, default: UpstreamConfig) -> UpstreamConfig:
+    """Per-upstream overrides, e.g. HTTP_WHEREISMYTRAIN_MAX_CONNECTIONS=50."""
+    prefix = f"HTTP_{name.upper()}_"
+
+    def read(field: str, cast):
+        value = os.getenv(prefix + field.upper())
+        return cast(value) if value else getattr(default, field)
+
+    return UpstreamConfig(
+        max_connections=read("max_connections", int),
+        max_keepalive_connections=read("max_keepalive_connections", int),
+        keepalive_expiry=read("keepalive_expiry", float),
+        connect_timeout=read("connect_timeout", float),
+        timeout=read("timeout", float),
+        pool_timeout=read("pool_timeout", float),
+    )
+
+
+UPSTREAMS: Dict[str, UpstreamConfig] = {
+    # Live status primary: most traffic, keep plenty of warm connections.
+    "whereismytrain": _env_config("whereismytrain", UpstreamConfig(max_connections=50, max_keepalive_connections=20)),
+    # Quota-limited fallback: a handful of connections is plenty.
+    "irctc_rapidapi": _env_config("irctc_rapidapi", UpstreamConfig(max_connections=5, max_keepalive_connections=2)),
+    # Bulk station/train lists for ingest; large bodies, slow reads.
+    "railradar": _env_config("railradar", UpstreamConfig(max_connections=4, max_keepalive_connections=2, timeout=30.0)),
+}
+
+
+class _UpstreamStats:
+    __slots__ = ("requests", "errors", "in_flight", "peak_in_flight", "total_seconds")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_seconds = 0.0
+
+
+class HTTPClientRegistry:
+    """
+    One pooled, keep-alive ``httpx.AsyncClient`` per upstream, shared by every
+    request instead of a new client (and TCP/TLS handshake) per call.
+
+    Clients are created lazily so scripts can use them outside the app;
+    the FastAPI lifespan calls :meth:`start` and :meth:`aclose`.
+    """
+
+    def __init__(self, upstreams: Dict[str, UpstreamConfig]):
+        self.upstreams = upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _UpstreamStats] = {name: _UpstreamStats() for name in upstreams}
+
+    @property
+    def http2(self) -> bool:
+        return HTTP2_ENABLED and HTTP2_AVAILABLE
+
+    def client(self, upstream: str) -> httpx.AsyncClient:
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            config = self.upstreams[upstream]
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive_connections,
+                    keepalive_expiry=config.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(
+                    config.timeout,
+                    connect=config.connect_timeout,
+                    pool=config.pool_timeout,
+                ),
+            )
+            self._clients[upstream] = client
+        return client
+
+    async def start(self) -> None:
+        if HTTP2_ENABLED and not HTTP2_AVAILABLE:
+            logger.warning("HTTP_CLIENT_HTTP2 is set but h2 is not installed (pip install 'httpx[http2]'); using HTTP/1.1")
+        for upstream in self.upstreams:
+            self.client(upstream)
+        logger.info("HTTP clients ready for %s (http2=%s)", ", ".join(self.upstreams), self.http2)
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    async def get(self, upstream: str, url: str, **kwargs) -> httpx.Response:
+        return await self.request(upstream, "GET", url, **kwargs)
+
+    async def request(self, upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send through the upstream's pooled client, recording utilisation stats."""
+        client = self.client(upstream)
+        stats = self._stats[upstream]
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        started = time.perf_counter()
+        try:
+            return await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.total_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Dict]:
+        out = {}
+        for name, config in self.upstreams.items():
+            s = self._stats[name]
+            pool = _pool_counts(self._clients.get(name))
+            out[name] = {
+                "max_connections": config.max_connections,
+                "open_connections": pool["open"],
+                "idle_connections": pool["idle"],
+                "in_flight": s.in_flight,
+                "peak_in_flight": s.peak_in_flight,
+                "utilisation": round(s.in_flight / config.max_connections, 3),
+                "peak_utilisation": round(s.peak_in_flight / config.max_connections, 3),
+                "requests": s.requests,
+                "errors": s.errors,
+                "avg_latency_ms": round(s.total_seconds / s.requests * 1000, 1) if s.requests else None,
+            }
+        return {"http2": self.http2, "upstreams": out}
+
+
+def _pool_counts(client: Optional[httpx.AsyncClient]) -> Dict[str, Optional[int]]:
+    """
+    Open/idle connection counts from the client's httpcore pool. That pool is
+    private httpx/httpcore API, so if it is missing or has changed shape the
+    counts are None rather than an error in /health.
+    """
+    if client is None:
+        return {"open": 0, "idle": 0}
+    try:
+        connections = list(client._transport._pool.connections)
+        return {
+            "open": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+        }
+    except Exception:
+        return {"open": None, "idle": None}
+
+
+http_clients = HTTPClientRegistry(UPSTREAMS)
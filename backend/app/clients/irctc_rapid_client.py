@@ -3,14 +3,17 @@ from datetime import datetime
 
 import httpx
 
-BASE_URL = "https://irctc1.p.rapidapi.com/api/v1/liveTrainStatus"
+from app.clients.http import http_clients
+
+BASE_URL = os.getenv("IRCTC_RAPIDAPI_URL", "https://irctc1.p.rapidapi.com/api/v1/liveTrainStatus")
 RAPIDAPI_HOST = "irctc1.p.rapidapi.com"
 
 
 class IRCTCRapidClient:
     """
     Fallback client for live train status using IRCTC API on RapidAPI.
-    Free tier: 25 requests/month – used only when WhereIsMyTrain is down.
+    Free tier: 25 requests/month – used only when WhereIsMyTrain is down and
+    the quota admission rules in app.services.quota allow it.
 
     Sign up at https://rapidapi.com/IRCTCAPI/api/irctc1 to get an API key,
     then set IRCTC_RAPIDAPI_KEY in your environment.
@@ -43,8 +46,9 @@ class IRCTCRapidClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(BASE_URL, headers=headers, params=params)
+            response = await http_clients.get(
+                "irctc_rapidapi", BASE_URL, headers=headers, params=params,
+            )
 
             if response.status_code != 200:
                 raise RuntimeError(
@@ -1,19 +1,62 @@
+import asyncio
 import logging
-import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Union
 
 from app.clients.where_is_my_train import WhereIsMyTrainClient
 from app.clients.irctc_rapid_client import IRCTCRapidClient
 from app.redis import redis_client
+from app.services.circuit_breaker import OPEN, CircuitOpenError, breakers
+from app.services.codec import versioned_key
+from app.services.hedging import HedgeBudget, LatencyTracker, hedged
+from app.services.quota import irctc_admission
+from app.services.singleflight import SingleFlight
+from app.services.tiered_cache import tiered_cache
 
 logger = logging.getLogger(__name__)
 
+# Coalesce upstream fetches across workers too, via a short Redis lock.
+LIVE_STATUS_REDIS_LOCK = os.getenv("LIVE_STATUS_REDIS_LOCK", "false").lower() in ("1", "true", "yes")
+LOCK_TTL_MS = int(os.getenv("LIVE_STATUS_LOCK_TTL_MS", "15000"))
+LOCK_WAIT_SECONDS = float(os.getenv("LIVE_STATUS_LOCK_WAIT_SECONDS", "12"))
+LOCK_POLL_SECONDS = 0.1
+
+# Within the soft TTL a cached status is served as fresh; between soft and
+# hard it is served stale while a background task refreshes it; past the
+# hard TTL (when Redis expires it) callers wait for a synchronous fetch.
+SOFT_TTL_SECONDS = int(os.getenv("LIVE_STATUS_SOFT_TTL", "90"))
+HARD_TTL_SECONDS = int(os.getenv("LIVE_STATUS_HARD_TTL", "600"))
+
+# If the primary has not answered within its recent p95 (clamped to the
+# min/max delay), send a second request: "primary" retries the primary,
+# "fallback" asks the fallback source, "off" disables hedging. Hedges are
+# limited to HEDGE_BUDGET_RATIO of calls.
+HEDGE_MODE = os.getenv("LIVE_STATUS_HEDGE", "primary").lower()
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "1.0"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.2"))
+HEDGE_MAX_DELAY_SECONDS = float(os.getenv("HEDGE_MAX_DELAY_SECONDS", "3.0"))
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+HEDGE_BUDGET_BURST = 10.0
+
+# Delete the lock only if we still own it.
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
 
 class LiveStatusService:
     """
     Composite service for live train status with automatic failover.
 
     PRIMARY: WhereIsMyTrainClient (free, no key needed)
-    FALLBACK: IRCTCRapidClient (free tier, 25 requests/month)
+    FALLBACK: IRCTCRapidClient (free tier, 25 requests/month), only for
+              trains admitted by app.services.quota
 
     Both clients return same normalised dict shape::
 
@@ -23,49 +66,223 @@ class LiveStatusService:
             "delay":           int | None,
             "route":           list[dict],
         }
-    """
 
-    CACHE_TTL = 90
+    Redis holds ``{"fetched_at": epoch, "data": {...}}`` envelopes, encoded
+    with the configured cache codec under versioned keys; returned
+    dicts also carry ``fetched_at`` (ISO), ``cache_age_seconds`` and ``stale``.
+    """
 
     def __init__(self):
         self.primary = WhereIsMyTrainClient()
         self.fallback = IRCTCRapidClient()
+        self.singleflight = SingleFlight()
+        self._refreshes: set = set()
+        self.stale_served = 0
+        self.primary_latency = LatencyTracker()
+        self.hedge_budget = HedgeBudget(HEDGE_BUDGET_RATIO, HEDGE_BUDGET_BURST)
+        self.hedges_fired = 0
+        self.hedge_wins = 0
 
     async def get_live_status(self, train_no: str, date: str) -> dict:
         """
         Try the primary source first, use fallback if primary fails. Raises if both fail.
         Redis errors are swallowed so a cache outage never blocks live data.
+
+        Concurrent cache misses for the same train and date share one
+        upstream call (and, with LIVE_STATUS_REDIS_LOCK, one per cluster).
         """
-        cache_key = f"live_status:{train_no}:{date}"
+        cache_key = live_status_key(train_no, date)
 
-       
-        try:
-            cached = await redis_client.get(cache_key)
-            if cached:
+        envelope = await self._cache_get(cache_key)
+        if envelope is not None:
+            age = time.time() - envelope["fetched_at"]
+            if age < SOFT_TTL_SECONDS:
                 logger.info("Cache hit for %s", cache_key)
-                return json.loads(cached)
-            logger.info("Cache miss for %s", cache_key)
-        except Exception as redis_err:
-            logger.warning("Redis GET failed for %s: %s", cache_key, redis_err)
+                return self._view(envelope)
+            if age < HARD_TTL_SECONDS:
+                logger.info("Stale cache hit for %s (%.0fs old), refreshing", cache_key, age)
+                self.stale_served += 1
+                self._refresh_in_background(train_no, date, cache_key, envelope["fetched_at"])
+                return self._view(envelope)
+        logger.info("Cache miss for %s", cache_key)
+
+        envelope = await self.singleflight.do(
+            (train_no, date), lambda: self._fetch_coalesced(train_no, date, cache_key),
+        )
+        return self._view(envelope)
+
+    async def get_many(
+        self,
+        train_nos: List[str],
+        date: str,
+        concurrency: int = 8,
+    ) -> Dict[str, Union[dict, Exception]]:
+        """
+        :meth:`get_live_status` for many trains: all cache entries are read
+        in one round trip, and the misses are fetched concurrently (at most
+        ``concurrency`` at a time). A train whose fetch failed maps to the
+        exception instead of a status.
+        """
+        keys = {train_no: live_status_key(train_no, date) for train_no in train_nos}
+        try:
+            cached = await tiered_cache.get_many(list(keys.values()))
+        except Exception as e:
+            logger.warning("Redis batch GET failed: %s", e)
+            cached = {}
+
+        results: Dict[str, Union[dict, Exception]] = {}
+        misses = []
+        for train_no, key in keys.items():
+            envelope = cached.get(key)
+            age = time.time() - envelope["fetched_at"] if envelope else None
+            if age is None or age >= HARD_TTL_SECONDS:
+                misses.append(train_no)
+                continue
+            if age >= SOFT_TTL_SECONDS:
+                self.stale_served += 1
+                self._refresh_in_background(train_no, date, key, envelope["fetched_at"])
+            results[train_no] = self._view(envelope)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(train_no: str) -> None:
+            async with semaphore:
+                try:
+                    results[train_no] = await self.refresh(train_no, date)
+                except Exception as e:
+                    results[train_no] = e
+
+        await asyncio.gather(*(fetch(train_no) for train_no in misses))
+        return results
+
+    async def refresh(
+        self,
+        train_no: str,
+        date: str,
+        newer_than: float = 0.0,
+        use_fallback: bool = True,
+    ) -> dict:
+        """
+        Fetch and cache a fresh status regardless of the cached one, coalesced
+        with any in-flight fetch. ``use_fallback=False`` keeps speculative
+        refreshes off the quota-limited fallback source.
+        """
+        cache_key = live_status_key(train_no, date)
+        envelope = await self.singleflight.do(
+            (train_no, date),
+            lambda: self._fetch_coalesced(train_no, date, cache_key, newer_than, use_fallback),
+        )
+        return self._view(envelope)
+
+    async def cached_at(self, train_no: str, date: str) -> Optional[float]:
+        """Epoch time the cached status was fetched, or None if not cached."""
+        envelope = await self._cache_get(live_status_key(train_no, date), use_local=False)
+        return envelope["fetched_at"] if envelope else None
+
+    def _refresh_in_background(self, train_no: str, date: str, cache_key: str, newer_than: float) -> None:
+        async def refresh():
+            try:
+                await self.refresh(train_no, date, newer_than)
+            except Exception as e:
+                logger.warning("Background refresh failed for %s: %s", cache_key, e)
+
+        # Keep a reference so the task is not garbage-collected mid-flight.
+        task = asyncio.create_task(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    @staticmethod
+    def _view(envelope: dict) -> dict:
+        age = max(time.time() - envelope["fetched_at"], 0.0)
+        return {
+            **envelope["data"],
+            "fetched_at": datetime.fromtimestamp(envelope["fetched_at"]).isoformat(),
+            "cache_age_seconds": round(age, 1),
+            "stale": age >= SOFT_TTL_SECONDS,
+        }
+
+    async def _fetch_coalesced(
+        self,
+        train_no: str,
+        date: str,
+        cache_key: str,
+        newer_than: float = 0.0,
+        use_fallback: bool = True,
+    ) -> dict:
+        """Fetch upstream, or reuse an entry another worker cached after ``newer_than``."""
+        if not LIVE_STATUS_REDIS_LOCK:
+            return await self._fetch(train_no, date, cache_key, use_fallback)
 
-     
+        lock_key = f"lock:{cache_key}"
+        token = uuid.uuid4().hex
         try:
-            result = await self.primary.get_live_status(train_no, date)
-            result["source"] = "whereismytrain"
-            await self._cache_set(cache_key, result)
-            return result
-        except Exception as primary_error:
+            acquired = await redis_client.set(lock_key, token, nx=True, px=LOCK_TTL_MS)
+        except Exception as e:
+            logger.warning("Redis lock failed for %s: %s", lock_key, e)
+            return await self._fetch(train_no, date, cache_key, use_fallback)
+
+        if not acquired:
+            # Another worker is fetching; wait for it to fill the cache.
+            cached = await self._wait_for_cache(cache_key, newer_than)
+            if cached is not None:
+                return cached
+            logger.warning("Timed out waiting for %s; fetching directly", lock_key)
+            return await self._fetch(train_no, date, cache_key, use_fallback)
+
+        try:
+            # The previous holder may have filled the cache just before we locked.
+            cached = await self._cache_get(cache_key, use_local=False)
+            if cached is not None and cached["fetched_at"] > newer_than:
+                return cached
+            return await self._fetch(train_no, date, cache_key, use_fallback)
+        finally:
+            try:
+                await redis_client.eval(_RELEASE_LOCK, 1, lock_key, token)
+            except Exception as e:
+                logger.warning("Redis lock release failed for %s: %s", lock_key, e)
+
+    async def _wait_for_cache(self, cache_key: str, newer_than: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LOCK_WAIT_SECONDS
+        while loop.time() < deadline:
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            cached = await self._cache_get(cache_key, use_local=False)
+            if cached is not None and cached["fetched_at"] > newer_than:
+                return cached
+            try:
+                if not await redis_client.exists(f"lock:{cache_key}"):
+                    # Holder finished without caching (both sources failed).
+                    return None
+            except Exception:
+                return None
+        return None
+
+    async def _fetch(self, train_no: str, date: str, cache_key: str, use_fallback: bool = True) -> dict:
+        fallback_tried = []
+        try:
+            result, source = await self._fetch_primary(train_no, date, use_fallback, fallback_tried)
+            result["source"] = source
+            return await self._cache_set(cache_key, result)
+        except Exception as e:
+            # Python unbinds the ``as`` name after the block; keep it for the error below.
+            primary_error = e
             logger.warning(
                 "Primary source (WhereIsMyTrain) failed for train %s: %s",
                 train_no, primary_error,
             )
+            if not use_fallback:
+                raise RuntimeError(f"Primary live status source failed for train {train_no}: {e}")
+            if fallback_tried:
+                raise RuntimeError(
+                    f"All live status sources failed for train {train_no}. "
+                    f"Primary error: {primary_error} | Fallback error: {fallback_tried[0]}"
+                )
 
        
         try:
-            result = await self.fallback.get_live_status(train_no, date)
+            result = await self._call_fallback(train_no, date)
             result["source"] = "irctc_rapidapi"
-            await self._cache_set(cache_key, result)
-            return result
+            return await self._cache_set(cache_key, result)
         except Exception as fallback_error:
             logger.error(
                 "Fallback (IRCTC RapidAPI) also failed for train %s: %s",
@@ -76,9 +293,105 @@ class LiveStatusService:
                 f"Primary error: {primary_error} | Fallback error: {fallback_error}"
             )
 
-    async def _cache_set(self, key: str, value: dict) -> None:
-        """Write to Redis cache; swallow errors so a Redis outage is non-fatal."""
+    async def _call_primary(self, train_no: str, date: str) -> dict:
+        started = time.perf_counter()
+        # An open circuit raises immediately instead of waiting out the timeout.
+        result = await breakers["whereismytrain"].call(
+            lambda: self.primary.get_live_status(train_no, date)
+        )
+        self.primary_latency.record(time.perf_counter() - started)
+        return result
+
+    async def _call_fallback(self, train_no: str, date: str) -> dict:
+        """Fallback fetch, only for trains the quota admission rules allow."""
+        breaker = breakers["irctc_rapidapi"]
+        # Do not spend quota on a call that cannot succeed anyway.
+        if not self.fallback.api_key:
+            raise RuntimeError("IRCTC_RAPIDAPI_KEY is not set")
+        if await breaker.state() == OPEN:
+            raise CircuitOpenError("Circuit for irctc_rapidapi is open")
+        admitted, reason = await irctc_admission.admit(train_no, date)
+        if not admitted:
+            raise RuntimeError(f"IRCTC fallback not admitted for train {train_no} ({reason})")
+        return await breaker.call(lambda: self.fallback.get_live_status(train_no, date))
+
+    def _hedge_delay(self) -> float:
+        p95 = self.primary_latency.percentile(95)
+        if p95 is None:
+            return HEDGE_DEFAULT_DELAY_SECONDS
+        return min(max(p95, HEDGE_MIN_DELAY_SECONDS), HEDGE_MAX_DELAY_SECONDS)
+
+    async def _fetch_primary(self, train_no: str, date: str, use_fallback: bool, fallback_tried: list):
+        """
+        Primary fetch, hedged per :data:`HEDGE_MODE`. Returns ``(result, source)``.
+        A failed fallback hedge is appended to ``fallback_tried`` so the caller
+        does not ask the fallback a second time.
+        """
+        self.hedge_budget.earn()
+        if HEDGE_MODE not in ("primary", "fallback"):
+            return await self._call_primary(train_no, date), "whereismytrain"
+
+        to_fallback = HEDGE_MODE == "fallback" and use_fallback
+
+        async def hedge():
+            if not to_fallback:
+                return await self._call_primary(train_no, date)
+            try:
+                return await self._call_fallback(train_no, date)
+            except Exception as e:
+                fallback_tried.append(e)
+                raise
+
+        def allow_hedge() -> bool:
+            if not self.hedge_budget.try_spend():
+                return False
+            self.hedges_fired += 1
+            return True
+
+        result, hedge_won = await hedged(
+            lambda: self._call_primary(train_no, date), hedge, self._hedge_delay(), allow_hedge,
+        )
+        if hedge_won:
+            self.hedge_wins += 1
+        return result, "irctc_rapidapi" if hedge_won and to_fallback else "whereismytrain"
+
+    async def _cache_get(self, key: str, use_local: bool = True):
+        """Read a cache envelope (process memory, then Redis); a Redis outage counts as a miss."""
+        try:
+            return await tiered_cache.get(key, use_local=use_local)
+        except Exception as e:
+            logger.warning("Redis GET failed for %s: %s", key, e)
+            return None
+
+    async def _cache_set(self, key: str, value: dict) -> dict:
+        """Write a cache envelope to Redis and return it; a Redis outage is non-fatal."""
+        envelope = {"fetched_at": time.time(), "data": value}
         try:
-            await redis_client.set(key, json.dumps(value), ex=self.CACHE_TTL)
+            await tiered_cache.set(key, envelope, ex=HARD_TTL_SECONDS)
         except Exception as e:
             logger.warning("Redis SET failed for %s: %s", key, e)
+        return envelope
+
+    def stats(self) -> dict:
+        return {
+            "soft_ttl_seconds": SOFT_TTL_SECONDS,
+            "hard_ttl_seconds": HARD_TTL_SECONDS,
+            "stale_served": self.stale_served,
+            "refreshing": len(self._refreshes),
+            "singleflight": self.singleflight.stats(),
+            "hedging": {
+                "mode": HEDGE_MODE,
+                "delay_ms": round(self._hedge_delay() * 1000, 1),
+                "budget_tokens": round(self.hedge_budget.tokens, 2),
+                "fired": self.hedges_fired,
+                "won": self.hedge_wins,
+            },
+        }
+
+
+def live_status_key(train_no: str, date: str) -> str:
+    return versioned_key(f"live_status:{train_no}:{date}")
+
+
+# Shared by every router so coalescing spans all callers in the process.
+live_status_service = LiveStatusService()
@@ -1,7 +1,11 @@
+import os
+
 import httpx
 from datetime import datetime
 
-BASE_URL="https://whereismytrain.in/cache/live_status"
+from app.clients.http import http_clients
+
+BASE_URL=os.getenv("WHEREISMYTRAIN_URL","https://whereismytrain.in/cache/live_status")
 
 class WhereIsMyTrainClient:
 
@@ -23,8 +27,7 @@ class WhereIsMyTrainClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response=await client.get(BASE_URL,params=params)
+            response=await http_clients.get("whereismytrain",BASE_URL,params=params)
 
             if response.status_code!=200:
                 raise RuntimeError(
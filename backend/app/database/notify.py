@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import asyncpg
+
+from app.database.db import get_database_url
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = "geopulse_data_changed"
+# NOTIFY payloads must stay under 8000 bytes.
+MAX_NOTIFY_PAYLOAD = 7500
+# Reconnect delays after the LISTEN connection drops: doubling up to the max.
+RECONNECT_INITIAL_SECONDS = 1.0
+RECONNECT_MAX_SECONDS = 30.0
+
+ChangeHandler = Callable[[str], Awaitable[None]]
+
+
+async def notify_change(conn: asyncpg.Connection, table: str, payload: str = "") -> None:
+    """Tell running API processes that ``table`` changed (e.g. after an ingest upsert)."""
+    await conn.execute("SELECT pg_notify($1, $2)", CHANGES_CHANNEL, f"{table}:{payload}")
+
+
+async def notify_keys(conn: asyncpg.Connection, table: str, keys: List[str]) -> None:
+    """
+    :func:`notify_change` listing the upserted rows as comma-separated keys,
+    split over several notifications when needed. Does nothing for no keys.
+    """
+    batch: List[str] = []
+    size = 0
+    for key in keys:
+        if batch and size + len(key) + 1 > MAX_NOTIFY_PAYLOAD:
+            await notify_change(conn, table, ",".join(batch))
+            batch, size = [], 0
+        batch.append(key)
+        size += len(key) + 1
+    if batch:
+        await notify_change(conn, table, ",".join(batch))
+
+
+def coalesced(handler: ChangeHandler) -> ChangeHandler:
+    """
+    Wrap a handler that ignores its payload (e.g. a full reload) so a burst
+    of notifications runs it at most once more after the current run.
+    """
+    running = False
+    pending = False
+
+    async def run(payload: str) -> None:
+        nonlocal running, pending
+        if running:
+            pending = True
+            return
+        running = True
+        try:
+            pending = True
+            while pending:
+                pending = False
+                await handler(payload)
+        finally:
+            running = False
+
+    return run
+
+
+class ChangeListener:
+    """
+    Holds one dedicated connection LISTENing on :data:`CHANGES_CHANNEL` and
+    dispatches ``table:payload`` notifications to handlers registered per table.
+
+    If the connection drops, or cannot be opened at startup, it is (re-)opened
+    with backoff, and every handler is then called with an empty payload (a
+    full reload), since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[ChangeHandler]] = {}
+        self._conn: Optional[asyncpg.Connection] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.reconnects = 0
+
+    def subscribe(self, table: str, handler: ChangeHandler) -> None:
+        self._handlers.setdefault(table, []).append(handler)
+
+    async def start(self) -> None:
+        if not get_database_url():
+            raise RuntimeError("DATABASE_URL is not set")
+        self._stopping = False
+        try:
+            await self._connect()
+        except Exception as e:
+            logger.warning("Change listener could not connect: %s (retrying in the background)", e)
+            self._schedule_reconnect()
+
+    async def _connect(self) -> None:
+        url = get_database_url()
+        if not url:
+            raise RuntimeError("DATABASE_URL is not set")
+        conn = await asyncpg.connect(url)
+        try:
+            await conn.add_listener(CHANGES_CHANNEL, self._on_notify)
+        except Exception:
+            await conn.close()
+            raise
+        conn.add_termination_listener(self._on_terminated)
+        self._conn = conn
+
+    def _on_terminated(self, conn) -> None:
+        if self._stopping or conn is not self._conn:
+            return
+        logger.warning("Change listener connection lost; reconnecting")
+        self._conn = None
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = RECONNECT_INITIAL_SECONDS
+        while not self._stopping:
+            await asyncio.sleep(delay)
+            try:
+                await self._connect()
+            except Exception as e:
+                delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+                logger.warning("Change listener reconnect failed: %s (retrying in %.0fs)", e, delay)
+                continue
+            self.reconnects += 1
+            logger.info("Change listener reconnected; reloading subscribed indexes")
+            reloaded = set()
+            for table, handlers in self._handlers.items():
+                for handler in handlers:
+                    if handler not in reloaded:
+                        reloaded.add(handler)
+                        self._dispatch(handler, table, "")
+            return
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def stats(self) -> Dict:
+        return {
+            "connected": self._conn is not None and not self._conn.is_closed(),
+            "reconnects": self.reconnects,
+        }
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        table, _, rest = payload.partition(":")
+        for handler in self._handlers.get(table, []):
+            self._dispatch(handler, table, rest)
+
+    def _dispatch(self, handler: ChangeHandler, table: str, payload: str) -> None:
+        task = asyncio.create_task(self._run(handler, table, payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _run(handler: ChangeHandler, table: str, payload: str) -> None:
+        try:
+            await handler(payload)
+        except Exception as e:
+            logger.warning("Change handler for %s failed: %s", table, e)
+
+
+change_listener = ChangeListener()
@@ -9,6 +9,26 @@ CREATE TABLE stations(
 
 CREATE INDEX idx_stations_name ON stations(name);
 
+CREATE INDEX idx_stations_lat_lng ON stations(lat, lng);
+
+-- optional: earthdistance powers the DB fallback for /api/stations/nearby
+CREATE EXTENSION IF NOT EXISTS cube;
+
+-- optional
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+
+-- optional
+CREATE INDEX idx_stations_earth ON stations USING gist (ll_to_earth(lat, lng));
+
+-- optional: pg_trgm powers ranked station/train search (app.services.search)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- optional
+CREATE INDEX idx_stations_name_trgm ON stations USING gin (name gin_trgm_ops);
+
+-- optional
+CREATE INDEX idx_stations_code_trgm ON stations USING gin (code gin_trgm_ops);
+
 CREATE TABLE trains(
     id UUID PRIMARY KEY,
     number VARCHAR(20) NOT NULL UNIQUE,
@@ -18,6 +38,9 @@ CREATE TABLE trains(
 
 CREATE INDEX idx_trains_name ON trains(name);
 
+-- optional
+CREATE INDEX idx_trains_name_trgm ON trains USING gin (name gin_trgm_ops);
+
 CREATE TABLE stop_times(
     id UUID PRIMARY KEY,
     train_id UUID NOT NULL,
@@ -43,6 +66,20 @@ CREATE TABLE stop_times(
         UNIQUE (train_id, sequence)
 );
 
+-- Every (from, to) station pair a train serves in that order; turns from->to
+-- search into one index lookup. Created unpopulated so searches join
+-- stop_times until scripts/build_station_pairs.py first fills it.
+CREATE MATERIALIZED VIEW station_pair_trains AS
+SELECT DISTINCT st1.station_id AS from_station_id,
+       st2.station_id AS to_station_id,
+       st1.train_id
+FROM stop_times st1
+JOIN stop_times st2 ON st2.train_id = st1.train_id AND st2.sequence > st1.sequence
+WITH NO DATA;
+
+CREATE UNIQUE INDEX idx_station_pair_trains
+    ON station_pair_trains(from_station_id, to_station_id, train_id);
+
 CREATE TABLE route_geometry (
     id UUID PRIMARY KEY,
     train_id UUID NOT NULL UNIQUE,
@@ -55,6 +92,48 @@ CREATE TABLE route_geometry (
         ON DELETE CASCADE
 );
 
+CREATE TABLE route_stop_offsets (
+    train_id UUID NOT NULL,
+    sequence INT NOT NULL,
+    station_id UUID NOT NULL,
+    offset_m DOUBLE PRECISION,
+    snap_distance_m DOUBLE PRECISION,
+
+    PRIMARY KEY (train_id, sequence),
+
+    CONSTRAINT fk_train_stop_offsets
+        FOREIGN KEY(train_id)
+        REFERENCES trains(id)
+        ON DELETE CASCADE,
+
+    CONSTRAINT fk_station_stop_offsets
+        FOREIGN KEY(station_id)
+        REFERENCES stations(id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE route_stop_projection_state (
+    train_id UUID PRIMARY KEY REFERENCES trains(id) ON DELETE CASCADE,
+    geometry_updated_at TIMESTAMP,
+    schedule_hash TEXT NOT NULL,
+    projected_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE route_geometry_lod (
+    train_id UUID NOT NULL,
+    tolerance_m DOUBLE PRECISION NOT NULL,
+    geometry JSONB NOT NULL,
+    point_count INT NOT NULL,
+    source_updated_at TIMESTAMP,
+
+    PRIMARY KEY (train_id, tolerance_m),
+
+    CONSTRAINT fk_train_route_lod
+        FOREIGN KEY(train_id)
+        REFERENCES trains(id)
+        ON DELETE CASCADE
+);
+
 
 
 
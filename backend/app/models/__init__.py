@@ -1,8 +1,10 @@
 from .station import Station
+from .nearbystation import NearbyStation
 from .train import Train
 from .stoptime import StopTime
 from .livestationstop import LiveStationStop
 from .livetrainstatus import LiveTrainStatus
+from .livebatch import LiveBatchItem, LiveBatchResponse
 from .usertrip import UserTrip
 from .alert import Alert
 from .routegeometry import RouteGeometry
@@ -10,10 +12,13 @@ from .stationboard import StationBoard
 
 __all__ = [
     "Station",
+    "NearbyStation",
     "Train",
     "StopTime",
     "LiveStationStop",
     "LiveTrainStatus",
+    "LiveBatchItem",
+    "LiveBatchResponse",
     "UserTrip",
     "Alert",
     "RouteGeometry",
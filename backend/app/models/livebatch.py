@@ -0,0 +1,18 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+from .livetrainstatus import LiveTrainStatus
+
+
+class LiveBatchItem(BaseModel):
+    train_id: str = Field(...)
+    status: Optional[LiveTrainStatus] = None
+    source: Optional[str] = None
+    stale: bool = False
+    cache_age_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class LiveBatchResponse(BaseModel):
+    journey_date: str = Field(...)
+    results: list[LiveBatchItem] = Field(...)
@@ -16,5 +16,7 @@ class LiveTrainStatus(BaseModel):
     last_updated: Optional[datetime] = None
     source: Optional[str] = None
     eta_next_station: Optional[str] = None
+    stale: bool = False
+    cache_age_seconds: Optional[float] = None
 
 
@@ -0,0 +1,7 @@
+from pydantic import Field
+
+from .station import Station
+
+
+class NearbyStation(Station):
+    distance_meters: float = Field(...)
@@ -20,6 +20,10 @@ redis_client = redis.from_url(
     decode_responses=True,
 )
 
+# Same server, raw bytes: for cache values written by app.services.codec
+# (msgpack output is not valid UTF-8).
+redis_binary_client = redis.from_url(REDIS_URL)
+
 
 async def get_redis_client():
     return redis_client
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import re
+import time
+import unicodedata
+import heapq
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUGGEST_LIMIT = 10
+MAX_SUGGEST_LIMIT = 50
+# Entries examined per prefix range; bounds the cost of one-letter queries.
+MAX_SCAN = 500
+# Incremental updates touching more rows than this rebuild the index instead.
+MAX_INCREMENTAL_KEYS = 5000
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_H_AFTER_CONSONANT = re.compile(r"(?<=[bcdgjklmnprstv])h")
+_REPEATS = re.compile(r"(.)\1+")
+_SPELLING_VARIANTS = (("ee", "i"), ("oo", "u"), ("w", "v"), ("z", "j"), ("q", "k"), ("f", "p"))
+# Shorter query words fold to too little to be worth matching phonetically.
+MIN_PHONETIC_QUERY = 3
+
+# key, normalised name, name words, their phonetic forms, and both word
+# sets as " "-prefixed strings for fast "some word starts with" tests.
+Tokens = Tuple[str, str, Set[str], Set[str], str, str]
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII, accents stripped, punctuation collapsed to single spaces."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def phonetic(word: str) -> str:
+    """
+    Fold common spelling variants of romanised Indian names together:
+    aspirates lose their h (Bharuch/Baruch), long vowels written doubled
+    shorten (Meerut/Mirut), doubled letters collapse (Dilli/Dili) and
+    w/v, z/j, q/k and f/ph are merged.
+    """
+    if not word.isalpha():
+        return word
+    for a, b in _SPELLING_VARIANTS:
+        word = word.replace(a, b)
+    word = _H_AFTER_CONSONANT.sub("", word)
+    return _REPEATS.sub(r"\1", word)
+
+
+class _PrefixArray:
+    """Sorted ``(token, entity)`` pairs; prefix lookups are a bisect and a short scan."""
+
+    def __init__(self, entries: Optional[List[Tuple[str, int]]] = None):
+        self.entries = sorted(entries or [])
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, token: str, entity: int) -> None:
+        insort(self.entries, (token, entity))
+
+    def remove(self, token: str, entity: int) -> None:
+        i = bisect_left(self.entries, (token, entity))
+        if i < len(self.entries) and self.entries[i] == (token, entity):
+            del self.entries[i]
+
+    def count(self, prefix: str) -> int:
+        return bisect_left(self.entries, (prefix + "\U0010ffff",)) - bisect_left(self.entries, (prefix,))
+
+    def exact(self, token: str) -> List[int]:
+        entries = self.entries
+        i = bisect_left(entries, (token,))
+        found = []
+        while i < len(entries) and entries[i][0] == token:
+            found.append(entries[i][1])
+            i += 1
+        return found
+
+    def prefix(self, prefix: str, limit: int = MAX_SCAN) -> List[int]:
+        entries = self.entries
+        i = bisect_left(entries, (prefix,))
+        end = min(len(entries), i + limit)
+        found = []
+        while i < end and entries[i][0].startswith(prefix):
+            found.append(entries[i][1])
+            i += 1
+        return found
+
+
+class AutocompleteIndex:
+    """
+    In-process typeahead over one table: a short key (station code or train
+    number) and a name. Lookups bisect sorted token arrays for the key, the
+    whole normalised name, each name word and each word's phonetic form,
+    and never touch the database. Loaded at startup and kept current from
+    change notifications carrying the upserted keys.
+    """
+
+    def __init__(self, table: str, columns: str, key_column: str):
+        self.table = table
+        self.columns = columns
+        self.key_column = key_column
+        self._rows: Dict[int, Dict] = {}
+        self._token_sets: Dict[int, Tokens] = {}
+        self._by_key: Dict[str, int] = {}
+        self._next_id = 0
+        self._keys = _PrefixArray()
+        self._names = _PrefixArray()
+        self._words = _PrefixArray()
+        self._phonetic = _PrefixArray()
+        self._ready = False
+        self.loaded_at: Optional[float] = None
+        self.build_seconds = 0.0
+        self.incremental_updates = 0
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    async def refresh(self, conn: asyncpg.Connection, keys: Optional[List[str]] = None) -> None:
+        """Reload everything, or only the rows for ``keys`` (rows that no longer exist are dropped)."""
+        if keys is None or not self._ready or len(keys) > MAX_INCREMENTAL_KEYS:
+            rows = await conn.fetch(f"SELECT {self.columns} FROM {self.table}")
+            started = time.perf_counter()
+            built = await asyncio.to_thread(self._build, [self._row(r) for r in rows])
+            self.build_seconds = time.perf_counter() - started
+            (self._rows, self._token_sets, self._by_key, self._next_id,
+             self._keys, self._names, self._words, self._phonetic) = built
+            self._ready = True
+            self.loaded_at = time.time()
+            logger.info("%s autocomplete loaded: %d rows in %.1f ms",
+                        self.table, len(self._rows), self.build_seconds * 1000)
+            return
+
+        rows = await conn.fetch(
+            f"SELECT {self.columns} FROM {self.table} WHERE {self.key_column} = ANY($1::text[])", keys,
+        )
+        found = {r[self.key_column]: self._row(r) for r in rows}
+        for key in keys:
+            self._discard(key)
+            if key in found:
+                self._insert(found[key])
+        self.incremental_updates += 1
+
+    def _row(self, record: asyncpg.Record) -> Dict:
+        row = dict(record)
+        row["id"] = str(row["id"])
+        return row
+
+    def _build(self, rows: List[Dict]):
+        by_id = dict(enumerate(rows))
+        by_key = {row[self.key_column]: i for i, row in by_id.items()}
+        token_sets = {i: self._tokens(row) for i, row in by_id.items()}
+        keys, names, words, phonetics = [], [], [], []
+        for i, (key, name, word_tokens, phonetic_tokens, _, _) in token_sets.items():
+            keys.append((key, i))
+            names.append((name, i))
+            words.extend((w, i) for w in word_tokens)
+            phonetics.extend((p, i) for p in phonetic_tokens)
+        return (by_id, token_sets, by_key, len(rows), _PrefixArray(keys), _PrefixArray(names),
+                _PrefixArray(words), _PrefixArray(phonetics))
+
+    def _tokens(self, row: Dict) -> Tokens:
+        name = normalize(row["name"] or "")
+        words = set(name.split())
+        phonetics = {phonetic(w) for w in words}
+        return (
+            normalize(row[self.key_column]).replace(" ", ""), name, words, phonetics,
+            " " + " ".join(words), " " + " ".join(phonetics),
+        )
+
+    def _insert(self, row: Dict) -> None:
+        entity = self._next_id
+        self._next_id += 1
+        self._rows[entity] = row
+        self._by_key[row[self.key_column]] = entity
+        key, name, words, phonetics, _, _ = self._token_sets[entity] = self._tokens(row)
+        self._keys.add(key, entity)
+        self._names.add(name, entity)
+        for w in words:
+            self._words.add(w, entity)
+        for p in phonetics:
+            self._phonetic.add(p, entity)
+
+    def _discard(self, key: str) -> None:
+        entity = self._by_key.pop(key, None)
+        if entity is None:
+            return
+        del self._rows[entity]
+        key, name, words, phonetics, _, _ = self._token_sets.pop(entity)
+        self._keys.remove(key, entity)
+        self._names.remove(name, entity)
+        for w in words:
+            self._words.remove(w, entity)
+        for p in phonetics:
+            self._phonetic.remove(p, entity)
+
+    def suggest(self, q: str, limit: int = DEFAULT_SUGGEST_LIMIT) -> List[Dict]:
+        """
+        Up to ``limit`` rows, best first: exact key, key prefix, name prefix,
+        then rows whose words (or their phonetic forms) start with every
+        query word; shorter names first within a tier. Later tiers are only
+        searched while earlier ones leave room.
+        """
+        if not self._ready:
+            raise RuntimeError(f"{self.table} autocomplete is not loaded")
+
+        started = time.perf_counter()
+        result: List[Dict] = []
+        text = normalize(q)
+        if text:
+            compact = text.replace(" ", "")
+            query_words = text.split()
+            # The word with the fewest matches gives the candidates; the rest filter them.
+            anchor = min(query_words, key=self._words.count)
+            folded_anchor = phonetic(anchor)
+            use_phonetic = len(anchor) >= MIN_PHONETIC_QUERY and len(folded_anchor) > 1
+            token_sets = self._token_sets
+
+            def by_key(e):
+                return len(token_sets[e][0]), token_sets[e][0]
+
+            def by_name(e):
+                return len(token_sets[e][1]), token_sets[e][1]
+
+            tiers = (
+                (lambda: self._keys.exact(compact), by_key),
+                (lambda: self._keys.prefix(compact), by_key),
+                (lambda: self._names.prefix(text), by_name),
+                (lambda: self._filter(self._words.prefix(anchor), query_words), by_name),
+                (lambda: self._filter(self._phonetic.prefix(folded_anchor), query_words) if use_phonetic else [],
+                 by_name),
+            )
+            seen = set()
+            for candidates, order in tiers:
+                fresh = [e for e in dict.fromkeys(candidates()) if e not in seen]
+                seen.update(fresh)
+                best = heapq.nsmallest(limit - len(result), fresh, key=order)
+                result.extend(self._rows[e] for e in best)
+                if len(result) >= limit:
+                    break
+
+        self.query_count += 1
+        self.query_seconds += time.perf_counter() - started
+        return result
+
+    def _filter(self, entities: List[int], query_words: List[str]) -> List[int]:
+        """Keep rows where every query word starts one of the row's words (or phonetic forms)."""
+        if len(query_words) == 1:
+            return entities
+        needles = [" " + w for w in query_words] + [" " + phonetic(w) for w in query_words]
+        n = len(query_words)
+        token_sets = self._token_sets
+        kept = []
+        for entity in entities:
+            words, phonetics = token_sets[entity][4], token_sets[entity][5]
+            if all(needles[i] in words or needles[n + i] in phonetics for i in range(n)):
+                kept.append(entity)
+        return kept
+
+    def stats(self) -> Dict:
+        queries = self.query_count
+        return {
+            "ready": self._ready,
+            "rows": len(self._rows),
+            "tokens": len(self._keys) + len(self._names) + len(self._words) + len(self._phonetic),
+            "loaded_at": self.loaded_at,
+            "build_ms": self.build_seconds * 1000,
+            "incremental_updates": self.incremental_updates,
+            "queries": queries,
+            "avg_query_us": (self.query_seconds / queries * 1e6) if queries else None,
+        }
+
+
+station_suggest = AutocompleteIndex("stations", "id, code, name, lat, lng, zone", "code")
+train_suggest = AutocompleteIndex("trains", "id, number, name, type", "number")
@@ -0,0 +1,174 @@
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 10
+WINDOW_BUCKETS = int(os.getenv("BREAKER_WINDOW_BUCKETS", "6"))
+MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "10"))
+FAILURE_RATE_THRESHOLD = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "5"))
+SLOW_RATE_THRESHOLD = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+# How long a half-open probe may take before another worker may probe.
+PROBE_TIMEOUT_SECONDS = 15.0
+# Workers re-read shared breaker state at most this often.
+STATE_CACHE_SECONDS = 1.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker for one upstream, shared by all workers.
+
+    Outcomes are counted in :data:`BUCKET_SECONDS` Redis hashes, and the
+    last :data:`WINDOW_BUCKETS` form the rolling window. With at least
+    :data:`MIN_REQUESTS` calls in the window, a failure rate or slow-call
+    rate over threshold opens the circuit for :data:`OPEN_SECONDS`. After
+    that, one worker at a time may send a probe. Success closes the circuit
+    and clears the window; failure opens it again.
+
+    If Redis is unavailable, the breaker stays closed.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._prefix = f"breaker:{name}"
+        self._state = CLOSED
+        self._state_checked_at = 0.0
+        self.rejected = 0
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        probing = await self._admit()
+        started = time.perf_counter()
+        try:
+            result = await fn()
+        except Exception:
+            await self._record(False, time.perf_counter() - started, probing)
+            raise
+        await self._record(True, time.perf_counter() - started, probing)
+        return result
+
+    async def _admit(self) -> bool:
+        """Whether this call is a half-open probe; raises if the circuit is open."""
+        state = await self.state()
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN:
+            try:
+                if await redis_client.set(f"{self._prefix}:probe", "1", nx=True, px=int(PROBE_TIMEOUT_SECONDS * 1000)):
+                    return True
+            except Exception:
+                return False
+        self.rejected += 1
+        raise CircuitOpenError(f"Circuit for {self.name} is {state}")
+
+    async def state(self, refresh: bool = False) -> str:
+        now = time.monotonic()
+        if refresh or now - self._state_checked_at >= STATE_CACHE_SECONDS:
+            try:
+                is_open, tripped = await redis_client.mget(f"{self._prefix}:open", f"{self._prefix}:tripped")
+                self._state = OPEN if is_open else HALF_OPEN if tripped else CLOSED
+            except Exception as e:
+                logger.warning("Breaker state read failed for %s: %s", self.name, e)
+                self._state = CLOSED
+            self._state_checked_at = now
+        return self._state
+
+    async def _record(self, ok: bool, seconds: float, probing: bool) -> None:
+        try:
+            if probing:
+                if ok:
+                    await self._close()
+                else:
+                    await self._open("half-open probe failed")
+                return
+
+            bucket = f"{self._prefix}:w:{int(time.time() // BUCKET_SECONDS)}"
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hincrby(bucket, "requests", 1)
+            if not ok:
+                pipe.hincrby(bucket, "failures", 1)
+            if seconds >= SLOW_CALL_SECONDS:
+                pipe.hincrby(bucket, "slow", 1)
+            pipe.expire(bucket, BUCKET_SECONDS * (WINDOW_BUCKETS + 1))
+            await pipe.execute()
+
+            if ok and seconds < SLOW_CALL_SECONDS:
+                return
+            window = await self.window()
+            if window["requests"] < MIN_REQUESTS:
+                return
+            if window["failure_rate"] >= FAILURE_RATE_THRESHOLD:
+                await self._open(f"failure rate {window['failure_rate']:.0%}")
+            elif window["slow_rate"] >= SLOW_RATE_THRESHOLD:
+                await self._open(f"slow-call rate {window['slow_rate']:.0%}")
+        except Exception as e:
+            logger.warning("Breaker update failed for %s: %s", self.name, e)
+
+    async def window(self) -> Dict[str, Any]:
+        now_bucket = int(time.time() // BUCKET_SECONDS)
+        pipe = redis_client.pipeline(transaction=False)
+        for b in range(now_bucket - WINDOW_BUCKETS + 1, now_bucket + 1):
+            pipe.hgetall(f"{self._prefix}:w:{b}")
+        buckets = await pipe.execute()
+        totals = {"requests": 0, "failures": 0, "slow": 0}
+        for counts in buckets:
+            for field in totals:
+                totals[field] += int(counts.get(field, 0))
+        n = totals["requests"]
+        totals["failure_rate"] = totals["failures"] / n if n else 0.0
+        totals["slow_rate"] = totals["slow"] / n if n else 0.0
+        return totals
+
+    async def _open(self, reason: str) -> None:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.set(f"{self._prefix}:open", reason, px=int(OPEN_SECONDS * 1000))
+        pipe.set(f"{self._prefix}:tripped", "1")
+        pipe.delete(f"{self._prefix}:probe")
+        await pipe.execute()
+        self._state, self._state_checked_at = OPEN, time.monotonic()
+        logger.warning("Circuit for %s opened: %s", self.name, reason)
+
+    async def _close(self) -> None:
+        now_bucket = int(time.time() // BUCKET_SECONDS)
+        await redis_client.delete(
+            f"{self._prefix}:tripped",
+            f"{self._prefix}:probe",
+            *(f"{self._prefix}:w:{b}" for b in range(now_bucket - WINDOW_BUCKETS, now_bucket + 1)),
+        )
+        self._state, self._state_checked_at = CLOSED, time.monotonic()
+        logger.info("Circuit for %s closed", self.name)
+
+    async def snapshot(self) -> Dict[str, Any]:
+        try:
+            state = await self.state(refresh=True)
+            window = await self.window()
+            reason: Optional[str] = await redis_client.get(f"{self._prefix}:open")
+        except Exception as e:
+            return {"state": "unknown", "error": str(e)}
+        return {
+            "state": state,
+            "open_reason": reason,
+            "rejected_here": self.rejected,
+            "window_seconds": BUCKET_SECONDS * WINDOW_BUCKETS,
+            "window": {k: round(v, 3) if isinstance(v, float) else v for k, v in window.items()},
+        }
+
+
+breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name) for name in ("whereismytrain", "irctc_rapidapi")
+}
+
+
+async def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: await breaker.snapshot() for name, breaker in breakers.items()}
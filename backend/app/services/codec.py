@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, NamedTuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached value layout changes; entries under older keys are
+# simply never read again and expire on their own.
+CACHE_FORMAT_VERSION = 2
+
+
+class Codec(NamedTuple):
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+# For decoding JSON from elsewhere (e.g. JSONB columns asyncpg returns as text).
+json_loads: Callable[[Any], Any] = orjson.loads if orjson is not None else json.loads
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+CODECS: Dict[str, Codec] = {"json": Codec("json", _json_dumps, json.loads)}
+if orjson is not None:
+    CODECS["orjson"] = Codec("orjson", orjson.dumps, orjson.loads)
+if msgpack is not None:
+    CODECS["msgpack"] = Codec(
+        "msgpack",
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda raw: msgpack.unpackb(raw, raw=False),
+    )
+
+
+def _select_codec() -> Codec:
+    requested = os.getenv("CACHE_CODEC")
+    if requested and requested not in CODECS:
+        logger.warning("CACHE_CODEC=%s is not installed; using the default codec", requested)
+        requested = None
+    return CODECS[requested or ("orjson" if "orjson" in CODECS else "json")]
+
+
+cache_codec = _select_codec()
+
+
+def versioned_key(key: str) -> str:
+    """``key`` tagged with the cache format version and codec, e.g. ``live_status:123:2026-01-01:v2.orjson``."""
+    return f"{key}:v{CACHE_FORMAT_VERSION}.{cache_codec.name}"
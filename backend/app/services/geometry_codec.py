@@ -0,0 +1,63 @@
+import struct
+from typing import Optional
+
+import numpy as np
+
+GEOMETRY_FORMATS = ("json", "polyline", "binary")
+POLYLINE_PRECISION = 5
+POLYLINE_MEDIA_TYPE = "application/vnd.geopulse.polyline+json"
+BINARY_MEDIA_TYPE = "application/vnd.geopulse.route+octet-stream"
+
+# Packed binary layout (little-endian): magic, uint32 point count, then
+# point_count * (lng, lat) int32 micro-degree deltas, the first absolute.
+BINARY_MAGIC = b"GPR1"
+_BINARY_HEADER = struct.Struct("<4sI")
+MICRO_DEGREES = 1_000_000
+
+
+def negotiate_format(format_param: Optional[str], accept: Optional[str]) -> str:
+    """An explicit ``format=`` wins; otherwise pick from the ``Accept`` header, defaulting to JSON."""
+    if format_param:
+        if format_param not in GEOMETRY_FORMATS:
+            raise ValueError(f"Unknown geometry format {format_param!r}; expected one of {GEOMETRY_FORMATS}")
+        return format_param
+    accept = (accept or "").lower()
+    if BINARY_MEDIA_TYPE in accept or "application/octet-stream" in accept:
+        return "binary"
+    if POLYLINE_MEDIA_TYPE in accept:
+        return "polyline"
+    return "json"
+
+
+def encode_polyline(lng: np.ndarray, lat: np.ndarray, precision: int = POLYLINE_PRECISION) -> str:
+    """Google encoded polyline of the points, vectorised over all values at once."""
+    if lng.size == 0:
+        return ""
+    factor = 10 ** precision
+    coords = np.column_stack((
+        np.round(lat * factor).astype(np.int64),
+        np.round(lng * factor).astype(np.int64),
+    ))
+    values = np.diff(coords, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = (values << 1) ^ (values >> 63)
+
+    # Up to 7 five-bit chunks per value (enough for 32-bit deltas).
+    shifts = np.arange(7, dtype=np.int64) * 5
+    chunks = (values[:, None] >> shifts) & 0x1F
+    nchunks = 1 + ((values[:, None] >> shifts[1:]) > 0).sum(axis=1)
+    position = np.arange(7)[None, :]
+    used = position < nchunks[:, None]
+    more = position < (nchunks[:, None] - 1)
+    codes = (chunks | np.where(more, 0x20, 0)) + 63
+    return codes[used].astype(np.uint8).tobytes().decode("ascii")
+
+
+def encode_binary(lng: np.ndarray, lat: np.ndarray) -> bytes:
+    """Packed delta-encoded int32 micro-degrees (see :data:`BINARY_MAGIC` layout)."""
+    coords = np.column_stack((
+        np.round(lng * MICRO_DEGREES).astype(np.int64),
+        np.round(lat * MICRO_DEGREES).astype(np.int64),
+    ))
+    deltas = np.diff(coords, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    return _BINARY_HEADER.pack(BINARY_MAGIC, coords.shape[0]) + deltas.astype("<i4").tobytes()
+
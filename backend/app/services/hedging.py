@@ -0,0 +1,80 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for picking a hedge delay."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples: deque = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class HedgeBudget:
+    """
+    Token bucket that keeps hedges to a fraction of calls: every call earns
+    ``ratio`` tokens (up to ``burst``), and every hedge spends one.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def earn(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+async def hedged(
+    primary: Callable[[], Awaitable[Any]],
+    hedge: Callable[[], Awaitable[Any]],
+    delay: float,
+    allow_hedge: Callable[[], bool],
+) -> Tuple[Any, bool]:
+    """
+    Run ``primary``; if it has not finished after ``delay`` seconds and
+    ``allow_hedge()`` agrees, also start ``hedge`` and take whichever
+    succeeds first, cancelling the other. Returns ``(result, hedge_won)``.
+    If every attempt fails, the primary's error is raised.
+    """
+    first = asyncio.ensure_future(primary())
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not allow_hedge():
+            return await first, False
+
+        second = asyncio.ensure_future(hedge())
+        tasks.add(second)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), task is second
+        return await first, False
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        # Retrieve errors of finished attempts we are not reporting.
+        for task in tasks:
+            if task.done() and not task.cancelled():
+                task.exception()
+
@@ -0,0 +1,114 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.snap import CompiledRoute, _nearest, _project, haversine
+
+# Segments examined after the previous match before the window is widened.
+MATCH_WINDOW_SEGMENTS = 64
+# Widening stops here; a point with no match this far ahead is unmatched, so
+# an off-route outlier cannot scan the rest of a long route.
+MAX_MATCH_WINDOW_SEGMENTS = 4096
+MAX_MATCH_DISTANCE_M = 500.0
+
+
+def _match_forward(
+    route: CompiledRoute,
+    user_lat: float,
+    user_lng: float,
+    prev_seg: int,
+    prev_t: float,
+    window: int,
+    max_distance_m: float,
+    max_window: Optional[int] = MAX_MATCH_WINDOW_SEGMENTS,
+) -> Tuple[int, float, float, Optional[float], Optional[float]]:
+    """
+    Nearest projection at or after ``(prev_seg, prev_t)``. Starts with a
+    window of ``window`` segments and doubles it, up to ``max_window``
+    segments (None: the rest of the route), while the best match sits on
+    the window's last segment or is farther than ``max_distance_m``.
+    """
+    n_seg = route.segment_count
+    lo = prev_seg
+    limit = n_seg if max_window is None else min(lo + max_window, n_seg)
+    hi = min(lo + window, limit)
+
+    while True:
+        result = _project(route, user_lat, user_lng, np.arange(lo, hi))
+
+        if result[0] == prev_seg and result[1] < prev_t:
+            # Never move backwards within the segment we last matched on.
+            lng = route.lng[prev_seg] + prev_t * route.seg_dx[prev_seg]
+            lat = route.lat[prev_seg] + prev_t * route.seg_dy[prev_seg]
+            clamped = (prev_seg, prev_t, haversine(user_lat, user_lng, lat, lng), float(lat), float(lng))
+            ahead = _project(route, user_lat, user_lng, np.arange(lo + 1, hi))
+            result = ahead if ahead[0] >= 0 and ahead[2] < clamped[2] else clamped
+
+        at_edge = result[0] == hi - 1 or result[0] < 0 or result[2] > max_distance_m
+        if not at_edge or hi >= limit:
+            return result
+        hi = min(lo + (hi - lo) * 2, limit)
+
+
+def match_trace(
+    route: CompiledRoute,
+    points: Sequence[Tuple[float, float, Any]],
+    max_distance_m: float = MAX_MATCH_DISTANCE_M,
+    window: int = MATCH_WINDOW_SEGMENTS,
+    max_window: Optional[int] = MAX_MATCH_WINDOW_SEGMENTS,
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Match a GPS trace of ``(lat, lng, timestamp)`` points to ``route`` in one
+    pass, enforcing forward progress along the route. The third element only
+    orders the points, so any sortable key (e.g. a stop sequence) works.
+
+    The first point is snapped globally; every later point only searches
+    forward from the previous match, at most ``max_window`` segments ahead.
+    Points farther than ``max_distance_m`` from the route within that reach
+    are reported unmatched and do not advance progress.
+
+    Returns ``(matches, track)``: one entry per input point in timestamp
+    order, and the cleaned monotonic progress track of matched points.
+    """
+    total_segments = route.segment_count
+    matches: List[Dict] = []
+    track: List[Dict] = []
+    prev: Optional[Tuple[int, float]] = None
+
+    for lat, lng, timestamp in sorted(points, key=lambda p: p[2]):
+        if prev is None:
+            seg, t, distance, snapped_lat, snapped_lng = _nearest(route, lat, lng)
+        else:
+            seg, t, distance, snapped_lat, snapped_lng = _match_forward(
+                route, lat, lng, prev[0], prev[1], window, max_distance_m, max_window,
+            )
+
+        matched = seg >= 0 and distance <= max_distance_m
+        route_fraction = (seg + t) / total_segments if matched and total_segments > 0 else None
+        distance_along = route.distance_along(seg, t) if matched else None
+
+        matches.append({
+            "timestamp": timestamp,
+            "lat": lat,
+            "lng": lng,
+            "matched": matched,
+            "snapped_lat": snapped_lat if matched else None,
+            "snapped_lng": snapped_lng if matched else None,
+            "distance_meters": distance if seg >= 0 else None,
+            "segment_index": seg if matched else None,
+            "route_fraction": route_fraction,
+            "distance_along_m": distance_along,
+        })
+
+        if matched:
+            prev = (seg, t)
+            track.append({
+                "timestamp": timestamp,
+                "snapped_lat": snapped_lat,
+                "snapped_lng": snapped_lng,
+                "segment_index": seg,
+                "route_fraction": route_fraction,
+                "distance_along_m": distance_along,
+            })
+
+    return matches, track
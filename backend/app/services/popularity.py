@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.redis import redis_client
+
+# Sorted set of "train_no:date" -> exponentially decayed request count,
+# bumped by the live endpoints and decayed by the prefetch leader.
+POPULARITY_KEY = "train_popularity"
+# Redis TIME of the last decay, so a new leader carries on the same clock.
+POPULARITY_DECAYED_AT_KEY = "train_popularity:decayed_at"
+# Journeys this many days either side of today can be running (or about to).
+JOURNEY_DATE_WINDOW_DAYS = 3
+
+
+def popularity_member(train_no: str, date: str) -> str:
+    return f"{train_no}:{date}"
+
+
+def normalize_journey_date(date: str) -> Optional[str]:
+    """
+    ``date`` as ``YYYY-MM-DD`` if it parses and is within
+    :data:`JOURNEY_DATE_WINDOW_DAYS` of today, else None. The date is
+    request input, so anything else is not worth ranking or prefetching.
+    """
+    try:
+        parsed = datetime.strptime(date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+    if abs(parsed - datetime.now().date()) > timedelta(days=JOURNEY_DATE_WINDOW_DAYS):
+        return None
+    return parsed.isoformat()
+
+
+async def popularity_score(train_no: str, date: str) -> Optional[float]:
+    return await redis_client.zscore(POPULARITY_KEY, popularity_member(train_no, date))
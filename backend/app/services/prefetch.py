@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from app.clients.live_status_service import SOFT_TTL_SECONDS, live_status_service
+from app.redis import redis_client
+from app.services.popularity import (
+    POPULARITY_DECAYED_AT_KEY,
+    POPULARITY_KEY,
+    normalize_journey_date,
+    popularity_member,
+)
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "50"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+PREFETCH_INTERVAL_SECONDS = float(os.getenv("PREFETCH_INTERVAL_SECONDS", "5"))
+# Refresh this long before an entry turns stale.
+PREFETCH_LEAD_SECONDS = float(os.getenv("PREFETCH_LEAD_SECONDS", "15"))
+POPULARITY_HALF_LIFE_SECONDS = float(os.getenv("POPULARITY_HALF_LIFE_SECONDS", "900"))
+# An entry whose refresh fails is skipped for PREFETCH_INTERVAL_SECONDS,
+# doubling per consecutive failure up to this.
+PREFETCH_MAX_BACKOFF_SECONDS = float(os.getenv("PREFETCH_MAX_BACKOFF_SECONDS", "300"))
+
+LEADER_KEY = "lock:prefetch_leader"
+LEADER_TTL_MS = int(PREFETCH_INTERVAL_SECONDS * 3 * 1000)
+DECAY_INTERVAL_SECONDS = 60.0
+MAX_TRACKED = 2000
+# Members whose decayed score falls below this are forgotten.
+MIN_SCORE = 0.05
+
+# Extend the leader lock only if we still hold it.
+_RENEW_LEADER = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Decay the popularity set by the time since the last decay, recorded in
+# Redis next to it, and record the new one in the same atomic step. The
+# first call only starts the clock. Returns 1 if the set was decayed.
+_DECAY_POPULARITY = """
+local t = redis.call("time")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local last = tonumber(redis.call("get", KEYS[2]))
+if last and now - last < tonumber(ARGV[1]) then
+    return 0
+end
+redis.call("set", KEYS[2], string.format("%.6f", now))
+if not last then
+    return 0
+end
+local factor = 0.5 ^ ((now - last) / tonumber(ARGV[2]))
+redis.call("zunionstore", KEYS[1], 1, KEYS[1], "weights", string.format("%.17g", factor))
+redis.call("zremrangebyscore", KEYS[1], "-inf", ARGV[3])
+redis.call("zremrangebyrank", KEYS[1], 0, -(tonumber(ARGV[4]) + 1))
+return 1
+"""
+
+
+class Prefetcher:
+    """
+    Keeps live status warm for the most requested trains.
+
+    Requests bump a per ``train_no:date`` counter in a Redis sorted set that
+    decays exponentially (half-life :data:`POPULARITY_HALF_LIFE_SECONDS`), so
+    all workers share one popularity ranking. One worker at a time holds a
+    leader lock and, every :data:`PREFETCH_INTERVAL_SECONDS`, refreshes the
+    top-N entries that are missing or within :data:`PREFETCH_LEAD_SECONDS` of
+    going stale, at most :data:`PREFETCH_CONCURRENCY` upstream calls at once.
+    Entries whose refresh keeps failing back off exponentially, so a dead
+    train does not hammer upstream (or the shared circuit breaker).
+    """
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._pending: set = set()
+        self._semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+        self.hot: List[Dict] = []
+        self.last_scan_at: Optional[float] = None
+        self.refreshed = 0
+        self.failed = 0
+        self.last_lag_seconds: List[float] = []
+        # member -> (consecutive failures, monotonic time it may be retried).
+        self._backoff: Dict[str, Tuple[int, float]] = {}
+        self.backed_off = 0
+
+    def record(self, train_no: str, date: str) -> None:
+        """Count a request without delaying it; errors are only logged. Out-of-window dates are ignored."""
+        date = normalize_journey_date(date)
+        if date is None:
+            return
+        task = asyncio.create_task(self._record(popularity_member(train_no, date)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    @staticmethod
+    async def _record(member: str) -> None:
+        try:
+            await redis_client.zincrby(POPULARITY_KEY, 1.0, member)
+        except Exception as e:
+            logger.warning("Popularity update failed for %s: %s", member, e)
+
+    async def start(self) -> None:
+        if PREFETCH_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            try:
+                if await redis_client.get(LEADER_KEY) == self.node_id:
+                    await redis_client.delete(LEADER_KEY)
+            except Exception:
+                pass
+            self.is_leader = False
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self._hold_leadership():
+                    await self._decay_if_due()
+                    await self.scan()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Prefetch cycle failed: %s", e)
+            await asyncio.sleep(PREFETCH_INTERVAL_SECONDS)
+
+    async def _hold_leadership(self) -> bool:
+        if self.is_leader:
+            renewed = await redis_client.eval(_RENEW_LEADER, 1, LEADER_KEY, self.node_id, LEADER_TTL_MS)
+            self.is_leader = bool(renewed)
+        if not self.is_leader:
+            self.is_leader = bool(
+                await redis_client.set(LEADER_KEY, self.node_id, nx=True, px=LEADER_TTL_MS)
+            )
+        return self.is_leader
+
+    async def _decay_if_due(self) -> None:
+        await redis_client.eval(
+            _DECAY_POPULARITY, 2, POPULARITY_KEY, POPULARITY_DECAYED_AT_KEY,
+            DECAY_INTERVAL_SECONDS, POPULARITY_HALF_LIFE_SECONDS, MIN_SCORE, MAX_TRACKED,
+        )
+
+    async def hot_set(self, limit: int = PREFETCH_TOP_N) -> List[Dict]:
+        """Top ``limit`` ``train_no:date`` entries with their cache age."""
+        ranked = await redis_client.zrevrange(POPULARITY_KEY, 0, limit - 1, withscores=True)
+        if not ranked:
+            return []
+        members = [member.partition(":") for member, _ in ranked]
+        fetched = await asyncio.gather(
+            *(live_status_service.cached_at(train_no, date) for train_no, _, date in members)
+        )
+        now = time.time()
+        due_at = SOFT_TTL_SECONDS - PREFETCH_LEAD_SECONDS
+        hot = []
+        for (train_no, _, date), (_, score), fetched_at in zip(members, ranked, fetched):
+            age = now - fetched_at if fetched_at is not None else None
+            hot.append({
+                "train_no": train_no,
+                "date": date,
+                "score": round(score, 3),
+                "fetched_at": fetched_at,
+                "cache_age_seconds": round(age, 1) if age is not None else None,
+                # How far past its refresh point the entry is (None: not cached).
+                "lag_seconds": round(max(age - due_at, 0.0), 1) if age is not None else None,
+            })
+        return hot
+
+    async def scan(self) -> None:
+        """Refresh hot entries that are missing or about to go stale."""
+        self.hot = await self.hot_set()
+        self.last_scan_at = time.time()
+        due = [h for h in self.hot if h["lag_seconds"] is None or h["lag_seconds"] > 0]
+        self.last_lag_seconds = sorted(h["lag_seconds"] for h in due if h["lag_seconds"] is not None)
+
+        # Forget backoff for entries that dropped out of the hot set.
+        hot_members = {popularity_member(h["train_no"], h["date"]) for h in self.hot}
+        self._backoff = {m: b for m, b in self._backoff.items() if m in hot_members}
+        now = time.monotonic()
+        ready = [h for h in due if self._backoff.get(popularity_member(h["train_no"], h["date"]), (0, 0.0))[1] <= now]
+        self.backed_off += len(due) - len(ready)
+        await asyncio.gather(*(self._refresh(h) for h in ready))
+
+    async def _refresh(self, entry: Dict) -> None:
+        member = popularity_member(entry["train_no"], entry["date"])
+        async with self._semaphore:
+            try:
+                # Only a fetch newer than the one seen in the scan counts; without
+                # it the Redis lock path would hand back the cached entry as is.
+                await live_status_service.refresh(
+                    entry["train_no"], entry["date"], entry["fetched_at"] or 0.0, use_fallback=False,
+                )
+                self.refreshed += 1
+                self._backoff.pop(member, None)
+            except Exception as e:
+                self.failed += 1
+                failures = self._backoff.get(member, (0, 0.0))[0] + 1
+                delay = min(PREFETCH_INTERVAL_SECONDS * 2 ** min(failures - 1, 16), PREFETCH_MAX_BACKOFF_SECONDS)
+                self._backoff[member] = (failures, time.monotonic() + delay)
+                logger.info("Prefetch of %s failed (%d in a row, next try in %.0fs): %s", member, failures, delay, e)
+
+    def stats(self) -> Dict:
+        lag = self.last_lag_seconds
+        return {
+            "enabled": PREFETCH_ENABLED,
+            "leader": self.is_leader,
+            "top_n": PREFETCH_TOP_N,
+            "concurrency": PREFETCH_CONCURRENCY,
+            "last_scan_at": self.last_scan_at,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "backing_off": len(self._backoff),
+            "backed_off_skips": self.backed_off,
+            "hot_size": len(self.hot),
+            "last_scan_lag_seconds": {
+                "due": len(lag),
+                "p50": lag[len(lag) // 2] if lag else None,
+                "max": lag[-1] if lag else None,
+            },
+        }
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,131 @@
+import calendar
+import logging
+import math
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from app.database.db import get_pool
+from app.redis import redis_client
+from app.services.popularity import popularity_score
+
+logger = logging.getLogger(__name__)
+
+IRCTC_MONTHLY_QUOTA = int(os.getenv("IRCTC_MONTHLY_QUOTA", "25"))
+# Calls a popular train may spend ahead of an even pace through the month.
+IRCTC_QUOTA_BURST = int(os.getenv("IRCTC_QUOTA_BURST", "3"))
+# Decayed request score (see app.services.popularity) that counts as high demand.
+IRCTC_MIN_POPULARITY = float(os.getenv("IRCTC_MIN_POPULARITY", "5"))
+ALERT_CACHE_SECONDS = 60.0
+
+# Increment only while below the limit; returns the new count or -1.
+_SPEND = """
+local used = tonumber(redis.call("get", KEYS[1]) or "0")
+if used >= tonumber(ARGV[1]) then
+    return -1
+end
+used = redis.call("incr", KEYS[1])
+redis.call("expire", KEYS[1], ARGV[2])
+return used
+"""
+
+
+class QuotaLedger:
+    """Calls spent against a monthly upstream quota, counted in Redis per calendar month (UTC)."""
+
+    def __init__(self, name: str, monthly_budget: int, burst: int):
+        self.name = name
+        self.monthly_budget = monthly_budget
+        self.burst = burst
+
+    def _key(self, now: datetime) -> str:
+        return f"quota:{self.name}:{now:%Y-%m}"
+
+    def paced_allowance(self, now: datetime) -> int:
+        """Budget released so far this month on an even pace, plus the burst."""
+        days = calendar.monthrange(now.year, now.month)[1]
+        elapsed = (now.day - 1 + (now.hour * 3600 + now.minute * 60 + now.second) / 86400) / days
+        return min(self.monthly_budget, math.ceil(self.monthly_budget * elapsed) + self.burst)
+
+    async def try_spend(self, limit: int) -> bool:
+        now = datetime.now(timezone.utc)
+        used = await redis_client.eval(_SPEND, 1, self._key(now), limit, 40 * 86400)
+        return int(used) >= 0
+
+    async def used(self) -> int:
+        return int(await redis_client.get(self._key(datetime.now(timezone.utc))) or 0)
+
+    async def snapshot(self) -> Dict:
+        now = datetime.now(timezone.utc)
+        return {
+            "month": f"{now:%Y-%m}",
+            "used": await self.used(),
+            "monthly_budget": self.monthly_budget,
+            "paced_allowance": self.paced_allowance(now),
+        }
+
+
+class FallbackAdmission:
+    """
+    Decides whether a primary failure may spend IRCTC quota on a train.
+
+    Trains with untriggered alerts may use the whole monthly budget. Trains
+    whose decayed request score is at least :data:`IRCTC_MIN_POPULARITY`
+    may use only the paced allowance. Everything else is refused, so callers
+    go straight to their cached or static-schedule path. If the ledger or
+    the alert lookup is unavailable, the fallback is refused.
+    """
+
+    def __init__(self, ledger: QuotaLedger):
+        self.ledger = ledger
+        self._alert_trains: Dict[str, Tuple[float, bool]] = {}
+        self.decisions: Dict[str, int] = {}
+
+    async def admit(self, train_no: str, date: str) -> Tuple[bool, str]:
+        try:
+            if await self._has_active_alert(train_no):
+                admitted, reason = await self.ledger.try_spend(self.ledger.monthly_budget), "active_alert"
+            elif (await popularity_score(train_no, date) or 0.0) >= IRCTC_MIN_POPULARITY:
+                limit = self.ledger.paced_allowance(datetime.now(timezone.utc))
+                admitted, reason = await self.ledger.try_spend(limit), "popular"
+            else:
+                admitted, reason = False, "low_priority"
+        except Exception as e:
+            logger.warning("Quota admission failed for %s: %s", train_no, e)
+            admitted, reason = False, "admission_unavailable"
+
+        if not admitted and reason in ("active_alert", "popular"):
+            reason = f"{reason}_over_budget"
+        key = f"{'admitted' if admitted else 'refused'}:{reason}"
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+        return admitted, reason
+
+    async def _has_active_alert(self, train_no: str) -> bool:
+        cached: Optional[Tuple[float, bool]] = self._alert_trains.get(train_no)
+        if cached and time.monotonic() - cached[0] < ALERT_CACHE_SECONDS:
+            return cached[1]
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            active = await conn.fetchval(
+                """
+                SELECT EXISTS (
+                    SELECT 1 FROM alerts a
+                    JOIN trains t ON t.id = a.train_id
+                    WHERE t.number = $1 AND NOT a.triggered
+                )
+                """,
+                train_no,
+            )
+        self._alert_trains[train_no] = (time.monotonic(), bool(active))
+        return bool(active)
+
+    async def stats(self) -> Dict:
+        try:
+            ledger = await self.ledger.snapshot()
+        except Exception as e:
+            ledger = {"error": str(e)}
+        return {**ledger, "decisions": self.decisions}
+
+
+irctc_admission = FallbackAdmission(QuotaLedger("irctc_rapidapi", IRCTC_MONTHLY_QUOTA, IRCTC_QUOTA_BURST))
@@ -1,4 +1,5 @@
 import logging
+import os
 
 from fastapi import HTTPException, Request
 
@@ -6,7 +7,7 @@ from app.redis import redis_client
 
 logger = logging.getLogger(__name__)
 
-MAX_REQUESTS = 60
+MAX_REQUESTS = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", "60"))
 WINDOW_SECONDS = 60
 
 
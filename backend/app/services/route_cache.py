@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import asyncpg
+
+from app.database.db import get_pool
+from app.services.codec import json_loads
+from app.services.snap import CompiledRoute
+from app.services.segment_index import build_segment_index
+from app.services.stop_offsets import StopOffsets
+
+logger = logging.getLogger(__name__)
+
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "512"))
+ROUTE_CACHE_MAX_BYTES = int(os.getenv("ROUTE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# peek() serves an entry without a DB check for this long, then re-checks
+# its version in the background.
+ROUTE_CACHE_REVALIDATE_SECONDS = float(os.getenv("ROUTE_CACHE_REVALIDATE_SECONDS", "30"))
+# Below this many segments a vectorised linear scan beats building an index.
+INDEX_MIN_SEGMENTS = 512
+# Trains found to have no geometry are remembered (until re-checked) up to this many.
+MAX_MISSING_TRACKED = 4096
+
+_VERSION_COLUMNS = """
+    SELECT rg.train_id, rg.updated_at, ps.projected_at
+    FROM route_geometry rg
+    LEFT JOIN route_stop_projection_state ps ON ps.train_id = rg.train_id
+"""
+
+
+def decode_geometry(value: Any) -> list:
+    """asyncpg returns JSONB as text unless a codec is registered; accept both."""
+    if value is None:
+        return []
+    if isinstance(value, (str, bytes)):
+        return json_loads(value)
+    return value
+
+
+class CachedRoute:
+    __slots__ = ("train_id", "updated_at", "projected_at", "route", "stops", "checked_at", "counted_bytes")
+
+    def __init__(
+        self,
+        train_id: str,
+        updated_at: Optional[datetime],
+        route: CompiledRoute,
+        projected_at: Optional[datetime] = None,
+        stops: Optional[StopOffsets] = None,
+    ):
+        self.train_id = train_id
+        self.updated_at = updated_at
+        self.projected_at = projected_at
+        self.route = route
+        self.stops = stops
+        self.checked_at = time.monotonic()
+        # What the cache last charged this entry against its byte budget.
+        self.counted_bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        # Live: lazily built derivatives (e.g. simplification importance) grow the route.
+        return self.route.nbytes
+
+
+class RouteCache:
+    """
+    Bounded in-process LRU of compiled route geometries keyed by train id.
+
+    :meth:`get` does a cheap ``(train_id, updated_at)`` query per lookup; the
+    full JSONB geometry is only fetched and compiled when the entry is
+    missing or its ``updated_at`` no longer matches the row. Stop offsets
+    from ``scripts/project_stops.py`` are versioned separately by their
+    ``projected_at`` and reloaded without recompiling the geometry.
+
+    :meth:`peek` is the non-blocking form for hot paths: it answers from
+    memory only and leaves missing or due entries to a background refresh.
+
+    The byte budget is checked against a running total. Routes grow after
+    they are cached (simplification importance, encoded payloads, a segment
+    index), so callers that add such an artifact call :meth:`resize`, and
+    hits re-measure their entry in case one was missed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ROUTE_CACHE_MAX_ENTRIES,
+        max_bytes: int = ROUTE_CACHE_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedRoute]" = OrderedDict()
+        # train id -> monotonic time it was found to have no geometry.
+        self._missing: Dict[str, float] = {}
+        self._warming: set = set()
+        self._tasks: set = set()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stop_reloads = 0
+        self.cold_skips = 0
+
+    async def get(self, conn: asyncpg.Connection, train_id: str) -> Optional[CachedRoute]:
+        """Resolve ``train_id`` (number or UUID) and return its compiled route, or None."""
+        row = await conn.fetchrow(
+            f"""
+            {_VERSION_COLUMNS}
+            JOIN trains t ON t.id = rg.train_id
+            WHERE t.number = $1 OR t.id::text = $1
+            """,
+            train_id,
+        )
+        if not row:
+            return None
+        entries = await self._sync(conn, [row], count_hits=True)
+        return entries.get(str(row["train_id"]))
+
+    def peek(self, train_ids: Iterable[str]) -> Dict[str, CachedRoute]:
+        """
+        Cached routes for these train UUIDs, without touching the database.
+        Missing entries, and entries not checked for
+        :data:`ROUTE_CACHE_REVALIDATE_SECONDS`, are refreshed in one
+        background batch; callers go without them until it lands.
+        """
+        now = time.monotonic()
+        found: Dict[str, CachedRoute] = {}
+        due: List[str] = []
+        for train_id in train_ids:
+            entry = self._entries.get(train_id)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(train_id)
+                self._recount(entry)
+                found[train_id] = entry
+                if now - entry.checked_at >= ROUTE_CACHE_REVALIDATE_SECONDS:
+                    due.append(train_id)
+            elif now - self._missing.get(train_id, -ROUTE_CACHE_REVALIDATE_SECONDS) >= ROUTE_CACHE_REVALIDATE_SECONDS:
+                self.cold_skips += 1
+                due.append(train_id)
+        if due:
+            self._refresh_in_background(due)
+        self._evict()
+        return found
+
+    def _refresh_in_background(self, train_ids: List[str]) -> None:
+        due = [t for t in dict.fromkeys(train_ids) if t not in self._warming]
+        if not due:
+            return
+        self._warming.update(due)
+
+        async def refresh():
+            try:
+                pool = await get_pool()
+                async with pool.acquire() as conn:
+                    rows = await conn.fetch(f"{_VERSION_COLUMNS} WHERE rg.train_id = ANY($1::uuid[])", due)
+                    found = await self._sync(conn, rows)
+                checked = time.monotonic()
+                if len(self._missing) > MAX_MISSING_TRACKED:
+                    self._missing.clear()
+                for train_id in due:
+                    if train_id in found:
+                        self._missing.pop(train_id, None)
+                    else:
+                        # Geometry deleted (or never loaded): stop serving it.
+                        self._remove(train_id)
+                        self._missing[train_id] = checked
+            except Exception as e:
+                logger.warning("Background route cache refresh failed for %d trains: %s", len(due), e)
+            finally:
+                self._warming.difference_update(due)
+
+        # Keep a reference so the task is not garbage-collected mid-flight.
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _sync(
+        self,
+        conn: asyncpg.Connection,
+        rows: List[asyncpg.Record],
+        count_hits: bool = False,
+    ) -> Dict[str, CachedRoute]:
+        """Bring entries in line with their version rows; geometries and stops load in one query each."""
+        result: Dict[str, CachedRoute] = {}
+        restop: List[Tuple[CachedRoute, Optional[datetime]]] = []
+        cold: List[asyncpg.Record] = []
+        now = time.monotonic()
+        for row in rows:
+            key = str(row["train_id"])
+            entry = self._entries.get(key)
+            if entry is not None and entry.updated_at == row["updated_at"]:
+                if count_hits:
+                    self.hits += 1
+                self._entries.move_to_end(key)
+                self._recount(entry)
+                entry.checked_at = now
+                if entry.projected_at != row["projected_at"]:
+                    restop.append((entry, row["projected_at"]))
+                result[key] = entry
+                continue
+            if entry is not None:
+                self.invalidations += 1
+                self._remove(key)
+            self.misses += 1
+            cold.append(row)
+
+        if restop:
+            stops = await self._load_stops(conn, [e.train_id for e, projected_at in restop if projected_at])
+            for entry, projected_at in restop:
+                entry.stops = stops.get(entry.train_id)
+                entry.projected_at = projected_at
+                self.stop_reloads += 1
+
+        if cold:
+            geometries = {
+                str(r["train_id"]): decode_geometry(r["geometry"])
+                for r in await conn.fetch(
+                    "SELECT train_id, geometry FROM route_geometry WHERE train_id = ANY($1::uuid[])",
+                    [r["train_id"] for r in cold],
+                )
+            }
+            stops = await self._load_stops(conn, [str(r["train_id"]) for r in cold if r["projected_at"]])
+            for row in cold:
+                key = str(row["train_id"])
+                geometry = geometries.get(key)
+                if not geometry:
+                    continue
+                route = await asyncio.to_thread(self._compile, geometry)
+                entry = CachedRoute(key, row["updated_at"], route, row["projected_at"], stops.get(key))
+                self._insert(entry)
+                result[key] = entry
+        self._evict()
+        return result
+
+    @staticmethod
+    async def _load_stops(conn: asyncpg.Connection, train_ids: List[str]) -> Dict[str, StopOffsets]:
+        if not train_ids:
+            return {}
+        rows = await conn.fetch(
+            """
+            SELECT o.train_id, o.sequence, o.offset_m, s.id, s.code, s.name
+            FROM route_stop_offsets o
+            JOIN stations s ON s.id = o.station_id
+            WHERE o.train_id = ANY($1::uuid[]) AND o.offset_m IS NOT NULL
+            """,
+            train_ids,
+        )
+        by_train: Dict[str, List[Dict]] = {train_id: [] for train_id in train_ids}
+        for r in rows:
+            by_train[str(r["train_id"])].append({
+                "sequence": r["sequence"],
+                "offset_m": r["offset_m"],
+                "station_id": str(r["id"]),
+                "station_code": r["code"],
+                "station_name": r["name"],
+            })
+        return {train_id: StopOffsets(stops) for train_id, stops in by_train.items()}
+
+    @staticmethod
+    def _compile(geometry: list) -> CompiledRoute:
+        route = CompiledRoute.from_geometry(geometry)
+        if route.segment_count >= INDEX_MIN_SEGMENTS:
+            build_segment_index(route)
+        return route
+
+    def resize(self, entry: CachedRoute) -> None:
+        """Re-measure ``entry`` after its route gained a derived artifact, evicting if over budget."""
+        if self._entries.get(entry.train_id) is entry:
+            self._recount(entry)
+            self._evict()
+
+    def _recount(self, entry: CachedRoute) -> None:
+        nbytes = entry.nbytes
+        self._bytes += nbytes - entry.counted_bytes
+        entry.counted_bytes = nbytes
+
+    def _insert(self, entry: CachedRoute) -> None:
+        if entry.train_id in self._entries:
+            self._remove(entry.train_id)
+        self._entries[entry.train_id] = entry
+        self._recount(entry)
+        self._evict()
+
+    def _evict(self) -> None:
+        # The most recently used entry always stays, even if it alone is over budget.
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.counted_bytes
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stop_reloads": self.stop_reloads,
+            "cold_skips": self.cold_skips,
+            "refreshing": len(self._warming),
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+route_cache = RouteCache()
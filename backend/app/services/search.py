@@ -0,0 +1,174 @@
+import base64
+import json
+import logging
+import time
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+# Re-check whether pg_trgm is installed this often.
+TRIGRAM_CHECK_SECONDS = 300.0
+
+_trigram: Tuple[float, bool] = (0.0, False)
+
+
+class SearchSpec(NamedTuple):
+    table: str
+    columns: str
+    name_column: str
+    # Matched exactly (case-insensitive) and by substring, e.g. a station code.
+    code_column: Optional[str] = None
+
+
+STATION_SEARCH = SearchSpec("stations", "id, code, name, lat, lng, zone", "name", "code")
+TRAIN_SEARCH = SearchSpec("trains", "id, number, name, type", "name")
+
+
+async def trigram_available(conn: asyncpg.Connection) -> bool:
+    global _trigram
+    checked_at, available = _trigram
+    if time.monotonic() - checked_at < TRIGRAM_CHECK_SECONDS:
+        return available
+    available = bool(await conn.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+    ))
+    _trigram = (time.monotonic(), available)
+    return available
+
+
+def encode_cursor(mode: str, key: List[Any]) -> str:
+    raw = json.dumps({"m": mode, "k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, mode: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        key = payload["k"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("m") != mode or not isinstance(key, list):
+        raise ValueError("Cursor does not belong to this search")
+    return key
+
+
+def _like_escape(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def search(
+    conn: asyncpg.Connection,
+    spec: SearchSpec,
+    q: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[str] = None,
+) -> Tuple[List[asyncpg.Record], Optional[str]]:
+    """
+    Search ``spec.table`` and return one page of rows plus the cursor for
+    the next page (``None`` on the last page).
+
+    With pg_trgm installed, matches (substring, or word similarity on the
+    name) are ranked: exact code first, then name prefix, then similarity.
+    Without it, or with no query, rows are plain ``ILIKE`` matches in name
+    order. Pages are keyset-paginated on the sort key; ``limit=None``
+    returns every match.
+    """
+    if q and await trigram_available(conn):
+        try:
+            return await _ranked(conn, spec, q, limit, cursor)
+        except asyncpg.UndefinedFunctionError:
+            logger.warning("pg_trgm functions missing, falling back to ILIKE search")
+            global _trigram
+            _trigram = (time.monotonic(), False)
+    return await _ordered(conn, spec, q, limit, cursor)
+
+
+async def _ranked(conn, spec: SearchSpec, q: str, limit, cursor) -> Tuple[List[asyncpg.Record], Optional[str]]:
+    name = spec.name_column
+    code = spec.code_column
+    args: List[Any] = [q, f"%{_like_escape(q)}%", f"{_like_escape(q)}%"]
+    where = [f"{name} ILIKE $2", f"$1 <% {name}"]
+    similarity = f"word_similarity($1, {name})"
+    exact = "1"
+    if code:
+        where.append(f"{code} ILIKE $2")
+        similarity = f"GREATEST({similarity}, similarity($1, {code}))"
+        exact = f"CASE WHEN lower({code}) = lower($1) THEN 0 ELSE 1 END"
+
+    after = ""
+    if cursor:
+        key = decode_cursor(cursor, "ranked")
+        if len(key) != 5:
+            raise ValueError("Invalid cursor")
+        args.extend(key)
+        after = "WHERE (k_exact, k_prefix, k_score, k_name, k_id) > ($4::int, $5::int, $6::float8, $7::text, $8::text)"
+    page = ""
+    if limit is not None:
+        args.append(limit + 1)
+        page = f"LIMIT ${len(args)}"
+
+    rows = await conn.fetch(
+        f"""
+        SELECT * FROM (
+            SELECT {spec.columns},
+                   {exact} AS k_exact,
+                   CASE WHEN {name} ILIKE $3 THEN 0 ELSE 1 END AS k_prefix,
+                   -({similarity})::float8 AS k_score,
+                   {name}::text AS k_name,
+                   id::text AS k_id
+            FROM {spec.table}
+            WHERE {" OR ".join(where)}
+        ) matches
+        {after}
+        ORDER BY k_exact, k_prefix, k_score, k_name, k_id
+        {page}
+        """,
+        *args,
+    )
+    return _page(rows, limit, "ranked", ("k_exact", "k_prefix", "k_score", "k_name", "k_id"))
+
+
+async def _ordered(conn, spec: SearchSpec, q: Optional[str], limit, cursor) -> Tuple[List[asyncpg.Record], Optional[str]]:
+    name = spec.name_column
+    args: List[Any] = []
+    where = []
+    if q:
+        args.append(f"%{_like_escape(q)}%")
+        matches = [f"{name} ILIKE $1"]
+        if spec.code_column:
+            matches.append(f"{spec.code_column} ILIKE $1")
+        where.append(f"({' OR '.join(matches)})")
+    if cursor:
+        key = decode_cursor(cursor, "ordered")
+        if len(key) != 2:
+            raise ValueError("Invalid cursor")
+        args.extend(key)
+        where.append(f"({name}::text, id::text) > (${len(args) - 1}::text, ${len(args)}::text)")
+    page = ""
+    if limit is not None:
+        args.append(limit + 1)
+        page = f"LIMIT ${len(args)}"
+
+    rows = await conn.fetch(
+        f"""
+        SELECT {spec.columns}, {name}::text AS k_name, id::text AS k_id
+        FROM {spec.table}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {name}::text, id::text
+        {page}
+        """,
+        *args,
+    )
+    return _page(rows, limit, "ordered", ("k_name", "k_id"))
+
+
+def _page(rows: List[asyncpg.Record], limit: Optional[int], mode: str, key_columns: Tuple[str, ...]):
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(mode, [rows[-1][c] for c in key_columns])
@@ -0,0 +1,199 @@
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.services.snap import EARTH_RADIUS, CompiledRoute, _project
+
+# Grid cells are this many times the median segment extent.
+CELL_FACTOR = 4.0
+MIN_CELL_DEG = 1e-5
+# Cap on (segment, cell) entries per segment before the cell size is doubled,
+# so a few very long segments cannot blow up the grid.
+MAX_ENTRIES_PER_SEGMENT = 8
+DEFAULT_SEARCH_RADIUS_M = 2000.0
+
+
+class SegmentGrid:
+    """
+    Uniform grid over segment bounding boxes of a :class:`CompiledRoute`.
+
+    Occupied cells are stored sparsely in CSR form: ``cell_keys`` (sorted,
+    unique) with ``cell_start``/``cell_end`` slices into ``segment_ids``.
+    A query scans the square of cells around the user, widening it only
+    while the best candidate could still be beaten by a segment outside
+    the square, so results are identical to the linear scan.
+    """
+
+    def __init__(self, route: CompiledRoute, cell_deg: Optional[float] = None):
+        started = time.perf_counter()
+        self.route = route
+
+        n_seg = route.segment_count
+        lng1, lng2 = route.lng[:-1], route.lng[1:]
+        lat1, lat2 = route.lat[:-1], route.lat[1:]
+        min_x, max_x = np.minimum(lng1, lng2), np.maximum(lng1, lng2)
+        min_y, max_y = np.minimum(lat1, lat2), np.maximum(lat1, lat2)
+
+        self.origin_x = float(route.lng.min()) if route.point_count else 0.0
+        self.origin_y = float(route.lat.min()) if route.point_count else 0.0
+        self.max_abs_lat = float(np.abs(route.lat).max()) if route.point_count else 0.0
+
+        if cell_deg is None:
+            extent = np.maximum(max_x - min_x, max_y - min_y)
+            median = float(np.median(extent)) if n_seg else 0.0
+            cell_deg = max(median * CELL_FACTOR, MIN_CELL_DEG)
+
+        while True:
+            ix0 = np.floor((min_x - self.origin_x) / cell_deg).astype(np.int64)
+            ix1 = np.floor((max_x - self.origin_x) / cell_deg).astype(np.int64)
+            iy0 = np.floor((min_y - self.origin_y) / cell_deg).astype(np.int64)
+            iy1 = np.floor((max_y - self.origin_y) / cell_deg).astype(np.int64)
+            widths = iy1 - iy0 + 1
+            counts = (ix1 - ix0 + 1) * widths
+            total = int(counts.sum())
+            if total <= MAX_ENTRIES_PER_SEGMENT * n_seg + 1024:
+                break
+            cell_deg *= 2
+
+        self.cell_deg = cell_deg
+        self.nx = int(ix1.max()) + 1 if n_seg else 1
+        self.ny = int(iy1.max()) + 1 if n_seg else 1
+
+        seg_rep = np.repeat(np.arange(n_seg, dtype=np.int64), counts)
+        offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        width_rep = np.repeat(widths, counts)
+        cx = np.repeat(ix0, counts) + offsets // width_rep
+        cy = np.repeat(iy0, counts) + offsets % width_rep
+        keys = cx * self.ny + cy
+
+        order = np.lexsort((seg_rep, keys))
+        keys = keys[order]
+        self.segment_ids = np.ascontiguousarray(seg_rep[order].astype(np.int32))
+        self.cell_keys, self.cell_start = np.unique(keys, return_index=True)
+        self.cell_end = np.append(self.cell_start[1:], total)
+
+        self.build_seconds = time.perf_counter() - started
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.candidates_checked = 0
+        self.linear_fallbacks = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (
+            self.segment_ids, self.cell_keys, self.cell_start, self.cell_end,
+        ))
+
+    def _candidates(self, cx: int, cy: int, k: int) -> Optional[np.ndarray]:
+        """
+        Segment ids in the square of cells around ``(cx, cy)``, or None when
+        the square holds more cells than the grid has occupied (scan linearly).
+        """
+        xs = np.arange(max(cx - k, 0), min(cx + k, self.nx - 1) + 1, dtype=np.int64)
+        ys = np.arange(max(cy - k, 0), min(cy + k, self.ny - 1) + 1, dtype=np.int64)
+        if xs.size == 0 or ys.size == 0:
+            return np.empty(0, dtype=np.int32)
+        if xs.size * ys.size > self.cell_keys.size:
+            return None
+
+        keys = np.add.outer(xs * self.ny, ys).ravel()
+        pos = np.searchsorted(self.cell_keys, keys)
+        inside = pos < self.cell_keys.size
+        pos, keys = pos[inside], keys[inside]
+        pos = pos[self.cell_keys[pos] == keys]
+        if pos.size == 0:
+            return np.empty(0, dtype=np.int32)
+
+        starts = self.cell_start[pos]
+        lengths = self.cell_end[pos] - starts
+        idx = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(int(lengths.sum()))
+        return np.unique(self.segment_ids[idx])
+
+    def _clearance_m(self, user_lat: float, user_lng: float, cx: int, cy: int, k: int) -> float:
+        """Lower bound on the distance from the user to any segment outside the searched square."""
+        cell = self.cell_deg
+        bounds = []
+
+        if cy - k > 0:
+            bounds.append(user_lat - (self.origin_y + (cy - k) * cell))
+        if cy + k < self.ny - 1:
+            bounds.append(self.origin_y + (cy + k + 1) * cell - user_lat)
+        lat_m = min(bounds) if bounds else math.inf
+        lat_m = EARTH_RADIUS * math.radians(lat_m) if math.isfinite(lat_m) else math.inf
+
+        bounds = []
+        if cx - k > 0:
+            bounds.append(user_lng - (self.origin_x + (cx - k) * cell))
+        if cx + k < self.nx - 1:
+            bounds.append(self.origin_x + (cx + k + 1) * cell - user_lng)
+        if bounds:
+            # hav(d) >= cos(lat_user) * cos(lat_max) * hav(dlng)
+            scale = math.cos(math.radians(user_lat)) * math.cos(math.radians(self.max_abs_lat))
+            half = min(math.radians(min(bounds)) / 2, math.pi / 2)
+            lng_m = 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(max(scale, 0.0)) * math.sin(half)))
+        else:
+            lng_m = math.inf
+
+        return min(lat_m, lng_m)
+
+    def nearest(
+        self,
+        user_lat: float,
+        user_lng: float,
+        radius_m: float = DEFAULT_SEARCH_RADIUS_M,
+    ) -> Tuple[int, float, float, Optional[float], Optional[float]]:
+        """Same contract as ``snap._project`` over all segments."""
+        if not (math.isfinite(user_lat) and math.isfinite(user_lng)):
+            # NaN/inf has no grid cell; report no match like an empty route.
+            return -1, 0.0, float("inf"), None, None
+        started = time.perf_counter()
+        route = self.route
+
+        cx = math.floor((user_lng - self.origin_x) / self.cell_deg)
+        cy = math.floor((user_lat - self.origin_y) / self.cell_deg)
+        metres_per_cell = EARTH_RADIUS * math.radians(self.cell_deg)
+        k = max(1, math.ceil(radius_m / metres_per_cell))
+
+        while True:
+            covers_all = cx - k <= 0 and cy - k <= 0 and cx + k >= self.nx - 1 and cy + k >= self.ny - 1
+            candidates = None if covers_all else self._candidates(cx, cy, k)
+
+            if candidates is None or candidates.size * 2 >= route.segment_count:
+                result = _project(route, user_lat, user_lng)
+                self.linear_fallbacks += 1
+                self.candidates_checked += route.segment_count
+                break
+
+            if candidates.size:
+                result = _project(route, user_lat, user_lng, candidates)
+                self.candidates_checked += int(candidates.size)
+                if result[0] >= 0 and result[2] <= self._clearance_m(user_lat, user_lng, cx, cy, k):
+                    break
+            k *= 2
+
+        self.query_count += 1
+        self.query_seconds += time.perf_counter() - started
+        return result
+
+    def stats(self) -> Dict:
+        queries = self.query_count
+        return {
+            "segments": self.route.segment_count,
+            "cell_deg": self.cell_deg,
+            "occupied_cells": int(self.cell_keys.size),
+            "entries": int(self.segment_ids.size),
+            "nbytes": self.nbytes,
+            "build_ms": self.build_seconds * 1000,
+            "queries": queries,
+            "avg_query_us": (self.query_seconds / queries * 1e6) if queries else None,
+            "avg_candidates": (self.candidates_checked / queries) if queries else None,
+            "linear_fallbacks": self.linear_fallbacks,
+        }
+
+
+def build_segment_index(route: CompiledRoute, cell_deg: Optional[float] = None) -> SegmentGrid:
+    """Build a :class:`SegmentGrid` and attach it to ``route`` so snaps use it."""
+    route.index = SegmentGrid(route, cell_deg)
+    return route.index
@@ -0,0 +1,93 @@
+import math
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.snap import EARTH_RADIUS, CompiledRoute
+
+# Precomputed levels of detail, in metres of allowed deviation.
+LOD_TOLERANCES_M = (5.0, 20.0, 80.0, 320.0, 1280.0)
+# Web-mercator metres per pixel at zoom 0 on the equator (256 px tiles).
+METRES_PER_PIXEL_Z0 = 156543.03392
+
+
+def vertex_importance(route: CompiledRoute) -> np.ndarray:
+    """
+    Douglas-Peucker importance per vertex, in metres.
+
+    Each vertex gets the largest tolerance at which DP would still keep it
+    (its split distance, capped by its ancestors'), so the DP simplification
+    for any tolerance is simply ``importance > tolerance``. Distances are
+    measured in a local equirectangular projection around the route's mean
+    latitude. Cached on ``route`` after the first call.
+    """
+    if route.importance is not None:
+        return route.importance
+
+    n = route.point_count
+    importance = np.zeros(n, dtype=np.float64)
+    if n:
+        importance[0] = importance[-1] = np.inf
+
+    scale = math.cos(math.radians(float(route.lat.mean()))) if n else 1.0
+    x = EARTH_RADIUS * np.radians(route.lng) * scale
+    y = EARTH_RADIUS * np.radians(route.lat)
+
+    # Breadth-first: split every open range of the current depth in one
+    # vectorised pass rather than one small NumPy call per range.
+    a = np.array([0], dtype=np.int64)
+    b = np.array([n - 1], dtype=np.int64)
+    parent = np.array([np.inf])
+    while a.size:
+        interior = b - a - 1
+        open_ = interior > 0
+        a, b, parent, interior = a[open_], b[open_], parent[open_], interior[open_]
+        if not a.size:
+            break
+
+        offsets = np.cumsum(interior) - interior
+        owner = np.repeat(np.arange(a.size), interior)
+        idx = np.repeat(a + 1 - offsets, interior) + np.arange(int(interior.sum()))
+
+        ax, ay = x[a][owner], y[a][owner]
+        dx, dy = (x[b] - x[a])[owner], (y[b] - y[a])[owner]
+        len2 = dx * dx + dy * dy
+        t = np.divide(
+            (x[idx] - ax) * dx + (y[idx] - ay) * dy,
+            len2,
+            out=np.zeros_like(len2),
+            where=len2 > 0,
+        )
+        np.clip(t, 0.0, 1.0, out=t)
+        d = np.hypot(x[idx] - (ax + t * dx), y[idx] - (ay + t * dy))
+
+        range_max = np.maximum.reduceat(d, offsets)
+        hits = np.flatnonzero(d == range_max[owner])
+        _, first = np.unique(owner[hits], return_index=True)
+        k = idx[hits[first]]
+
+        value = np.minimum(range_max, parent)
+        importance[k] = value
+        a, b, parent = np.concatenate((a, k)), np.concatenate((k, b)), np.concatenate((value, value))
+
+    route.importance = importance
+    return importance
+
+
+def simplified_geometry(route: CompiledRoute, tolerance_m: float) -> List[List[float]]:
+    """``[[lng, lat], ...]`` of the Douglas-Peucker simplification at ``tolerance_m``."""
+    keep = vertex_importance(route) > tolerance_m
+    return np.column_stack((route.lng[keep], route.lat[keep])).tolist()
+
+
+def zoom_to_tolerance(zoom: float, lat: float) -> float:
+    """About one screen pixel, in metres, at ``zoom`` and latitude ``lat``."""
+    return METRES_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def resolve_lod(tolerance_m: Optional[float]) -> Optional[float]:
+    """Coarsest precomputed level not exceeding ``tolerance_m``; None means full resolution."""
+    if tolerance_m is None:
+        return None
+    levels = [level for level in LOD_TOLERANCES_M if level <= tolerance_m]
+    return levels[-1] if levels else None
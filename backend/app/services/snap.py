@@ -1,5 +1,7 @@
 import math
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
 EARTH_RADIUS = 6371000
 
@@ -63,4 +65,196 @@ def snap_to_route(
         "distance_meters": min_distance,
         "segment_index": best_segment_index,
         "route_fraction": route_fraction,
-    }
\ No newline at end of file
+    }
+
+
+def haversine_np(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Vectorised :func:`haversine`; accepts scalars or float64 arrays (degrees)."""
+    lat1, lng1, lat2, lng2 = (np.radians(v) for v in (lat1, lng1, lat2, lng2))
+
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+
+    a = (np.sin(dlat / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2)
+    a = np.clip(a, 0.0, 1.0)
+
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS * c
+
+
+class CompiledRoute:
+    """
+    A route geometry packed once into contiguous float64 arrays so every
+    snap is a handful of bulk NumPy operations instead of a Python loop.
+
+    ``lng``/``lat`` hold the vertices; the ``seg_*`` arrays hold per-segment
+    start points, deltas and squared lengths (all in degree space, matching
+    :func:`snap_to_route`).
+    """
+
+    def __init__(self, lng: np.ndarray, lat: np.ndarray):
+        self.lng = np.ascontiguousarray(lng, dtype=np.float64)
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+
+        self.seg_dx = np.ascontiguousarray(self.lng[1:] - self.lng[:-1])
+        self.seg_dy = np.ascontiguousarray(self.lat[1:] - self.lat[:-1])
+        self.seg_len2 = self.seg_dx * self.seg_dx + self.seg_dy * self.seg_dy
+        self.seg_valid = self.seg_len2 > 0
+
+        # Metre lengths per segment and their prefix sums: cum_m[i] is the
+        # along-route distance of vertex i.
+        self.seg_len_m = haversine_np(self.lat[:-1], self.lng[:-1], self.lat[1:], self.lng[1:])
+        self.cum_m = np.concatenate(([0.0], np.cumsum(self.seg_len_m)))
+
+        # Optional spatial index (see app.services.segment_index); when set,
+        # snap_compiled only projects onto nearby candidate segments.
+        self.index = None
+        # Per-vertex Douglas-Peucker importance (see app.services.simplify),
+        # computed lazily the first time a simplified level is requested.
+        self.importance: Optional[np.ndarray] = None
+        # Encoded response payloads (see app.services.geometry_codec) keyed by
+        # (format, tolerance_m), so repeated requests skip re-encoding. They
+        # are output only, not a compact form of the route, and count towards
+        # nbytes so the route cache byte budget bounds them.
+        self.encodings: Dict[Tuple[str, Optional[float]], Tuple[Any, int]] = {}
+
+    @classmethod
+    def from_geometry(cls, geometry: List[List[float]]) -> "CompiledRoute":
+        """Build from the ``[[lng, lat], ...]`` list stored in ``route_geometry``."""
+        coords = np.asarray(geometry, dtype=np.float64)
+        if coords.ndim != 2 or coords.shape[1] < 2:
+            raise ValueError("Route geometry must be a list of [lng, lat] pairs")
+        return cls(coords[:, 0], coords[:, 1])
+
+    def to_geometry(self) -> List[List[float]]:
+        """Back to the ``[[lng, lat], ...]`` list shape used in API payloads."""
+        return np.column_stack((self.lng, self.lat)).tolist()
+
+    @property
+    def point_count(self) -> int:
+        return int(self.lng.shape[0])
+
+    @property
+    def segment_count(self) -> int:
+        return max(self.point_count - 1, 0)
+
+    @property
+    def length_m(self) -> float:
+        return float(self.cum_m[-1]) if self.cum_m.size else 0.0
+
+    def distance_along(self, segment_index: int, t: float) -> Optional[float]:
+        """Metres from the first vertex to position ``t`` on ``segment_index``."""
+        if segment_index < 0:
+            return None
+        return float(self.cum_m[segment_index] + t * self.seg_len_m[segment_index])
+
+    def point_at(self, distance_along_m: float) -> Tuple[float, float]:
+        """``(lat, lng)`` at ``distance_along_m``; a binary search over the prefix sums."""
+        d = min(max(distance_along_m, 0.0), self.length_m)
+        seg = int(np.searchsorted(self.cum_m, d, side="right")) - 1
+        seg = min(max(seg, 0), self.segment_count - 1)
+        length = self.seg_len_m[seg]
+        t = (d - self.cum_m[seg]) / length if length > 0 else 0.0
+        return (
+            float(self.lat[seg] + t * self.seg_dy[seg]),
+            float(self.lng[seg] + t * self.seg_dx[seg]),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        total = sum(a.nbytes for a in (
+            self.lng, self.lat, self.seg_dx, self.seg_dy, self.seg_len2, self.seg_valid,
+            self.seg_len_m, self.cum_m,
+        ))
+        if self.index is not None:
+            total += self.index.nbytes
+        if self.importance is not None:
+            total += self.importance.nbytes
+        total += sum(len(encoded) for encoded, _ in self.encodings.values())
+        return total
+
+
+def compile_route(geometry: List[List[float]]) -> CompiledRoute:
+    return CompiledRoute.from_geometry(geometry)
+
+
+def _project(
+    route: CompiledRoute,
+    user_lat: float,
+    user_lng: float,
+    segments: Optional[np.ndarray] = None,
+) -> Tuple[int, float, float, Optional[float], Optional[float]]:
+    """
+    Project the user onto ``segments`` (all segments when None) and return
+    ``(segment_index, t, distance_meters, snapped_lat, snapped_lng)`` for the
+    closest one. Segment index is -1 when no non-degenerate segment exists.
+    """
+    if segments is None:
+        lng1 = route.lng[:-1]
+        lat1 = route.lat[:-1]
+        dx, dy, len2, valid = route.seg_dx, route.seg_dy, route.seg_len2, route.seg_valid
+    else:
+        lng1 = route.lng[segments]
+        lat1 = route.lat[segments]
+        dx = route.seg_dx[segments]
+        dy = route.seg_dy[segments]
+        len2 = route.seg_len2[segments]
+        valid = route.seg_valid[segments]
+
+    if len2.size == 0:
+        return -1, 0.0, float("inf"), None, None
+
+    t = np.divide(
+        (user_lng - lng1) * dx + (user_lat - lat1) * dy,
+        len2,
+        out=np.zeros_like(len2),
+        where=valid,
+    )
+    np.clip(t, 0.0, 1.0, out=t)
+
+    proj_lng = lng1 + t * dx
+    proj_lat = lat1 + t * dy
+
+    distance = haversine_np(user_lat, user_lng, proj_lat, proj_lng)
+    distance[~valid] = np.inf
+
+    best = int(np.argmin(distance))
+    if not np.isfinite(distance[best]):
+        return -1, 0.0, float("inf"), None, None
+
+    seg = best if segments is None else int(segments[best])
+    return seg, float(t[best]), float(distance[best]), float(proj_lat[best]), float(proj_lng[best])
+
+
+def _nearest(
+    route: CompiledRoute,
+    user_lat: float,
+    user_lng: float,
+) -> Tuple[int, float, float, Optional[float], Optional[float]]:
+    """Global nearest projection, through the segment index when the route has one."""
+    if route.index is not None:
+        return route.index.nearest(user_lat, user_lng)
+    return _project(route, user_lat, user_lng)
+
+
+def snap_compiled(route: CompiledRoute, user_lat: float, user_lng: float) -> Dict:
+    """
+    Vectorised equivalent of :func:`snap_to_route` over a :class:`CompiledRoute`.
+    Returns the same dict; ``snap_to_route`` stays as the reference implementation.
+    """
+    seg, t, distance, snapped_lat, snapped_lng = _nearest(route, user_lat, user_lng)
+
+    total_segments = route.segment_count
+    route_fraction = (seg + t) / total_segments if total_segments > 0 else 0.0
+    distance_along = route.distance_along(seg, t)
+
+    return {
+        "snapped_lat": snapped_lat,
+        "snapped_lng": snapped_lng,
+        "distance_meters": distance,
+        "segment_index": seg,
+        "route_fraction": route_fraction,
+        "distance_along_m": distance_along,
+        "remaining_m": route.length_m - distance_along if distance_along is not None else None,
+    }
@@ -0,0 +1,246 @@
+import asyncio
+import heapq
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+import numpy as np
+
+from app.services.snap import EARTH_RADIUS, haversine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NEARBY_RADIUS_M = 25000.0
+DEFAULT_NEARBY_LIMIT = 10
+
+
+def _unit_vectors(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    lat = np.radians(lat)
+    lng = np.radians(lng)
+    return np.column_stack((
+        np.cos(lat) * np.cos(lng),
+        np.cos(lat) * np.sin(lng),
+        np.sin(lat),
+    ))
+
+
+def _chord_for(distance_m: float) -> float:
+    return 2 * math.sin(min(distance_m / (2 * EARTH_RADIUS), math.pi / 2))
+
+
+def _distance_for(chord: float) -> float:
+    return 2 * EARTH_RADIUS * math.asin(min(chord / 2, 1.0))
+
+
+class _KDTree:
+    """
+    Static, implicit KD-tree over 3D unit vectors. Node ``mid`` of range
+    ``[lo, hi)`` is its median; chord distance between unit vectors is
+    monotonic in great-circle distance, so k-nearest results are exact.
+    """
+
+    def __init__(self, xyz: np.ndarray):
+        n = xyz.shape[0]
+        perm = np.arange(n)
+        axes = np.zeros(n, dtype=np.int8)
+
+        stack = [(0, n)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= 0:
+                continue
+            mid = (lo + hi) // 2
+            sub = perm[lo:hi]
+            axis = int(np.argmax(np.ptp(xyz[sub], axis=0)))
+            perm[lo:hi] = sub[np.argpartition(xyz[sub, axis], mid - lo)]
+            axes[mid] = axis
+            stack.append((lo, mid))
+            stack.append((mid + 1, hi))
+
+        # Plain lists: scalar indexing into them is far cheaper than into ndarrays.
+        self.points = xyz[perm].tolist()
+        self.axes = axes.tolist()
+        self.perm = perm.tolist()
+
+    def query(self, q: List[float], k: int, max_chord: float) -> List[Tuple[float, int]]:
+        """Return up to ``k`` ``(chord, original_index)`` pairs within ``max_chord``, nearest first."""
+        points, axes = self.points, self.axes
+        heap: List[Tuple[float, int]] = []
+        bound = max_chord * max_chord
+        qx, qy, qz = q
+
+        def search(lo: int, hi: int) -> None:
+            nonlocal bound
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            px, py, pz = points[mid]
+            d2 = (qx - px) ** 2 + (qy - py) ** 2 + (qz - pz) ** 2
+            if d2 <= bound:
+                heapq.heappush(heap, (-d2, mid))
+                if len(heap) > k:
+                    heapq.heappop(heap)
+                if len(heap) == k:
+                    bound = -heap[0][0]
+
+            diff = q[axes[mid]] - points[mid][axes[mid]]
+            if diff < 0:
+                search(lo, mid)
+                if diff * diff <= bound:
+                    search(mid + 1, hi)
+            else:
+                search(mid + 1, hi)
+                if diff * diff <= bound:
+                    search(lo, mid)
+
+        search(0, len(points))
+        return sorted((math.sqrt(-d2), self.perm[i]) for d2, i in heap)
+
+
+class StationIndex:
+    """
+    In-memory k-nearest index over stations with coordinates, built from the
+    ``stations`` table at startup and rebuilt when a change is notified.
+    Queries never touch the database.
+    """
+
+    def __init__(self):
+        self._tree: Optional[_KDTree] = None
+        self._stations: List[Dict] = []
+        self.loaded_at: Optional[float] = None
+        self.build_seconds = 0.0
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._tree is not None
+
+    async def refresh(self, conn: asyncpg.Connection) -> None:
+        rows = await conn.fetch(
+            """
+            SELECT id, code, name, lat, lng, zone
+            FROM stations
+            WHERE lat IS NOT NULL AND lng IS NOT NULL
+            """
+        )
+        stations = [
+            {
+                "id": str(r["id"]),
+                "code": r["code"],
+                "name": r["name"],
+                "lat": float(r["lat"]),
+                "lng": float(r["lng"]),
+                "zone": r["zone"],
+            }
+            for r in rows
+        ]
+
+        started = time.perf_counter()
+        tree = await asyncio.to_thread(self._build, stations)
+        self.build_seconds = time.perf_counter() - started
+
+        self._tree, self._stations = tree, stations
+        self.loaded_at = time.time()
+        logger.info("Station index loaded: %d stations in %.1f ms", len(stations), self.build_seconds * 1000)
+
+    @staticmethod
+    def _build(stations: List[Dict]) -> Optional[_KDTree]:
+        lat = np.array([s["lat"] for s in stations], dtype=np.float64)
+        lng = np.array([s["lng"] for s in stations], dtype=np.float64)
+        return _KDTree(_unit_vectors(lat, lng))
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        limit: int = DEFAULT_NEARBY_LIMIT,
+        radius_m: float = DEFAULT_NEARBY_RADIUS_M,
+    ) -> List[Tuple[Dict, float]]:
+        """Up to ``limit`` ``(station, distance_m)`` pairs within ``radius_m``, nearest first."""
+        if self._tree is None:
+            raise RuntimeError("Station index is not loaded")
+
+        started = time.perf_counter()
+        q = _unit_vectors(np.array([lat]), np.array([lng]))[0].tolist()
+        hits = self._tree.query(q, limit, _chord_for(radius_m))
+        result = [(self._stations[i], _distance_for(chord)) for chord, i in hits]
+
+        self.query_count += 1
+        self.query_seconds += time.perf_counter() - started
+        return result
+
+    def stats(self) -> Dict:
+        queries = self.query_count
+        return {
+            "ready": self.ready,
+            "stations": len(self._stations),
+            "loaded_at": self.loaded_at,
+            "build_ms": self.build_seconds * 1000,
+            "queries": queries,
+            "avg_query_us": (self.query_seconds / queries * 1e6) if queries else None,
+        }
+
+
+async def nearby_from_db(
+    conn: asyncpg.Connection,
+    lat: float,
+    lng: float,
+    limit: int = DEFAULT_NEARBY_LIMIT,
+    radius_m: float = DEFAULT_NEARBY_RADIUS_M,
+) -> List[Tuple[Dict, float]]:
+    """
+    Database fallback for when the in-memory index is not loaded. Uses the
+    ``earthdistance`` GiST index when the extension is installed, otherwise a
+    lat/lng bounding-box scan refined with haversine in Python.
+    """
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT id, code, name, lat, lng, zone,
+                   earth_distance(ll_to_earth($1, $2), ll_to_earth(lat, lng)) AS distance
+            FROM stations
+            WHERE earth_box(ll_to_earth($1, $2), $3) @> ll_to_earth(lat, lng)
+              AND earth_distance(ll_to_earth($1, $2), ll_to_earth(lat, lng)) <= $3
+            ORDER BY distance
+            LIMIT $4
+            """,
+            lat, lng, radius_m, limit,
+        )
+        return [(_row_to_dict(r), float(r["distance"])) for r in rows]
+    except (asyncpg.UndefinedFunctionError, asyncpg.UndefinedObjectError):
+        logger.debug("earthdistance not installed; using bounding-box station search")
+
+    dlat = math.degrees(radius_m / EARTH_RADIUS)
+    dlng = min(dlat / max(math.cos(math.radians(lat)), 1e-6), 180.0)
+    rows = await conn.fetch(
+        """
+        SELECT id, code, name, lat, lng, zone
+        FROM stations
+        WHERE lat BETWEEN $1 AND $2 AND lng BETWEEN $3 AND $4
+        """,
+        lat - dlat, lat + dlat, lng - dlng, lng + dlng,
+    )
+    hits = []
+    for r in rows:
+        distance = haversine(lat, lng, r["lat"], r["lng"])
+        if distance <= radius_m:
+            hits.append((_row_to_dict(r), distance))
+    hits.sort(key=lambda h: h[1])
+    return hits[:limit]
+
+
+def _row_to_dict(row: asyncpg.Record) -> Dict:
+    return {
+        "id": str(row["id"]),
+        "code": row["code"],
+        "name": row["name"],
+        "lat": float(row["lat"]),
+        "lng": float(row["lng"]),
+        "zone": row["zone"],
+    }
+
+
+station_index = StationIndex()
@@ -0,0 +1,76 @@
+import logging
+import uuid
+from typing import Dict, List, Optional, Union
+
+import asyncpg
+
+from app.services.timetable import TIMETABLE_INDEX_ENABLED, timetable_index
+
+logger = logging.getLogger(__name__)
+
+
+async def resolve_station_id(conn: asyncpg.Connection, station: str) -> Optional[uuid.UUID]:
+    """
+    Station id for a code or a UUID string. Each form is looked up on its
+    own unique index; ``code = $1 OR id::text = $1`` can use neither.
+    """
+    try:
+        station_id = uuid.UUID(station)
+    except ValueError:
+        return await conn.fetchval("SELECT id FROM stations WHERE code = $1", station)
+    return await conn.fetchval("SELECT id FROM stations WHERE id = $1", station_id)
+
+
+async def trains_between(
+    conn: asyncpg.Connection,
+    from_station_id: uuid.UUID,
+    to_station_id: uuid.UUID,
+) -> List[Union[asyncpg.Record, Dict]]:
+    """
+    Trains calling at ``from_station_id`` and later at ``to_station_id``.
+    With ``TIMETABLE_INDEX`` set and the in-memory timetable loaded they are
+    answered without a query; otherwise they are read from the
+    ``station_pair_trains`` materialized view, falling back to joining
+    ``stop_times`` when the view has not been created or populated.
+    """
+    if TIMETABLE_INDEX_ENABLED and timetable_index.ready:
+        return timetable_index.trains_between(from_station_id, to_station_id)
+
+    try:
+        return await conn.fetch(
+            """
+            SELECT t.id, t.number, t.name, t.type
+            FROM station_pair_trains p
+            JOIN trains t ON t.id = p.train_id
+            WHERE p.from_station_id = $1 AND p.to_station_id = $2
+            ORDER BY t.number
+            """,
+            from_station_id,
+            to_station_id,
+        )
+    except (asyncpg.UndefinedTableError, asyncpg.ObjectNotInPrerequisiteStateError) as e:
+        logger.warning("station_pair_trains unavailable (%s), joining stop_times", e)
+
+    return await conn.fetch(
+        """
+        SELECT DISTINCT t.id, t.number, t.name, t.type
+        FROM trains t
+        JOIN stop_times st1 ON st1.train_id = t.id
+        JOIN stop_times st2 ON st2.train_id = t.id AND st2.sequence > st1.sequence
+        WHERE st1.station_id = $1 AND st2.station_id = $2
+        ORDER BY t.number
+        """,
+        from_station_id,
+        to_station_id,
+    )
+
+
+async def refresh_station_pairs(conn: asyncpg.Connection) -> None:
+    """Rebuild station_pair_trains, without blocking readers once it has been populated."""
+    populated = await conn.fetchval(
+        "SELECT ispopulated FROM pg_matviews WHERE matviewname = 'station_pair_trains'"
+    )
+    if populated:
+        await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY station_pair_trains")
+    else:
+        await conn.execute("REFRESH MATERIALIZED VIEW station_pair_trains")
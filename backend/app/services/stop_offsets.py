@@ -0,0 +1,81 @@
+import bisect
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.services.map_match import match_trace
+from app.services.snap import CompiledRoute
+
+# Stops farther than this from the geometry are stored without an offset.
+STOP_MATCH_DISTANCE_M = 5000.0
+
+
+def project_stops(
+    route: CompiledRoute,
+    stops: Sequence[Tuple[int, Optional[float], Optional[float]]],
+) -> List[Tuple[int, Optional[float], Optional[float]]]:
+    """
+    Project ``(sequence, lat, lng)`` stops onto ``route`` in sequence order,
+    enforcing forward progress so a route that passes near a later stop
+    early cannot place it out of order. Returns ``(sequence, offset_m,
+    snap_distance_m)``; offset is None for stops without coordinates or
+    too far from the geometry.
+    """
+    located = [(lat, lng, seq) for seq, lat, lng in stops if lat is not None and lng is not None]
+    # Consecutive stops can be far apart on a dense geometry; this runs
+    # offline, so the forward search may cover the whole route.
+    matches, _ = match_trace(route, located, max_distance_m=STOP_MATCH_DISTANCE_M, max_window=None)
+    by_sequence = {m["timestamp"]: m for m in matches}
+
+    result = []
+    for seq, _, _ in stops:
+        match = by_sequence.get(seq)
+        if match is None:
+            result.append((seq, None, None))
+        else:
+            result.append((seq, match["distance_along_m"], match["distance_meters"]))
+    return result
+
+
+class StopOffsets:
+    """
+    Along-route offsets of a train's stops, sorted by offset, so the stops
+    around any snapped position are found by binary search.
+    """
+
+    def __init__(self, stops: List[Dict]):
+        self.stops = sorted(stops, key=lambda s: s["offset_m"])
+        self.offsets = [s["offset_m"] for s in self.stops]
+        self._by_key: Dict[str, Dict] = {}
+        for stop in self.stops:
+            self._by_key.setdefault(stop["station_code"], stop)
+            self._by_key.setdefault(stop["station_id"], stop)
+
+    def __len__(self) -> int:
+        return len(self.stops)
+
+    def find(self, station: str) -> Optional[Dict]:
+        """Stop by station code or id."""
+        return self._by_key.get(station)
+
+    def around(self, distance_along_m: Optional[float]) -> Dict[str, Optional[Dict]]:
+        """The last stop at or before and the first stop after ``distance_along_m``."""
+        if distance_along_m is None or not self.stops:
+            return {"previous_stop": None, "next_stop": None}
+        i = bisect.bisect_right(self.offsets, distance_along_m)
+        previous_stop = self.stops[i - 1] if i > 0 else None
+        next_stop = self.stops[i] if i < len(self.stops) else None
+        return {
+            "previous_stop": _stop_view(previous_stop, distance_along_m),
+            "next_stop": _stop_view(next_stop, distance_along_m),
+        }
+
+
+def _stop_view(stop: Optional[Dict], distance_along_m: float) -> Optional[Dict]:
+    if stop is None:
+        return None
+    return {
+        "station_code": stop["station_code"],
+        "station_name": stop["station_name"],
+        "sequence": stop["sequence"],
+        "offset_m": stop["offset_m"],
+        "distance_m": abs(stop["offset_m"] - distance_along_m),
+    }
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.redis import redis_binary_client, redis_client
+from app.services.codec import cache_codec
+
+logger = logging.getLogger(__name__)
+
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "2048"))
+# Upper bound on how long a worker may serve a value another worker replaced
+# if an invalidation message is lost.
+LOCAL_CACHE_TTL_SECONDS = float(os.getenv("LOCAL_CACHE_TTL_SECONDS", "5"))
+INVALIDATION_CHANNEL = "geopulse_cache_invalidate"
+# Only these key families are mirrored in process memory.
+LOCAL_PREFIXES = ("live_status:", "ai_summary:")
+RESUBSCRIBE_DELAY_SECONDS = 1.0
+
+
+class LocalTTLCache:
+    """Bounded LRU of already-decoded values, each with its own expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    In-process LRU in front of Redis for hot, read-mostly keys.
+
+    Reads check process memory first, then Redis; values are encoded with
+    :data:`app.services.codec.cache_codec` unless the caller passes its own
+    ``encode``/``decode``, and are decoded once and shared, so callers must
+    treat them as read-only. Writes go to Redis,
+    then publish the key on :data:`INVALIDATION_CHANNEL` so other workers
+    drop their copy; each worker ignores its own messages by origin id.
+    Keys outside :data:`LOCAL_PREFIXES` bypass the local tier.
+    """
+
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES, local_ttl: float = LOCAL_CACHE_TTL_SECONDS):
+        self.local = LocalTTLCache(max_entries)
+        self.local_ttl = local_ttl
+        self.origin = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _local(key: str) -> bool:
+        return key.startswith(LOCAL_PREFIXES)
+
+    async def get(
+        self,
+        key: str,
+        decode: Callable[[bytes], Any] = cache_codec.loads,
+        use_local: bool = True,
+    ) -> Optional[Any]:
+        """
+        Cached value for ``key`` or None; Redis errors propagate to the caller.
+        ``use_local=False`` reads Redis even if a local copy exists (e.g. when
+        polling for another worker's write).
+        """
+        local = self._local(key)
+        if local and use_local:
+            value = self.local.get(key)
+            if value is not None:
+                self.local_hits += 1
+                return value
+
+        if not local:
+            raw, ttl = await redis_binary_client.get(key), None
+        else:
+            pipe = redis_binary_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            raw, ttl = await pipe.execute()
+        if raw is None:
+            self.misses += 1
+            return None
+        self.redis_hits += 1
+        value = decode(raw)
+        if local:
+            # Never keep it locally longer than Redis will.
+            self.local.set(key, value, min(self.local_ttl, ttl) if ttl and ttl > 0 else self.local_ttl)
+        return value
+
+    async def get_many(
+        self,
+        keys: List[str],
+        decode: Callable[[bytes], Any] = cache_codec.loads,
+    ) -> Dict[str, Optional[Any]]:
+        """:meth:`get` for many keys: local hits first, then one Redis pipeline for the rest."""
+        values: Dict[str, Optional[Any]] = {}
+        remote = []
+        for key in keys:
+            value = self.local.get(key) if self._local(key) else None
+            if value is not None:
+                self.local_hits += 1
+                values[key] = value
+            else:
+                remote.append(key)
+        if not remote:
+            return values
+
+        pipe = redis_binary_client.pipeline(transaction=False)
+        for key in remote:
+            pipe.get(key)
+            pipe.ttl(key)
+        replies = await pipe.execute()
+        for key, raw, ttl in zip(remote, replies[::2], replies[1::2]):
+            if raw is None:
+                self.misses += 1
+                values[key] = None
+                continue
+            self.redis_hits += 1
+            value = decode(raw)
+            if self._local(key):
+                self.local.set(key, value, min(self.local_ttl, ttl) if ttl and ttl > 0 else self.local_ttl)
+            values[key] = value
+        return values
+
+    async def set(self, key: str, value: Any, ex: int, encode: Callable[[Any], bytes] = cache_codec.dumps) -> None:
+        """Write through to Redis and tell other workers to drop their copy."""
+        if self._local(key):
+            self.local.set(key, value, min(self.local_ttl, ex))
+        await redis_binary_client.set(key, encode(value), ex=ex)
+        if self._local(key):
+            try:
+                await redis_client.publish(
+                    INVALIDATION_CHANNEL, json.dumps({"origin": self.origin, "key": key}),
+                )
+            except Exception as e:
+                logger.warning("Cache invalidation publish failed for %s: %s", key, e)
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._on_invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache invalidation listener failed: %s (retrying)", e)
+                # Anything could have changed while we were not listening.
+                self.local = LocalTTLCache(self.local.max_entries)
+                await asyncio.sleep(RESUBSCRIBE_DELAY_SECONDS)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def _on_invalidate(self, data: str) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get("origin") != self.origin:
+            self.local.pop(message.get("key", ""))
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_entries": len(self.local),
+            "local_ttl_seconds": self.local_ttl,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "local_hit_rate": round(self.local_hits / lookups, 4) if lookups else None,
+            "redis_hit_rate": round(self.redis_hits / (lookups - self.local_hits), 4)
+            if lookups > self.local_hits else None,
+            "evictions": self.local.evictions,
+            "invalidations_received": self.invalidations,
+            "listening": self._listener is not None and not self._listener.done(),
+        }
+
+
+tiered_cache = TieredCache()
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, NamedTuple, Optional
+
+import asyncpg
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Answer from->to searches from memory instead of station_pair_trains.
+TIMETABLE_INDEX_ENABLED = os.getenv("TIMETABLE_INDEX", "false").lower() in ("1", "true", "yes")
+
+
+class _Timetable(NamedTuple):
+    """One immutable build; readers take it with a single attribute read."""
+    station_index: Dict[uuid.UUID, int]
+    trains: List[Dict]
+    offsets: np.ndarray
+    train: np.ndarray
+    first_seq: np.ndarray
+    last_seq: np.ndarray
+
+
+class TimetableIndex:
+    """
+    Compact in-memory timetable for direct-train queries, built from
+    ``stop_times``. Stations map, CSR-style, to the trains calling there:
+    ``offsets[s]:offsets[s + 1]`` indexes parallel arrays of train (sorted),
+    first sequence and last sequence at that station. A from->to query
+    intersects two sorted train lists with a binary search of the shorter
+    into the longer and keeps trains whose first call at the origin comes
+    before their last call at the destination.
+
+    Trains are numbered in train-number order, so results come out sorted
+    by number like the SQL path. Reloads build a new snapshot off the event
+    loop and swap it in whole, so queries never mix two builds.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[_Timetable] = None
+        self.loaded_at: Optional[float] = None
+        self.build_seconds = 0.0
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._snapshot.offsets if self._snapshot else np.zeros(1, dtype=np.int32)
+
+    async def refresh(self, conn: asyncpg.Connection) -> None:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            trains = await conn.fetch("SELECT id, number, name, type FROM trains ORDER BY number")
+            station_ids = await conn.fetchval("SELECT array_agg(id ORDER BY id) FROM stations") or []
+            # Dense train/station numbers are computed in SQL and shipped as
+            # three int arrays, which decode far faster than one row per stop.
+            columns = await conn.fetchrow(
+                """
+                WITH t AS (SELECT id, (row_number() OVER (ORDER BY number) - 1)::int AS i FROM trains),
+                     s AS (SELECT id, (row_number() OVER (ORDER BY id) - 1)::int AS i FROM stations)
+                SELECT array_agg(t.i) AS train, array_agg(s.i) AS station, array_agg(st.sequence) AS sequence
+                FROM stop_times st
+                JOIN t ON t.id = st.train_id
+                JOIN s ON s.id = st.station_id
+                """
+            )
+
+        started = time.perf_counter()
+        built = await asyncio.to_thread(
+            self._build,
+            [{"id": r["id"], "number": r["number"], "name": r["name"], "type": r["type"]} for r in trains],
+            station_ids,
+            np.asarray(columns["train"] or [], dtype=np.int32),
+            np.asarray(columns["station"] or [], dtype=np.int32),
+            np.asarray(columns["sequence"] or [], dtype=np.int32),
+        )
+        self.build_seconds = time.perf_counter() - started
+        self._swap(built)
+        logger.info(
+            "Timetable index loaded: %d calls at %d stations in %.1f ms (%.1f MB)",
+            len(built.train), len(station_ids), self.build_seconds * 1000, self.memory_bytes() / 1e6,
+        )
+
+    def load(
+        self,
+        trains: List[Dict],
+        station_ids: List[uuid.UUID],
+        stop_train: np.ndarray,
+        stop_station: np.ndarray,
+        stop_sequence: np.ndarray,
+    ) -> None:
+        """Build and swap in synchronously, e.g. from a benchmark; see :meth:`_build`."""
+        self._swap(self._build(trains, station_ids, stop_train, stop_station, stop_sequence))
+
+    def _swap(self, built: _Timetable) -> None:
+        self._snapshot = built
+        self.loaded_at = time.time()
+
+    @staticmethod
+    def _build(
+        trains: List[Dict],
+        station_ids: List[uuid.UUID],
+        stop_train: np.ndarray,
+        stop_station: np.ndarray,
+        stop_sequence: np.ndarray,
+    ) -> _Timetable:
+        """Build from stop arrays of dense train/station numbers (positions in ``trains``/``station_ids``)."""
+        order = np.lexsort((stop_sequence, stop_train, stop_station))
+        station = stop_station[order]
+        train = stop_train[order]
+        sequence = stop_sequence[order]
+
+        # One entry per (station, train); repeated calls keep first and last sequence.
+        n = len(order)
+        starts = np.flatnonzero(np.r_[True, (station[1:] != station[:-1]) | (train[1:] != train[:-1])]) if n else order
+        ends = np.r_[starts[1:], n] - 1 if n else order
+        seq_dtype = np.int16 if n == 0 or sequence.max() < np.iinfo(np.int16).max else np.int32
+
+        return _Timetable(
+            station_index={station_id: i for i, station_id in enumerate(station_ids)},
+            trains=trains,
+            offsets=np.searchsorted(station[starts], np.arange(len(station_ids) + 1)).astype(np.int32),
+            train=train[starts].astype(np.int32),
+            first_seq=sequence[starts].astype(seq_dtype),
+            last_seq=sequence[ends].astype(seq_dtype),
+        )
+
+    def trains_between(self, from_station_id: uuid.UUID, to_station_id: uuid.UUID) -> List[Dict]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("Timetable index is not loaded")
+
+        started = time.perf_counter()
+        result: List[Dict] = []
+        a = snapshot.station_index.get(from_station_id)
+        b = snapshot.station_index.get(to_station_id)
+        if a is not None and b is not None:
+            offsets = snapshot.offsets
+            a0, a1 = offsets[a], offsets[a + 1]
+            b0, b1 = offsets[b], offsets[b + 1]
+            if a1 > a0 and b1 > b0:
+                from_trains, to_trains = snapshot.train[a0:a1], snapshot.train[b0:b1]
+                first, last = snapshot.first_seq[a0:a1], snapshot.last_seq[b0:b1]
+                if len(from_trains) <= len(to_trains):
+                    pos = np.minimum(np.searchsorted(to_trains, from_trains), len(to_trains) - 1)
+                    mask = (to_trains[pos] == from_trains) & (first < last[pos])
+                    matched = from_trains[mask]
+                else:
+                    pos = np.minimum(np.searchsorted(from_trains, to_trains), len(from_trains) - 1)
+                    mask = (from_trains[pos] == to_trains) & (first[pos] < last)
+                    matched = to_trains[mask]
+                result = [snapshot.trains[i] for i in matched.tolist()]
+
+        self.query_count += 1
+        self.query_seconds += time.perf_counter() - started
+        return result
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the CSR arrays (train and station lookup tables not included)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return 0
+        return snapshot.offsets.nbytes + snapshot.train.nbytes + snapshot.first_seq.nbytes + snapshot.last_seq.nbytes
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        queries = self.query_count
+        return {
+            "enabled": TIMETABLE_INDEX_ENABLED,
+            "ready": snapshot is not None,
+            "stations": len(snapshot.station_index) if snapshot else 0,
+            "trains": len(snapshot.trains) if snapshot else 0,
+            "entries": int(len(snapshot.train)) if snapshot else 0,
+            "array_bytes": self.memory_bytes(),
+            "loaded_at": self.loaded_at,
+            "build_ms": self.build_seconds * 1000,
+            "queries": queries,
+            "avg_query_us": (self.query_seconds / queries * 1e6) if queries else None,
+        }
+
+
+timetable_index = TimetableIndex()
@@ -0,0 +1,143 @@
+"""
+Serialization benchmarks: cache codecs (json, orjson, msgpack) on live
+status envelopes, the per-request serialization paths of /live and the
+route/bundle endpoints, and JSONB geometry decoding. Runs offline.
+
+  python benchmarks/bench_codec.py
+  python benchmarks/bench_codec.py --compare benchmarks/results/codec-abc123.json
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+from common import compare, print_table, save_results, time_calls
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.responses import FastJSONResponse
+from app.models.livestationstop import LiveStationStop
+from app.models.livetrainstatus import LiveTrainStatus
+from app.services.codec import CODECS, json_loads
+
+
+def live_status_envelope(stops: int = 60, seed: int = 1) -> dict:
+    """A WhereIsMyTrain-shaped live status in the cache envelope."""
+    rng = random.Random(seed)
+    route = []
+    for i in range(stops):
+        route.append({
+            "station_code": f"ST{i:03d}",
+            "station_name": f"Station {i}",
+            "scheduled_arrival": f"{(6 + i // 4) % 24:02d}:{(i * 15) % 60:02d}",
+            "actual_arrival": f"{(6 + i // 4) % 24:02d}:{(i * 15 + 7) % 60:02d}",
+            "delay_arrival": rng.randint(0, 40),
+            "scheduled_departure": f"{(6 + i // 4) % 24:02d}:{(i * 15 + 2) % 60:02d}",
+            "actual_departure": None,
+            "delay_departure": rng.randint(0, 40),
+            "platform": str(rng.randint(1, 8)),
+            "is_departed": i < stops // 2,
+        })
+    return {
+        "fetched_at": time.time(),
+        "data": {
+            "current_station": "ST030",
+            "next_station": "ST031",
+            "delay": 12,
+            "route": route,
+            "source": "whereismytrain",
+        },
+    }
+
+
+def live_train_status(envelope: dict) -> LiveTrainStatus:
+    stops = [
+        LiveStationStop(
+            station_code=s["station_code"],
+            station_name=s["station_name"],
+            sequence=i + 1,
+            scheduled_arrival=s["scheduled_arrival"],
+            actual_arrival=s["actual_arrival"],
+            delay_arrival=str(s["delay_arrival"]),
+            scheduled_departure=s["scheduled_departure"],
+            delay_departure=str(s["delay_departure"]),
+            is_departed=s["is_departed"],
+        )
+        for i, s in enumerate(envelope["data"]["route"])
+    ]
+    return LiveTrainStatus(
+        train_id="6f1c7f0e-3c1e-4a52-9a0e-1d2b3c4d5e6f",
+        journey_date=datetime(2026, 1, 1),
+        current_station=stops[29],
+        next_station=stops[30],
+        position={"lat": 22.5, "lng": 88.3, "distance_along_m": 812345.6, "remaining_m": 512345.1},
+        delay_minutes=12,
+        route=stops,
+        last_updated=datetime(2026, 1, 1, 12, 0),
+        source="whereismytrain",
+    )
+
+
+def route_payload(points: int, seed: int = 2) -> dict:
+    rng = random.Random(seed)
+    lng, lat = 72.8, 19.0
+    geometry = []
+    for _ in range(points):
+        lng += rng.uniform(-0.001, 0.002)
+        lat += rng.uniform(-0.001, 0.002)
+        geometry.append([round(lng, 6), round(lat, 6)])
+    return {"train_id": "12301", "geometry": geometry, "point_count": points, "tolerance_m": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds per case")
+    parser.add_argument("--route-points", type=int, default=5000)
+    parser.add_argument("--output", help="Results JSON path (default benchmarks/results/codec-<commit>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to compare p50 against")
+    args = parser.parse_args()
+
+    results = {}
+    envelope = live_status_envelope()
+    for name, codec in CODECS.items():
+        encoded = codec.dumps(envelope)
+        print(f"{name}: live status envelope is {len(encoded)} bytes")
+        results[f"cache_dumps[{name}]"] = time_calls(codec.dumps, [(envelope,)] * 5000, args.budget)
+        results[f"cache_loads[{name}]"] = time_calls(codec.loads, [(encoded,)] * 5000, args.budget)
+
+    # What FastAPI does per request: a response_model is serialized by
+    # Pydantic; a plain dict goes through jsonable_encoder and the response
+    # class, unless the endpoint returns a FastJSONResponse itself.
+    status = live_train_status(envelope)
+    results["live[pydantic_model_dump_json]"] = time_calls(
+        lambda: LiveTrainStatus.model_validate(status).model_dump_json().encode(), [()] * 2000, args.budget,
+    )
+    results["live[jsonable_encoder+JSONResponse]"] = time_calls(
+        lambda: JSONResponse(jsonable_encoder(status)), [()] * 2000, args.budget,
+    )
+
+    route = route_payload(args.route_points)
+    label = f"route_{args.route_points}pts"
+    results[f"{label}[jsonable_encoder+JSONResponse]"] = time_calls(
+        lambda: JSONResponse(jsonable_encoder(route)), [()] * 500, args.budget,
+    )
+    results[f"{label}[FastJSONResponse]"] = time_calls(
+        lambda: FastJSONResponse(route), [()] * 500, args.budget,
+    )
+    encoded_geometry = json.dumps(route["geometry"])
+    for name, loads in (("json", json.loads), ("fast", json_loads)):
+        results[f"decode_jsonb_{label}[{name}]"] = time_calls(
+            loads, [(encoded_geometry,)] * 500, args.budget,
+        )
+
+    print_table(results)
+    path = save_results("codec", results, args.output)
+    print(f"\nSaved {path}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Micro-benchmarks for the geo hot path: haversine, reference and vectorised
+snapping, the segment index, trace matching, simplification and geometry
+encoding, over synthetic routes of 100 to 1M points. Runs fully offline
+(no database or Redis).
+
+  python benchmarks/bench_geo.py
+  python benchmarks/bench_geo.py --sizes 100 10000 --compare benchmarks/results/geo-abc123.json
+"""
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from common import compare, print_table, save_results, summarize, time_calls
+
+from app.services.geometry_codec import encode_binary, encode_polyline
+from app.services.map_match import match_trace
+from app.services.segment_index import SegmentGrid
+from app.services.simplify import vertex_importance
+from app.services.snap import (
+    CompiledRoute,
+    _project,
+    haversine,
+    haversine_np,
+    snap_compiled,
+    snap_to_route,
+)
+
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000, 1_000_000)
+# The pure-Python reference snap is O(n) per call in the interpreter.
+REFERENCE_MAX_POINTS = 100_000
+
+
+def synthetic_route(points: int, seed: int = 42) -> list:
+    """A wandering [lng, lat] polyline across India with ~150 m segments."""
+    rng = random.Random(seed)
+    lng, lat, heading = 72.8, 19.0, 0.6
+    step = 0.0015
+    geometry = []
+    for _ in range(points):
+        geometry.append([lng, lat])
+        heading += rng.gauss(0, 0.05)
+        lng += step * math.cos(heading)
+        lat += step * math.sin(heading)
+        if not (8 < lat < 34 and 69 < lng < 96):
+            heading += math.pi
+    return geometry
+
+
+def user_positions(geometry: list, count: int, seed: int = 7) -> list:
+    """Mostly within a few hundred metres of the route, some far off it."""
+    rng = random.Random(seed)
+    positions = []
+    for i in range(count):
+        lng, lat = geometry[rng.randrange(len(geometry))]
+        spread = 0.003 if i % 10 else 0.5
+        positions.append((lat + rng.gauss(0, spread), lng + rng.gauss(0, spread)))
+    return positions
+
+
+def bench_size(points: int, queries: int, budget: float) -> dict:
+    results = {}
+    geometry = synthetic_route(points)
+    positions = user_positions(geometry, queries)
+
+    started = time.perf_counter()
+    route = CompiledRoute.from_geometry(geometry)
+    results[f"compile[{points}]"] = summarize([time.perf_counter() - started])
+
+    started = time.perf_counter()
+    indexed = CompiledRoute.from_geometry(geometry)
+    indexed.index = SegmentGrid(indexed)
+    results[f"index_build[{points}]"] = summarize([time.perf_counter() - started])
+
+    if points <= REFERENCE_MAX_POINTS:
+        results[f"snap_to_route[{points}]"] = time_calls(
+            snap_to_route, ((geometry, lat, lng) for lat, lng in positions), budget,
+        )
+    results[f"snap_linear[{points}]"] = time_calls(
+        _project, ((route, lat, lng) for lat, lng in positions), budget,
+    )
+    results[f"snap_indexed[{points}]"] = time_calls(
+        snap_compiled, ((indexed, lat, lng) for lat, lng in positions), budget,
+    )
+
+    base = datetime(2026, 1, 1)
+    step = max(1, points // 500)
+    trace = [
+        (lat + 0.0005, lng, base + timedelta(seconds=i))
+        for i, (lng, lat) in enumerate(geometry[::step])
+    ]
+    results[f"match_trace_{len(trace)}pts[{points}]"] = time_calls(
+        match_trace, [(indexed, trace)] * 50, budget, max_calls=50,
+    )
+
+    results[f"simplify_importance[{points}]"] = time_calls(
+        lambda: vertex_importance(CompiledRoute(route.lng, route.lat)), [()] * 5, budget, max_calls=5,
+    )
+    results[f"encode_polyline[{points}]"] = time_calls(
+        encode_polyline, [(route.lng, route.lat)] * 20, budget, max_calls=20,
+    )
+    results[f"encode_binary[{points}]"] = time_calls(
+        encode_binary, [(route.lng, route.lat)] * 20, budget, max_calls=20,
+    )
+    return results
+
+
+def bench_haversine(queries: int, budget: float) -> dict:
+    rng = random.Random(3)
+    pairs = [
+        (rng.uniform(8, 34), rng.uniform(69, 96), rng.uniform(8, 34), rng.uniform(69, 96))
+        for _ in range(queries)
+    ]
+    lat1, lng1, lat2, lng2 = (np.array(col) for col in zip(*pairs))
+    return {
+        "haversine": time_calls(haversine, pairs, budget),
+        f"haversine_np_batch{queries}": time_calls(
+            haversine_np, [(lat1, lng1, lat2, lng2)] * 200, budget, max_calls=200,
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--queries", type=int, default=1000, help="Random user positions per size")
+    parser.add_argument("--budget", type=float, default=2.0, help="Seconds per case")
+    parser.add_argument("--output", help="Results JSON path (default benchmarks/results/geo-<commit>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to compare p50 against")
+    args = parser.parse_args()
+
+    results = bench_haversine(args.queries, args.budget)
+    for points in args.sizes:
+        results.update(bench_size(points, args.queries, args.budget))
+
+    print_table(results)
+    path = save_results("geo", results, args.output)
+    print(f"\nSaved {path}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
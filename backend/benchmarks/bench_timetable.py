@@ -0,0 +1,203 @@
+"""
+Benchmarks for the in-memory timetable behind from->to train search:
+build time, memory footprint and query latency. Offline by default, over
+a synthetic timetable the size of the full Indian Railways schedule
+(~8,000 stations, ~13,000 trains, ~30 calls per train) with Zipf-skewed
+station popularity so junctions carry thousands of trains. A dict-of-dicts
+index is measured alongside as the plain-Python reference.
+
+  python benchmarks/bench_timetable.py
+  python benchmarks/bench_timetable.py --from-db
+
+--from-db loads stop_times from DATABASE_URL instead and also times the
+SQL path (station_pair_trains) on the same station pairs.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import tracemalloc
+import uuid
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from common import BACKEND_DIR, compare, print_table, save_results, summarize, time_calls
+
+from app.services.timetable import TimetableIndex
+
+DEFAULT_STATIONS = 8_000
+DEFAULT_TRAINS = 13_000
+DEFAULT_MEAN_STOPS = 30
+
+
+def synthetic_timetable(stations: int, trains: int, mean_stops: int, zipf: float, seed: int = 42):
+    """Dense (train, station, sequence) arrays plus train rows and station ids."""
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, stations + 1) ** zipf
+    weights /= weights.sum()
+    stops = np.clip(rng.geometric(1 / mean_stops, trains), 2, min(stations, 250))
+    train_col, station_col, sequence_col = [], [], []
+    for t, n in enumerate(stops):
+        calls = rng.choice(stations, size=n, replace=False, p=weights)
+        train_col.append(np.full(n, t, dtype=np.int32))
+        station_col.append(calls.astype(np.int32))
+        sequence_col.append(np.arange(1, n + 1, dtype=np.int32))
+    train_rows = [
+        {"id": uuid.UUID(int=t + 1), "number": f"{10000 + t:05d}", "name": f"Train {t}", "type": "EXP"}
+        for t in range(trains)
+    ]
+    station_ids = [uuid.UUID(int=(1 << 64) + s) for s in range(stations)]
+    return (train_rows, station_ids, np.concatenate(train_col),
+            np.concatenate(station_col), np.concatenate(sequence_col))
+
+
+def build_reference(train_rows, station_ids, stop_train, stop_station, stop_sequence) -> Dict:
+    """station id -> {train index: (first sequence, last sequence)}."""
+    index: Dict[uuid.UUID, Dict[int, Tuple[int, int]]] = {}
+    for t, s, q in zip(stop_train.tolist(), stop_station.tolist(), stop_sequence.tolist()):
+        calls = index.setdefault(station_ids[s], {})
+        first, last = calls.get(t, (q, q))
+        calls[t] = (min(first, q), max(last, q))
+    return index
+
+
+def reference_between(index: Dict, train_rows: List[Dict], from_id: uuid.UUID, to_id: uuid.UUID) -> List[Dict]:
+    origin, destination = index.get(from_id, {}), index.get(to_id, {})
+    if len(origin) > len(destination):
+        matched = [t for t, (_, last) in destination.items() if t in origin and origin[t][0] < last]
+    else:
+        matched = [t for t, (first, _) in origin.items() if t in destination and first < destination[t][1]]
+    return [train_rows[t] for t in sorted(matched)]
+
+
+def measure(build) -> Tuple[object, float, int]:
+    """Run ``build()`` and return its result, seconds taken and bytes still allocated."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    built = build()
+    elapsed = time.perf_counter() - started
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, elapsed, retained
+
+
+def query_pairs(index: TimetableIndex, station_ids: List[uuid.UUID], queries: int, seed: int = 7) -> Dict:
+    """Busiest-station pairs, popularity-weighted pairs (typical searches) and uniform pairs."""
+    rng = random.Random(seed)
+    counts = np.diff(index.offsets)
+    busiest = [station_ids[i] for i in np.argsort(counts)[::-1][:40]]
+    served = [i for i in range(len(station_ids)) if counts[i]]
+    weights = [int(counts[i]) for i in served]
+    return {
+        "hub": [tuple(rng.sample(busiest, 2)) for _ in range(queries)],
+        "weighted": [tuple(station_ids[i] for i in rng.choices(served, weights, k=2)) for _ in range(queries)],
+        "uniform": [(station_ids[rng.choice(served)], station_ids[rng.choice(served)]) for _ in range(queries)],
+    }
+
+
+async def load_from_db() -> Tuple[TimetableIndex, List[uuid.UUID], float, int]:
+    import asyncpg
+    from dotenv import load_dotenv
+
+    load_dotenv(BACKEND_DIR / ".env")
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        index = TimetableIndex()
+        tracemalloc.start()
+        started = time.perf_counter()
+        await index.refresh(conn)
+        elapsed = time.perf_counter() - started
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        station_ids = await conn.fetchval("SELECT array_agg(id ORDER BY id) FROM stations") or []
+    finally:
+        await conn.close()
+    return index, station_ids, elapsed, retained
+
+
+async def time_sql(pairs: List[Tuple[uuid.UUID, uuid.UUID]], max_calls: int) -> Dict:
+    import asyncpg
+
+    from app.services.station_pairs import trains_between
+
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    samples = []
+    try:
+        for from_id, to_id in pairs[:max_calls]:
+            started = time.perf_counter()
+            await trains_between(conn, from_id, to_id)
+            samples.append(time.perf_counter() - started)
+    finally:
+        await conn.close()
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, default=DEFAULT_STATIONS)
+    parser.add_argument("--trains", type=int, default=DEFAULT_TRAINS)
+    parser.add_argument("--mean-stops", type=int, default=DEFAULT_MEAN_STOPS)
+    parser.add_argument("--zipf", type=float, default=0.9, help="Station popularity skew")
+    parser.add_argument("--queries", type=int, default=2000, help="Station pairs per case")
+    parser.add_argument("--budget", type=float, default=2.0, help="Seconds per case")
+    parser.add_argument("--from-db", action="store_true", help="Load stop_times from DATABASE_URL")
+    parser.add_argument("--output", help="Results JSON path (default benchmarks/results/timetable-<commit>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to compare p50 against")
+    args = parser.parse_args()
+
+    results = {}
+    reference = train_rows = None
+    if args.from_db:
+        index, station_ids, build_s, retained = asyncio.run(load_from_db())
+        results["load_from_db"] = summarize([build_s])
+    else:
+        data = synthetic_timetable(args.stations, args.trains, args.mean_stops, args.zipf)
+        train_rows, station_ids = data[0], data[1]
+        index = TimetableIndex()
+        _, build_s, retained = measure(lambda: index.load(*data))
+        results["build"] = summarize([build_s])
+        reference, reference_s, reference_bytes = measure(lambda: build_reference(*data))
+        results["build_reference"] = summarize([reference_s])
+
+    stats = index.stats()
+    print(f"{stats['stations']} stations, {stats['trains']} trains, {stats['entries']} station-train entries")
+    print(f"timetable arrays {stats['array_bytes'] / 1e6:.2f} MB, "
+          f"retained after load {retained / 1e6:.2f} MB, built in {build_s * 1000:.0f} ms")
+    if reference is not None:
+        print(f"dict-of-dicts reference {reference_bytes / 1e6:.2f} MB, built in {reference_s * 1000:.0f} ms")
+
+    for case, pairs in query_pairs(index, station_ids, args.queries).items():
+        results[f"timetable_{case}"] = time_calls(index.trains_between, pairs, args.budget)
+        if reference is not None:
+            results[f"reference_{case}"] = time_calls(
+                reference_between, ((reference, train_rows, a, b) for a, b in pairs), args.budget,
+            )
+            mismatched = sum(
+                index.trains_between(a, b) != reference_between(reference, train_rows, a, b) for a, b in pairs[:200]
+            )
+            if mismatched:
+                raise SystemExit(f"{case}: {mismatched} of 200 pairs disagree with the reference")
+        if args.from_db:
+            results[f"sql_{case}"] = asyncio.run(time_sql(pairs, 500))
+
+    print_table(results)
+    path = save_results("timetable", {
+        **results,
+        "memory": {
+            "array_bytes": stats["array_bytes"],
+            "retained_bytes": retained,
+            "reference_bytes": reference_bytes if reference is not None else None,
+            "stations": stats["stations"],
+            "trains": stats["trains"],
+            "entries": stats["entries"],
+        },
+    }, args.output)
+    print(f"\nSaved {path}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
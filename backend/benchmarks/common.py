@@ -0,0 +1,109 @@
+"""
+Shared helpers for the offline micro-benchmarks: timing with a per-case
+budget, percentile summaries, environment capture and JSON results that
+can be compared across commits.
+"""
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def time_calls(
+    fn: Callable,
+    args: Iterable[tuple],
+    budget_s: float = 2.0,
+    max_calls: int = 10_000,
+    min_calls: int = 3,
+) -> Dict:
+    """Call ``fn(*a)`` for each ``a`` until the budget or ``max_calls`` runs out."""
+    samples: List[float] = []
+    deadline = time.perf_counter() + budget_s
+    for a in args:
+        started = time.perf_counter()
+        fn(*a)
+        samples.append(time.perf_counter() - started)
+        if len(samples) >= max_calls or (len(samples) >= min_calls and time.perf_counter() > deadline):
+            break
+    return summarize(samples)
+
+
+def summarize(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def percentile(p: float) -> float:
+        return ordered[min(n - 1, int(round(p / 100 * (n - 1))))] * 1e6
+
+    total = sum(ordered)
+    return {
+        "calls": n,
+        "ops_per_sec": n / total if total else None,
+        "mean_us": total / n * 1e6 if n else None,
+        "p50_us": percentile(50) if n else None,
+        "p95_us": percentile(95) if n else None,
+        "p99_us": percentile(99) if n else None,
+    }
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": numpy_version,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def save_results(suite: str, results: Dict[str, Dict], output: Optional[str] = None) -> Path:
+    env = environment()
+    path = Path(output) if output else RESULTS_DIR / f"{suite}-{env['commit'] or 'local'}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"suite": suite, "environment": env, "results": results}, indent=2))
+    return path
+
+
+def print_table(results: Dict[str, Dict]) -> None:
+    print(f"{'case':<44} {'calls':>7} {'ops/sec':>12} {'p50 us':>11} {'p99 us':>11}")
+    for name, r in results.items():
+        print(
+            f"{name:<44} {r['calls']:>7} {r['ops_per_sec'] or 0:>12.1f} "
+            f"{r['p50_us'] or 0:>11.1f} {r['p99_us'] or 0:>11.1f}"
+        )
+
+
+def compare(results: Dict[str, Dict], baseline_path: str) -> None:
+    """Print p50 change per case against a previously saved results file."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    base = baseline["results"]
+    print(f"\nvs {baseline_path} (commit {baseline['environment'].get('commit')})")
+    for name, r in results.items():
+        if name not in base or not base[name].get("p50_us") or not r.get("p50_us"):
+            continue
+        change = (r["p50_us"] - base[name]["p50_us"]) / base[name]["p50_us"] * 100
+        print(f"{name:<44} p50 {base[name]['p50_us']:>11.1f} -> {r['p50_us']:>11.1f} us ({change:+.1f}%)")
@@ -0,0 +1,281 @@
+"""
+Local stand-in for the live status upstreams, for load tests that must not
+touch the real third-party APIs. Serves the WhereIsMyTrain and IRCTC
+RapidAPI response shapes read by the clients' ``_map_response``, with
+configurable latency, error rate and outage windows per upstream.
+
+  python benchmarks/fake_upstream.py --port 8900 --wimt-latency-ms 250 \\
+      --wimt-error-rate 0.02 --outage whereismytrain=60+30
+
+Point the app at it with
+  WHEREISMYTRAIN_URL=http://127.0.0.1:8900/cache/live_status
+  IRCTC_RAPIDAPI_URL=http://127.0.0.1:8900/api/v1/liveTrainStatus
+  IRCTC_RAPIDAPI_KEY=loadtest
+
+With --from-db, routes come from stop_times (DATABASE_URL), so reported
+stations exist in the stations table; otherwise they are synthetic.
+GET /_stats returns call counts, POST /_reset clears them.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Query, Response
+from fastapi.responses import JSONResponse
+
+UPSTREAM_NAMES = ("whereismytrain", "irctc_rapidapi")
+
+
+@dataclass
+class UpstreamBehaviour:
+    latency_ms: float = 300.0
+    # Lognormal spread: 0 gives a constant latency, 0.5 a p99 about 3x the median.
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    # (start, end) seconds since server start.
+    outages: List[Tuple[float, float]] = field(default_factory=list)
+    # "error" answers 503 at once; "hang" holds the request past client timeouts.
+    outage_mode: str = "error"
+    calls: int = 0
+    errors: int = 0
+    outage_calls: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+    def in_outage(self, elapsed: float) -> bool:
+        return any(start <= elapsed < end for start, end in self.outages)
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "outage_calls": self.outage_calls,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+
+class FakeUpstream:
+    def __init__(self, behaviours: Dict[str, UpstreamBehaviour], stops: Optional[Dict[str, List[Dict]]] = None):
+        self.behaviours = behaviours
+        self.stops = stops or {}
+        self.started = time.monotonic()
+
+    def route(self, train_no: str) -> List[Dict]:
+        if train_no in self.stops:
+            return self.stops[train_no]
+        rng = random.Random(train_no)
+        stops = []
+        minutes = rng.randint(0, 23 * 60)
+        for i in range(rng.randint(8, 40)):
+            minutes += rng.randint(20, 50)
+            stops.append({
+                "code": f"F{rng.randint(0, 9999):04d}",
+                "name": f"Fake {train_no} stop {i + 1}",
+                "arrival": _clock(minutes),
+                "departure": _clock(minutes + 2),
+            })
+        return stops
+
+    def progress(self, train_no: str, date: str) -> Tuple[int, int]:
+        """Current stop index and delay, advancing once a minute per train."""
+        stops = self.route(train_no)
+        seed = int(hashlib.md5(f"{train_no}:{date}".encode()).hexdigest()[:8], 16)
+        current = (seed + int(time.time() // 60)) % max(1, len(stops))
+        return current, (seed + current * 3) % 45
+
+    async def respond(self, upstream: str, body) -> Response:
+        behaviour = self.behaviours[upstream]
+        behaviour.calls += 1
+        behaviour.in_flight += 1
+        behaviour.peak_in_flight = max(behaviour.peak_in_flight, behaviour.in_flight)
+        try:
+            if behaviour.in_outage(time.monotonic() - self.started):
+                behaviour.outage_calls += 1
+                if behaviour.outage_mode == "hang":
+                    await asyncio.sleep(120)
+                return Response(status_code=503, content="upstream outage (simulated)")
+
+            delay = behaviour.latency_ms / 1000
+            if behaviour.latency_sigma > 0:
+                delay *= random.lognormvariate(0, behaviour.latency_sigma)
+            await asyncio.sleep(delay)
+
+            if random.random() < behaviour.error_rate:
+                behaviour.errors += 1
+                return Response(status_code=502, content="upstream error (simulated)")
+            return body()
+        finally:
+            behaviour.in_flight -= 1
+
+    def whereismytrain(self, train_no: str, date: str) -> Dict:
+        stops = self.route(train_no)
+        current, delay = self.progress(train_no, date)
+        schedule = [
+            {
+                "station_code": s["code"],
+                "station_name": s["name"],
+                "sch_arrival": s["arrival"],
+                "act_arrival": s["arrival"] if i <= current else None,
+                "delay_in_arrival": str(delay) if i <= current else None,
+                "sch_departure": s["departure"],
+                "act_departure": s["departure"] if i < current else None,
+                "delay_in_departure": str(delay) if i < current else None,
+                "platform": str(1 + i % 6),
+                "has_departed": i < current,
+            }
+            for i, s in enumerate(stops)
+        ]
+        return {
+            "curStn": stops[current]["code"] if stops else None,
+            "pitstop_next_to_curstn": {"station_code": stops[current + 1]["code"]} if current + 1 < len(stops) else {},
+            "delay": delay,
+            "days_schedule": schedule,
+        }
+
+    def irctc(self, train_no: str, start_day: int) -> Dict:
+        stops = self.route(train_no)
+        current, delay = self.progress(train_no, str(start_day))
+        return {
+            "status": True,
+            "data": {
+                "train_number": train_no,
+                "current_station_code": stops[current]["code"] if stops else None,
+                "delay": delay,
+                "train_route": [
+                    {
+                        "station_code": s["code"],
+                        "station_name": s["name"],
+                        "schArr": s["arrival"],
+                        "actArr": s["arrival"] if i <= current else None,
+                        "delayArr": str(delay) if i <= current else None,
+                        "schDep": s["departure"],
+                        "actDep": s["departure"] if i < current else None,
+                        "delayDep": str(delay) if i < current else None,
+                    }
+                    for i, s in enumerate(stops)
+                ],
+            },
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "upstreams": {name: b.stats() for name, b in self.behaviours.items()},
+        }
+
+    def reset(self) -> None:
+        for b in self.behaviours.values():
+            b.calls = b.errors = b.outage_calls = b.peak_in_flight = 0
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}:00"
+
+
+def create_app(fake: FakeUpstream) -> FastAPI:
+    app = FastAPI(title="GeoPulse fake upstream")
+
+    @app.get("/cache/live_status")
+    async def whereismytrain(
+        train_no: str = Query(...),
+        date: str = Query(...),
+        lang: str = Query("en"),
+    ):
+        return await fake.respond("whereismytrain", lambda: JSONResponse(fake.whereismytrain(train_no, date)))
+
+    @app.get("/api/v1/liveTrainStatus")
+    async def irctc(
+        trainNo: str = Query(...),
+        startDay: int = Query(0),
+    ):
+        return await fake.respond("irctc_rapidapi", lambda: JSONResponse(fake.irctc(trainNo, startDay)))
+
+    @app.get("/_stats")
+    async def stats():
+        return fake.stats()
+
+    @app.post("/_reset")
+    async def reset():
+        fake.reset()
+        return fake.stats()
+
+    return app
+
+
+async def load_db_routes() -> Dict[str, List[Dict]]:
+    import asyncpg
+
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT t.number, s.code, s.name, st.arrival_time, st.departure_time
+            FROM stop_times st
+            JOIN trains t ON t.id = st.train_id
+            JOIN stations s ON s.id = st.station_id
+            ORDER BY t.number, st.sequence
+            """
+        )
+    finally:
+        await conn.close()
+    routes: Dict[str, List[Dict]] = {}
+    for r in rows:
+        routes.setdefault(r["number"], []).append({
+            "code": r["code"],
+            "name": r["name"],
+            "arrival": str(r["arrival_time"]) if r["arrival_time"] else None,
+            "departure": str(r["departure_time"]) if r["departure_time"] else None,
+        })
+    return routes
+
+
+def parse_outage(spec: str) -> Tuple[str, float, float]:
+    """``name=start+duration`` in seconds, e.g. ``whereismytrain=60+30``."""
+    name, _, window = spec.partition("=")
+    start, _, duration = window.partition("+")
+    if name not in UPSTREAM_NAMES or not duration:
+        raise argparse.ArgumentTypeError(f"expected <{'|'.join(UPSTREAM_NAMES)}>=<start>+<duration>, got {spec!r}")
+    return name, float(start), float(start) + float(duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    for prefix, name in (("wimt", "WhereIsMyTrain"), ("irctc", "IRCTC RapidAPI")):
+        parser.add_argument(f"--{prefix}-latency-ms", type=float, default=300.0, help=f"{name} median latency")
+        parser.add_argument(f"--{prefix}-latency-sigma", type=float, default=0.5, help="Lognormal spread, 0 for constant")
+        parser.add_argument(f"--{prefix}-error-rate", type=float, default=0.0, help="Fraction of calls answered 502")
+    parser.add_argument("--outage", type=parse_outage, action="append", default=[],
+                        help="name=start+duration seconds after startup; repeatable")
+    parser.add_argument("--outage-mode", choices=("error", "hang"), default="error")
+    parser.add_argument("--from-db", action="store_true", help="Serve real routes from stop_times")
+    args = parser.parse_args()
+
+    behaviours = {
+        "whereismytrain": UpstreamBehaviour(args.wimt_latency_ms, args.wimt_latency_sigma, args.wimt_error_rate),
+        "irctc_rapidapi": UpstreamBehaviour(args.irctc_latency_ms, args.irctc_latency_sigma, args.irctc_error_rate),
+    }
+    for name, start, end in args.outage:
+        behaviours[name].outages.append((start, end))
+        behaviours[name].outage_mode = args.outage_mode
+
+    stops = None
+    if args.from_db:
+        from dotenv import load_dotenv
+        load_dotenv()
+        stops = asyncio.run(load_db_routes())
+        print(f"Loaded routes for {len(stops)} trains")
+
+    uvicorn.run(create_app(FakeUpstream(behaviours, stops)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Load test for GET /api/trains/{id}/live against a running app backed by
+benchmarks/fake_upstream.py. Requests are sent open-loop at a target rate
+with a Zipf-skewed train mix; latency is measured from each request's
+scheduled start, so a stalled server shows up in the percentiles instead of
+lowering the offered load. Reports p50/p95/p99, status codes, upstream call
+counts (from the fake's /_stats) and cache hit ratios (from the app's
+/health counters, so run a single app worker for exact ratios).
+
+Everything on one box, with local Redis and Postgres from .env:
+
+  python benchmarks/load_live.py --spawn --rps 200 --duration 60
+  python benchmarks/load_live.py --spawn --rps 200 --upstream-args="--outage whereismytrain=20+15"
+
+--spawn starts the fake upstream and uvicorn with the environment pointing
+the clients at it and the per-IP rate limit lifted. Without it, start them
+yourself and pass --base-url / --upstream-url.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shlex
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+from common import BACKEND_DIR, save_results, summarize
+
+
+def zipf_weights(n: int, s: float) -> List[float]:
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+async def train_numbers(limit: int) -> List[str]:
+    import asyncpg
+    from dotenv import load_dotenv
+
+    load_dotenv(BACKEND_DIR / ".env")
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        rows = await conn.fetch("SELECT number FROM trains ORDER BY number LIMIT $1", limit)
+    finally:
+        await conn.close()
+    return [r["number"] for r in rows]
+
+
+async def fetch_json(client: httpx.AsyncClient, url: str) -> Optional[Dict]:
+    try:
+        response = await client.get(url)
+        return response.json()
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+async def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def spawn(args) -> List[subprocess.Popen]:
+    upstream = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "benchmarks" / "fake_upstream.py"),
+         "--port", str(args.upstream_port), *shlex.split(args.upstream_args)],
+        cwd=BACKEND_DIR,
+    )
+    upstream_base = f"http://127.0.0.1:{args.upstream_port}"
+    env = {
+        **os.environ,
+        "WHEREISMYTRAIN_URL": f"{upstream_base}/cache/live_status",
+        "IRCTC_RAPIDAPI_URL": f"{upstream_base}/api/v1/liveTrainStatus",
+        "IRCTC_RAPIDAPI_KEY": os.getenv("IRCTC_RAPIDAPI_KEY") or "loadtest",
+        "RATE_LIMIT_MAX_REQUESTS": "1000000000",
+    }
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.app_port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    args.base_url = f"http://127.0.0.1:{args.app_port}"
+    args.upstream_url = upstream_base
+    return [app, upstream]
+
+
+def counters(health: Optional[Dict], upstream: Optional[Dict]) -> Dict[str, float]:
+    """Flatten the monotonic counters that are diffed across the run."""
+    out: Dict[str, float] = {}
+    if health:
+        cache = health.get("cache") or {}
+        for name in ("local_hits", "redis_hits", "misses"):
+            out[f"cache.{name}"] = cache.get(name, 0)
+        live = health.get("live_status") or {}
+        out["live.stale_served"] = live.get("stale_served", 0)
+        singleflight = live.get("singleflight") or {}
+        out["live.singleflight_calls"] = singleflight.get("calls", 0)
+        out["live.singleflight_shared"] = singleflight.get("shared", 0)
+        hedging = live.get("hedging") or {}
+        out["live.hedges_fired"] = hedging.get("fired", 0)
+    if upstream:
+        for name, stats in upstream.get("upstreams", {}).items():
+            for key in ("calls", "errors", "outage_calls"):
+                out[f"upstream.{name}.{key}"] = stats.get(key, 0)
+    return out
+
+
+async def run(args) -> Dict:
+    trains = args.trains.split(",") if args.trains else await train_numbers(args.train_count)
+    if not trains:
+        raise SystemExit("No trains to request; pass --trains or seed the database")
+    weights = zipf_weights(len(trains), args.zipf)
+    rng = random.Random(args.seed)
+    date = args.date or time.strftime("%Y-%m-%d")
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        async with httpx.AsyncClient(timeout=5.0) as probe:
+            before = counters(
+                await fetch_json(probe, f"{args.base_url}/health"),
+                await fetch_json(probe, f"{args.upstream_url}/_stats"),
+            )
+
+        latencies: List[float] = []
+        statuses: Counter = Counter()
+        sources: Counter = Counter()
+        served_stale = 0
+        dropped = 0
+        in_flight = 0
+
+        async def one(train_no: str, scheduled: float) -> None:
+            nonlocal served_stale, in_flight
+            in_flight += 1
+            try:
+                response = await client.get(f"/api/trains/{train_no}/live", params={"date": date})
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    body = response.json()
+                    sources[body.get("source") or "unknown"] += 1
+                    served_stale += bool(body.get("stale"))
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            finally:
+                in_flight -= 1
+                latencies.append(time.perf_counter() - scheduled)
+
+        total = int(args.rps * args.duration)
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            scheduled = started + i / args.rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight >= args.max_in_flight:
+                dropped += 1
+                continue
+            train_no = rng.choices(trains, weights)[0]
+            tasks.append(asyncio.create_task(one(train_no, scheduled)))
+        sent_for = time.perf_counter() - started
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        async with httpx.AsyncClient(timeout=5.0) as probe:
+            after = counters(
+                await fetch_json(probe, f"{args.base_url}/health"),
+                await fetch_json(probe, f"{args.upstream_url}/_stats"),
+            )
+
+    delta = {k: after[k] - before.get(k, 0) for k in after}
+    lookups = sum(delta.get(f"cache.{n}", 0) for n in ("local_hits", "redis_hits", "misses"))
+    hits = delta.get("cache.local_hits", 0) + delta.get("cache.redis_hits", 0)
+    upstream_calls = {
+        k.split(".")[1]: v for k, v in delta.items() if k.startswith("upstream.") and k.endswith(".calls")
+    }
+    return {
+        "config": {
+            "rps": args.rps, "duration_s": args.duration, "trains": len(trains),
+            "zipf": args.zipf, "workers": args.workers if args.spawn else None,
+        },
+        "latency": summarize(latencies),
+        "offered_rps": total / sent_for if sent_for else None,
+        "completed_rps": len(latencies) / elapsed if elapsed else None,
+        "dropped": dropped,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "sources": dict(sources),
+        "served_stale": served_stale,
+        "cache_hit_ratio": hits / lookups if lookups else None,
+        "local_hit_ratio": delta.get("cache.local_hits", 0) / lookups if lookups else None,
+        "upstream_calls": upstream_calls,
+        "upstream_calls_per_request": sum(upstream_calls.values()) / len(latencies) if latencies else None,
+        "counters": delta,
+    }
+
+
+def report(result: Dict) -> None:
+    lat = result["latency"]
+    print(f"\nrequests {lat['calls']}  offered {result['offered_rps'] or 0:.1f}/s  "
+          f"completed {result['completed_rps'] or 0:.1f}/s  dropped {result['dropped']}")
+    if lat["calls"]:
+        print(f"latency p50 {lat['p50_us'] / 1000:.1f} ms  p95 {lat['p95_us'] / 1000:.1f} ms  "
+              f"p99 {lat['p99_us'] / 1000:.1f} ms")
+    print(f"statuses {result['statuses']}  sources {result['sources']}  stale {result['served_stale']}")
+    ratio = result["cache_hit_ratio"]
+    print(f"cache hit ratio {ratio:.3f}" if ratio is not None else "cache hit ratio n/a (no /health counters)")
+    print(f"upstream calls {result['upstream_calls']}  per request {result['upstream_calls_per_request'] or 0:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--upstream-url", default="http://127.0.0.1:8900")
+    parser.add_argument("--rps", type=float, default=100.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of offered load")
+    parser.add_argument("--trains", help="Comma-separated train numbers (default: from the database)")
+    parser.add_argument("--train-count", type=int, default=500, help="Trains read from the database")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Popularity skew, 0 for uniform")
+    parser.add_argument("--date", help="Journey date YYYY-MM-DD (default today)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Requests beyond this are dropped")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--spawn", action="store_true", help="Start the fake upstream and the app")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--app-port", type=int, default=8000)
+    parser.add_argument("--upstream-port", type=int, default=8900)
+    parser.add_argument("--upstream-args", default="", help="Extra fake_upstream.py arguments")
+    parser.add_argument("--output", help="Results JSON path (default benchmarks/results/load_live-<commit>.json)")
+    args = parser.parse_args()
+
+    processes = spawn(args) if args.spawn else []
+    try:
+        if processes:
+            asyncio.run(wait_until_up(f"{args.upstream_url}/_stats"))
+            asyncio.run(wait_until_up(f"{args.base_url}/health"))
+        result = asyncio.run(run(args))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report(result)
+    path = save_results("load_live", {"live": result}, args.output)
+    print(f"\nSaved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,85 @@
+import asyncio
 import logging
+import math
 from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.api.stations import router as stations_router
 from app.api.trains import router as trains_router
-from app.redis import redis_client
+from app.redis import redis_binary_client, redis_client
 from app.api.ai import router as ai_router
 from app.api.offline import router as offline_router
 from app.api.alerts import router as alerts_router
+from app.services.route_cache import route_cache
+from app.services.station_index import station_index
+from app.services.autocomplete import station_suggest, train_suggest
+from app.services.timetable import TIMETABLE_INDEX_ENABLED, timetable_index
+from app.database.db import get_pool
+from app.database.notify import (
+    RECONNECT_INITIAL_SECONDS,
+    RECONNECT_MAX_SECONDS,
+    change_listener,
+    coalesced,
+)
+from app.clients.http import http_clients
+from app.clients.live_status_service import live_status_service
+from app.services.tiered_cache import tiered_cache
+from app.services.prefetch import prefetcher
+from app.services.circuit_breaker import breaker_stats
+from app.services.quota import irctc_admission
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Startup loads still being retried, kept so the tasks are not garbage-collected.
+_startup_retries: set = set()
+
+
+async def refresh_station_index(_payload: str = "") -> None:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await station_index.refresh(conn)
+
+
+async def refresh_station_suggest(payload: str = "") -> None:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await station_suggest.refresh(conn, payload.split(",") if payload else None)
+
+
+async def refresh_train_suggest(payload: str = "") -> None:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await train_suggest.refresh(conn, payload.split(",") if payload else None)
+
+
+async def refresh_timetable(_payload: str = "") -> None:
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await timetable_index.refresh(conn)
+
+
+async def retry_load(refresh, what: str) -> None:
+    """Retry a load that failed at startup (e.g. Postgres down) with the change listener's backoff."""
+    delay = RECONNECT_INITIAL_SECONDS
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await refresh()
+        except Exception as e:
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+            logger.warning("%s still not loaded: %s (retrying in %.0fs)", what, e, delay)
+            continue
+        logger.info("%s loaded after startup", what)
+        return
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -25,8 +89,54 @@ async def lifespan(app: FastAPI):
         logger.info("Redis connection OK")
     except Exception as e:
         logger.warning("Redis not reachable at startup: %s (app will still start)", e)
+
+    await http_clients.start()
+    await tiered_cache.start()
+    await prefetcher.start()
+
+    # Shared with the change listener so a retry and a reload never overlap.
+    reload_station_index = coalesced(refresh_station_index)
+    try:
+        await reload_station_index("")
+    except Exception as e:
+        logger.warning("Station index not loaded at startup: %s (nearby search will use the DB until it is)", e)
+        task = asyncio.create_task(retry_load(lambda: reload_station_index(""), "Station index"))
+        _startup_retries.add(task)
+        task.add_done_callback(_startup_retries.discard)
+
+    for refresh, index in ((refresh_station_suggest, station_suggest), (refresh_train_suggest, train_suggest)):
+        try:
+            await refresh()
+        except Exception as e:
+            logger.warning("%s autocomplete not loaded at startup: %s (suggest will use the DB)", index.table, e)
+
+    if TIMETABLE_INDEX_ENABLED:
+        try:
+            await refresh_timetable()
+        except Exception as e:
+            logger.warning("Timetable index not loaded at startup: %s (from/to search will use the DB)", e)
+        # One coalesced wrapper for all three, so a burst across tables (or a
+        # reconnect, which reloads everything) rebuilds at most twice.
+        reload_timetable = coalesced(refresh_timetable)
+        for table in ("stations", "trains", "stop_times"):
+            change_listener.subscribe(table, reload_timetable)
+
+    change_listener.subscribe("stations", reload_station_index)
+    change_listener.subscribe("stations", refresh_station_suggest)
+    change_listener.subscribe("trains", refresh_train_suggest)
+    try:
+        await change_listener.start()
+    except Exception as e:
+        logger.warning("Change listener not started: %s (in-memory indexes will not auto-refresh)", e)
     yield
     
+    for task in list(_startup_retries):
+        task.cancel()
+    await prefetcher.stop()
+    await change_listener.stop()
+    await tiered_cache.stop()
+    await http_clients.aclose()
+    await redis_binary_client.aclose()
     await redis_client.aclose()
 
 
@@ -44,6 +154,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    # The default handler echoes the rejected input, and a NaN/inf
+    # coordinate cannot be encoded as JSON; send those back as strings.
+    errors = [
+        {**e, "input": repr(e["input"])}
+        if isinstance(e.get("input"), float) and not math.isfinite(e["input"]) else e
+        for e in exc.errors()
+    ]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
+
+
 app.include_router(stations_router)
 app.include_router(trains_router)
 app.include_router(ai_router)
@@ -56,5 +180,29 @@ def read_root():
 
 
 @app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+async def health_check():
+    return {
+        "status": "healthy",
+        "route_cache": route_cache.stats(),
+        "station_index": station_index.stats(),
+        "autocomplete": {"stations": station_suggest.stats(), "trains": train_suggest.stats()},
+        "timetable": timetable_index.stats(),
+        "change_listener": change_listener.stats(),
+        "http_clients": http_clients.stats(),
+        "live_status": live_status_service.stats(),
+        "cache": tiered_cache.stats(),
+        "prefetch": prefetcher.stats(),
+        "circuit_breakers": await breaker_stats(),
+        "irctc_quota": await irctc_admission.stats(),
+    }
+
+
+@app.get("/health/prefetch")
+async def prefetch_health():
+    """Current hot set (read from Redis on any worker) and prefetch lag."""
+    try:
+        hot = await prefetcher.hot_set()
+    except Exception as e:
+        logger.warning("Hot set unavailable: %s", e)
+        hot = None
+    return {**prefetcher.stats(), "hot": hot}
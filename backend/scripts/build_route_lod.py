@@ -0,0 +1,77 @@
+"""
+Precompute Douglas-Peucker levels of detail for every route geometry and
+store them in route_geometry_lod. Only routes whose geometry changed since
+their levels were built (route_geometry.updated_at) are reprocessed.
+
+  python scripts/build_route_lod.py [--all]
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+from app.database.db import get_pool, close_pool
+from app.services.route_cache import decode_geometry
+from app.services.simplify import LOD_TOLERANCES_M, simplified_geometry, vertex_importance
+from app.services.snap import CompiledRoute
+
+
+async def build(rebuild_all: bool = False):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT rg.train_id, rg.updated_at
+            FROM route_geometry rg
+            WHERE $1
+               OR (SELECT count(*) FROM route_geometry_lod l
+                   WHERE l.train_id = rg.train_id
+                     AND l.source_updated_at IS NOT DISTINCT FROM rg.updated_at) < $2
+            """,
+            rebuild_all,
+            len(LOD_TOLERANCES_M),
+        )
+
+        built = 0
+        for row in rows:
+            geometry = decode_geometry(await conn.fetchval(
+                "SELECT geometry FROM route_geometry WHERE train_id = $1", row["train_id"],
+            ))
+            if len(geometry) < 2:
+                continue
+
+            route = CompiledRoute.from_geometry(geometry)
+            await asyncio.to_thread(vertex_importance, route)
+
+            async with conn.transaction():
+                await conn.execute(
+                    "DELETE FROM route_geometry_lod WHERE train_id = $1", row["train_id"],
+                )
+                for tolerance in LOD_TOLERANCES_M:
+                    level = simplified_geometry(route, tolerance)
+                    await conn.execute(
+                        """
+                        INSERT INTO route_geometry_lod
+                            (train_id, tolerance_m, geometry, point_count, source_updated_at)
+                        VALUES ($1, $2, $3::jsonb, $4, $5)
+                        """,
+                        row["train_id"],
+                        tolerance,
+                        json.dumps(level),
+                        len(level),
+                        row["updated_at"],
+                    )
+            built += 1
+
+    await close_pool()
+    print(f"Built levels of detail for {built} route(s) ({len(rows) - built} skipped)")
+
+
+if __name__ == "__main__":
+    asyncio.run(build(rebuild_all="--all" in sys.argv))
@@ -0,0 +1,38 @@
+"""
+Refresh the station_pair_trains materialized view behind from->to train
+search. Run after loading or changing stop_times; running API processes
+are notified so their in-memory timetable (TIMETABLE_INDEX) reloads too.
+
+  python scripts/build_station_pairs.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+from app.database.db import get_pool, close_pool
+from app.database.notify import notify_change
+from app.services.station_pairs import refresh_station_pairs
+
+
+async def build():
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        started = time.perf_counter()
+        await refresh_station_pairs(conn)
+        pairs = await conn.fetchval("SELECT count(*) FROM station_pair_trains")
+        size = await conn.fetchval("SELECT pg_size_pretty(pg_total_relation_size('station_pair_trains'))")
+        await notify_change(conn, "stop_times")
+
+    await close_pool()
+    print(f"Refreshed station_pair_trains: {pairs} rows, {size}, {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(build())
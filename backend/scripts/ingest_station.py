@@ -12,7 +12,9 @@ from dotenv import load_dotenv
 load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 
 from app.clients.client_service import ClientService
+from app.clients.http import http_clients
 from app.database.db import get_pool
+from app.database.notify import notify_keys
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 LOCAL_STATIONS_JSON = DATA_DIR / "stations.json"
@@ -22,7 +24,10 @@ async def _fetch_stations():
     """Fetch stations from API or local JSON fallback."""
     try:
         client = ClientService()
-        return await client.get_stations()
+        try:
+            return await client.get_stations()
+        finally:
+            await http_clients.aclose()
     except Exception as e:
         if LOCAL_STATIONS_JSON.exists():
             print(f"API failed ({e}). Using local data from {LOCAL_STATIONS_JSON}")
@@ -39,12 +44,16 @@ async def ingest():
     pool = await get_pool()
 
     async with pool.acquire() as conn:
+        changed = []
         for code, name in stations:
-            await conn.execute(
+            # RETURNING yields a row only for inserts and actual renames.
+            upserted = await conn.fetchval(
                 """
                 INSERT INTO stations (id, code, name, lat, lng, zone)
                 VALUES ($1, $2, $3, $4, $5, $6)
                 ON CONFLICT (code) DO UPDATE SET name = EXCLUDED.name
+                WHERE stations.name IS DISTINCT FROM EXCLUDED.name
+                RETURNING code
                 """,
                 uuid.uuid4(),
                 code,
@@ -53,8 +62,11 @@ async def ingest():
                 None,
                 None,
             )
+            if upserted:
+                changed.append(upserted)
+        await notify_keys(conn, "stations", changed)
 
-    print(f"Ingested {len(stations)} stations")
+    print(f"Ingested {len(stations)} stations ({len(changed)} new or renamed)")
 
 
 if __name__ == "__main__":
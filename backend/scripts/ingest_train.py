@@ -11,7 +11,9 @@ from dotenv import load_dotenv
 load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 
 from app.clients.client_service import ClientService
+from app.clients.http import http_clients
 from app.database.db import get_pool
+from app.database.notify import notify_keys
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 LOCAL_TRAINS_JSON = DATA_DIR / "trains.json"
@@ -21,7 +23,10 @@ async def _fetch_trains():
     """Fetch trains from API or local JSON fallback."""
     try:
         client = ClientService()
-        return await client.get_trains()
+        try:
+            return await client.get_trains()
+        finally:
+            await http_clients.aclose()
     except Exception as e:
         if LOCAL_TRAINS_JSON.exists():
             print(f"API failed ({e}). Using local data from {LOCAL_TRAINS_JSON}")
@@ -38,20 +43,27 @@ async def ingest():
     pool = await get_pool()
 
     async with pool.acquire() as conn:
+        changed = []
         for number, name in trains:
-            await conn.execute(
+            # RETURNING yields a row only for inserts and actual renames.
+            upserted = await conn.fetchval(
                 """
                 INSERT INTO trains (id, number, name, type)
                 VALUES ($1, $2, $3, $4)
                 ON CONFLICT (number) DO UPDATE SET name = EXCLUDED.name
+                WHERE trains.name IS DISTINCT FROM EXCLUDED.name
+                RETURNING number
                 """,
                 uuid.uuid4(),
                 number,
                 name,
                 None,
             )
+            if upserted:
+                changed.append(upserted)
+        await notify_keys(conn, "trains", changed)
 
-    print(f"Ingested {len(trains)} trains")
+    print(f"Ingested {len(trains)} trains ({len(changed)} new or renamed)")
 
 
 if __name__ == "__main__":
@@ -24,7 +24,7 @@ async def init_db():
     pool = await get_pool()
     async with pool.acquire() as conn:
         # Run each statement; ignore "already exists" so script is idempotent
-        for stmt in _split_sql(sql):
+        for stmt, optional in _split_sql(sql):
             stmt = stmt.strip()
             if not stmt:
                 continue
@@ -34,26 +34,38 @@ async def init_db():
             except Exception as e:
                 if "already exists" in str(e):
                     print(f"Skip (exists): {stmt[:50]}...")
+                elif optional:
+                    print(f"Skip (optional, {str(e).splitlines()[0]}): {stmt[:50]}...")
                 else:
                     raise
     await close_pool()
     print("Database schema ready.")
 
 
-def _split_sql(sql: str) -> list[str]:
-    """Split SQL into single statements (by semicolon), keep constraint blocks intact."""
+def _split_sql(sql: str) -> list[tuple[str, bool]]:
+    """
+    Split SQL into single statements (by semicolon), keep constraint blocks intact.
+    A statement preceded by a "-- optional" comment may fail (e.g. an extension
+    that is not installed on this server) without aborting the script.
+    """
     statements = []
     current = []
+    optional = False
     for line in sql.splitlines():
         stripped = line.strip()
-        if not stripped or stripped.startswith("--"):
+        if not stripped:
+            continue
+        if stripped.startswith("--"):
+            if not current and stripped[2:].strip().lower().startswith("optional"):
+                optional = True
             continue
         current.append(line)
         if stripped.endswith(";"):
-            statements.append("\n".join(current))
+            statements.append(("\n".join(current), optional))
             current = []
+            optional = False
     if current:
-        statements.append("\n".join(current))
+        statements.append(("\n".join(current), optional))
     return statements
 
 
@@ -0,0 +1,113 @@
+"""
+Project every scheduled stop onto its train's route geometry and store the
+along-route offset in route_stop_offsets. Only trains whose geometry
+(route_geometry.updated_at) or schedule (stop list and station coordinates)
+changed since the last run are reprocessed.
+
+  python scripts/project_stops.py [--all]
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+from app.database.db import get_pool, close_pool
+from app.services.route_cache import decode_geometry
+from app.services.snap import CompiledRoute
+from app.services.stop_offsets import project_stops
+
+# Fingerprint of a train's schedule as far as stop positions are concerned.
+SCHEDULE_HASH_SQL = """
+    SELECT st.train_id,
+           md5(string_agg(
+               st.station_id::text || ':' || st.sequence || ':'
+                   || coalesce(s.lat::text, '') || ':' || coalesce(s.lng::text, ''),
+               ',' ORDER BY st.sequence
+           )) AS schedule_hash
+    FROM stop_times st
+    JOIN stations s ON s.id = st.station_id
+    GROUP BY st.train_id
+"""
+
+
+async def project(rebuild_all: bool = False):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT rg.train_id, rg.updated_at, sched.schedule_hash
+            FROM route_geometry rg
+            JOIN ({SCHEDULE_HASH_SQL}) sched ON sched.train_id = rg.train_id
+            LEFT JOIN route_stop_projection_state ps ON ps.train_id = rg.train_id
+            WHERE $1
+               OR ps.train_id IS NULL
+               OR ps.geometry_updated_at IS DISTINCT FROM rg.updated_at
+               OR ps.schedule_hash <> sched.schedule_hash
+            """,
+            rebuild_all,
+        )
+
+        for row in rows:
+            geometry = decode_geometry(await conn.fetchval(
+                "SELECT geometry FROM route_geometry WHERE train_id = $1", row["train_id"],
+            ))
+            if len(geometry) < 2:
+                continue
+
+            stops = await conn.fetch(
+                """
+                SELECT st.sequence, st.station_id, s.lat, s.lng
+                FROM stop_times st
+                JOIN stations s ON s.id = st.station_id
+                WHERE st.train_id = $1
+                ORDER BY st.sequence
+                """,
+                row["train_id"],
+            )
+            route = CompiledRoute.from_geometry(geometry)
+            projected = await asyncio.to_thread(
+                project_stops, route, [(s["sequence"], s["lat"], s["lng"]) for s in stops],
+            )
+            station_by_sequence = {s["sequence"]: s["station_id"] for s in stops}
+
+            async with conn.transaction():
+                await conn.execute(
+                    "DELETE FROM route_stop_offsets WHERE train_id = $1", row["train_id"],
+                )
+                await conn.executemany(
+                    """
+                    INSERT INTO route_stop_offsets
+                        (train_id, sequence, station_id, offset_m, snap_distance_m)
+                    VALUES ($1, $2, $3, $4, $5)
+                    """,
+                    [
+                        (row["train_id"], seq, station_by_sequence[seq], offset, distance)
+                        for seq, offset, distance in projected
+                    ],
+                )
+                await conn.execute(
+                    """
+                    INSERT INTO route_stop_projection_state
+                        (train_id, geometry_updated_at, schedule_hash, projected_at)
+                    VALUES ($1, $2, $3, NOW())
+                    ON CONFLICT (train_id) DO UPDATE SET
+                        geometry_updated_at = EXCLUDED.geometry_updated_at,
+                        schedule_hash = EXCLUDED.schedule_hash,
+                        projected_at = EXCLUDED.projected_at
+                    """,
+                    row["train_id"],
+                    row["updated_at"],
+                    row["schedule_hash"],
+                )
+
+    await close_pool()
+    print(f"Projected stops for {len(rows)} train(s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(project(rebuild_all="--all" in sys.argv))
@@ -0,0 +1,50 @@
+"""Byte accounting in RouteCache as cached routes grow after insertion."""
+import numpy as np
+
+from app.services.route_cache import CachedRoute, RouteCache
+from app.services.snap import CompiledRoute
+
+
+def cached(train_id: str, points: int = 100) -> CachedRoute:
+    lng = np.linspace(77.0, 78.0, points)
+    return CachedRoute(train_id, None, CompiledRoute(lng, np.full(points, 28.0)))
+
+
+def test_running_total_follows_inserts_and_removals():
+    cache = RouteCache(max_entries=10, max_bytes=10**9)
+    entries = [cached(str(i)) for i in range(3)]
+    for entry in entries:
+        cache._insert(entry)
+    assert cache.nbytes == sum(e.nbytes for e in entries)
+    cache._remove("1")
+    assert cache.nbytes == entries[0].nbytes + entries[2].nbytes
+    cache.clear()
+    assert cache.nbytes == 0
+
+
+def test_resize_evicts_when_a_route_grows_past_the_budget():
+    size = cached("x").nbytes
+    cache = RouteCache(max_entries=10, max_bytes=size * 3)
+    entries = [cached(str(i)) for i in range(3)]
+    for entry in entries:
+        cache._insert(entry)
+    assert cache.evictions == 0
+
+    grown = entries[2]
+    grown.route.encodings[("binary", None)] = (b"\0" * size, 100)
+    cache.resize(grown)
+    assert cache.nbytes == sum(e.nbytes for e in cache._entries.values()) <= cache.max_bytes
+    assert "0" not in cache._entries and "2" in cache._entries
+
+
+def test_peek_recounts_growth_it_was_not_told_about():
+    size = cached("x").nbytes
+    cache = RouteCache(max_entries=10, max_bytes=size * 2)
+    first, second = cached("a"), cached("b")
+    cache._insert(first)
+    cache._insert(second)
+    second.route.importance = np.zeros(second.route.point_count)
+    second.checked_at = float("inf")  # keep peek from scheduling a refresh
+    assert cache.peek(["b"]) == {"b": second}
+    assert list(cache._entries) == ["b"]
+    assert cache.nbytes == second.nbytes
@@ -0,0 +1,79 @@
+"""
+The vectorised snap engine (``snap_compiled``, with and without the segment
+grid) against the pure-Python reference ``snap_to_route``.
+"""
+import math
+import random
+
+import pytest
+
+from app.services.segment_index import build_segment_index
+from app.services.snap import CompiledRoute, snap_compiled, snap_to_route
+
+ROUTES = 12
+QUERIES_PER_ROUTE = 120
+
+
+def random_route(rng: random.Random, points: int) -> list:
+    """A wandering [lng, lat] polyline over India, with the odd repeated vertex."""
+    lng, lat, heading = rng.uniform(70, 90), rng.uniform(10, 30), rng.uniform(0, 2 * math.pi)
+    step = rng.choice((0.002, 0.01, 0.05))
+    geometry = []
+    for _ in range(points):
+        geometry.append([lng, lat])
+        if rng.random() < 0.02:
+            geometry.append([lng, lat])
+        heading += rng.gauss(0, 0.3)
+        lng += step * math.cos(heading)
+        lat += step * math.sin(heading)
+    return geometry
+
+
+def queries(rng: random.Random, geometry: list, count: int) -> list:
+    """Mostly near the route, some far off it."""
+    points = []
+    for i in range(count):
+        lng, lat = geometry[rng.randrange(len(geometry))]
+        spread = 0.01 if i % 5 else 1.0
+        points.append((lat + rng.gauss(0, spread), lng + rng.gauss(0, spread)))
+    return points
+
+
+def assert_same_snap(actual: dict, expected: dict, total_segments: int) -> None:
+    assert actual["distance_meters"] == pytest.approx(expected["distance_meters"], rel=1e-9, abs=1e-6)
+    if actual["segment_index"] != expected["segment_index"]:
+        # Only a tie at a shared vertex may resolve to the neighbouring segment.
+        assert abs(actual["segment_index"] - expected["segment_index"]) == 1
+        assert actual["route_fraction"] == pytest.approx(expected["route_fraction"], abs=1.0 / total_segments + 1e-9)
+    else:
+        assert actual["route_fraction"] == pytest.approx(expected["route_fraction"], rel=1e-9, abs=1e-12)
+    assert actual["snapped_lat"] == pytest.approx(expected["snapped_lat"], abs=1e-9)
+    assert actual["snapped_lng"] == pytest.approx(expected["snapped_lng"], abs=1e-9)
+
+
+@pytest.mark.parametrize("with_grid", [False, True], ids=["linear", "grid"])
+@pytest.mark.parametrize("seed", range(ROUTES))
+def test_snap_compiled_matches_reference(seed, with_grid):
+    rng = random.Random(seed)
+    geometry = random_route(rng, rng.choice((2, 10, 300, 3000)))
+    route = CompiledRoute.from_geometry(geometry)
+    if with_grid:
+        build_segment_index(route)
+
+    for lat, lng in queries(rng, geometry, QUERIES_PER_ROUTE):
+        assert_same_snap(snap_compiled(route, lat, lng), snap_to_route(geometry, lat, lng), route.segment_count)
+
+
+def test_snap_compiled_skips_degenerate_segments():
+    geometry = [[77.0, 28.0], [77.0, 28.0], [77.1, 28.0], [77.1, 28.0], [77.1, 28.1]]
+    route = CompiledRoute.from_geometry(geometry)
+    for lat, lng in ((28.0, 77.0), (28.05, 77.2), (27.0, 76.0)):
+        assert_same_snap(snap_compiled(route, lat, lng), snap_to_route(geometry, lat, lng), route.segment_count)
+
+
+@pytest.mark.parametrize("lat, lng", [(math.nan, 77.0), (28.0, math.inf), (-math.inf, math.nan)])
+def test_segment_grid_rejects_non_finite_points(lat, lng):
+    rng = random.Random(0)
+    route = CompiledRoute.from_geometry(random_route(rng, 3000))
+    grid = build_segment_index(route)
+    assert grid.nearest(lat, lng, 5000.0) == (-1, 0.0, float("inf"), None, None)
@@ -1,8 +1,8 @@
 import api from './client'
 import type { Station } from '../types'
 
-export async function listStations(query?: string): Promise<Station[]> {
-  const { data } = await api.get('/api/stations', { params: query ? { q: query } : undefined })
+export async function listStations(query?: string, limit?: number): Promise<Station[]> {
+  const { data } = await api.get('/api/stations', { params: query ? { q: query, limit } : undefined })
   return data
 }
 
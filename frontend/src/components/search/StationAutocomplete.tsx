@@ -25,8 +25,8 @@ export default function StationAutocomplete({ label, placeholder, value, onChang
     }
     setLoading(true)
     try {
-      const data = await listStations(q)
-      setResults(data.slice(0, 15))
+      const data = await listStations(q, 15)
+      setResults(data)
     } catch {
       setResults([])
     } finally {